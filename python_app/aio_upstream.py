@@ -0,0 +1,193 @@
+"""
+Async counterparts of the upstream clients, on httpx.
+
+Used by the ASGI entry point (asgi.py) so one process can keep hundreds of
+Gemini and Overpass calls in flight without a thread per call. Each client
+shares its circuit breaker (and, for mirrors, latency samples) with the
+matching synchronous client in upstream.py, so both serving paths see the
+same view of upstream health.
+"""
+
+import asyncio
+import random
+import time
+
+import httpx
+
+from metrics import HEDGE_WINS, HEDGED_REQUESTS, UPSTREAM_ERRORS, UPSTREAM_TIMEOUTS
+from upstream import RETRY_AFTER_MAX, RETRY_STATUSES, CircuitBreaker, HedgedClient, Mirror, UpstreamUnavailable
+
+
+class AsyncUpstreamClient:
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        connections: int = 100,
+        retries: int = 2,
+        backoff: float = 0.5,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it belongs to the serving event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self._limits)
+        return self._client
+
+    def available(self) -> bool:
+        return self.breaker.state != "open"
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def request(self, method: str, url: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """Send through the pooled client, recording the outcome on the breaker.
+
+        With ``stream``, only the headers have been read; the caller reads
+        the body and must ``aclose()`` the response.
+        """
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(f"{self.name} circuit is open")
+        try:
+            resp = await self._send(method, url, stream, kwargs)
+        except httpx.HTTPError as e:
+            self.breaker.record_failure()
+            if isinstance(e, httpx.TimeoutException):
+                UPSTREAM_TIMEOUTS.inc(upstream=self.name)
+            UPSTREAM_ERRORS.inc(upstream=self.name)
+            raise
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise
+        if resp.status_code in RETRY_STATUSES:
+            UPSTREAM_ERRORS.inc(upstream=self.name)
+        self.breaker.record_status(resp.status_code)
+        return resp
+
+    async def _send(self, method: str, url: str, stream: bool, kwargs) -> httpx.Response:
+        # Same policy as the urllib3 Retry on the sync clients: connection
+        # errors and 429/5xx are retried with jittered backoff (or after a
+        # Retry-After of at most RETRY_AFTER_MAX seconds), reads are not.
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            delay = min(RETRY_AFTER_MAX, self.backoff * 2 ** attempt + random.uniform(0, self.backoff))
+            try:
+                resp = await self.client.send(self.client.build_request(method, url, **kwargs), stream=stream)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if last:
+                    raise
+            else:
+                if last or resp.status_code not in RETRY_STATUSES:
+                    return resp
+                delay = _retry_after(resp, delay)
+                await resp.aclose()
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _retry_after(resp: httpx.Response, default: float) -> float:
+    """The response's Retry-After in seconds (capped), or ``default``."""
+    try:
+        seconds = float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return default
+    return max(0.0, min(seconds, RETRY_AFTER_MAX))
+
+
+class AsyncHedgedClient:
+    """Hedged, failover requests over the mirrors of a HedgedClient.
+
+    Mirror ranking, hedge delays, latency samples and breakers all come from
+    ``hedged``; only the transport differs. Unlike the threaded client, the
+    losing request is cancelled instead of being left to finish.
+    """
+
+    def __init__(self, hedged: HedgedClient, connections: int = 100, retries: int = 0, backoff: float = 0.5):
+        self.hedged = hedged
+        self.name = hedged.name
+        self._clients = {
+            mirror: AsyncUpstreamClient(
+                mirror.client.name, mirror.client.timeout, connections=connections,
+                retries=retries, backoff=backoff, breaker=mirror.client.breaker,
+            )
+            for mirror in hedged.mirrors
+        }
+
+    def available(self) -> bool:
+        return self.hedged.available()
+
+    async def _attempt(self, mirror: Mirror, kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        resp = await self._clients[mirror].post(mirror.url, **kwargs)
+        if resp.status_code not in RETRY_STATUSES:
+            mirror.record_latency(time.perf_counter() - started)
+        return resp
+
+    async def post(self, **kwargs) -> httpx.Response:
+        """POST to the mirrors; returns the first good response."""
+        candidates = self.hedged.ranked()
+        if not candidates:
+            raise UpstreamUnavailable(f"no healthy {self.name} mirror")
+
+        primary = candidates[0]
+        in_flight = {}
+        hedged = False
+        last_error = None
+        last_response = None
+
+        def launch():
+            mirror = candidates.pop(0)
+            in_flight[asyncio.ensure_future(self._attempt(mirror, kwargs))] = mirror
+            return time.monotonic() + self.hedged.hedge_delay(mirror)
+
+        hedge_at = launch()
+        try:
+            while in_flight:
+                timeout = None
+                if candidates and not hedged:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    HEDGED_REQUESTS.inc(upstream=self.name)
+                    launch()
+                    continue
+                for task in done:
+                    mirror = in_flight.pop(task)
+                    try:
+                        resp = task.result()
+                    except (httpx.HTTPError, UpstreamUnavailable) as e:
+                        last_error = e
+                    else:
+                        if resp.status_code not in RETRY_STATUSES:
+                            if hedged and mirror is not primary:
+                                HEDGE_WINS.inc(upstream=self.name)
+                            return resp
+                        last_response = resp
+                    # Fail over straight away instead of waiting for the hedge.
+                    if candidates and len(in_flight) < 2:
+                        hedge_at = launch()
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    async def aclose(self) -> None:
+        for client in self._clients.values():
+            await client.aclose()
@@ -0,0 +1,119 @@
+"""
+Cache of symptom analyses keyed by a normalized form of the symptom text.
+
+"Headache and fever for 2 days" and "fever, headache for two days" map to
+the same key, so repeated descriptions skip the Gemini round trip. Results
+live in an in-process LRU/TTL tier and, optionally, in a SQLite-backed
+SharedStore tier that survives restarts and is shared between workers.
+"""
+
+import re
+import threading
+
+from shared_store import SharedStore
+from tiered_cache import MEMORY, SHARED, TieredCache
+
+# Time words (after, before, since, past, last) stay: "pain after eating"
+# and "fever since last week" are not the same complaint without them.
+STOPWORDS = frozenset("""
+a about am an and any are as at be been being but by can could did do does
+doing during feel feeling feels for from get getting got had has have having
+he her i im in is it its ive just like me my of on or please really right she
+so some suffer suffering than that the their them then there these they this
+those to up very was we were what when which while who will with would you
+your
+""".split())
+
+# A negation prefixes the word after it, so "no fever" and "fever" never
+# share a key.
+NEGATIONS = frozenset({"no", "not", "without", "never", "nor", "dont", "denies"})
+
+SYNONYMS = {
+    "headaches": "headache", "migraines": "migraine",
+    "fevers": "fever", "feverish": "fever", "pyrexia": "fever", "temperature": "fever",
+    "coughing": "cough", "coughs": "cough",
+    "vomit": "vomiting", "vomited": "vomiting", "puking": "vomiting", "throwing": "vomiting",
+    "nauseous": "nausea", "nauseated": "nausea",
+    "tummy": "stomach", "belly": "stomach", "abdomen": "stomach", "abdominal": "stomach",
+    "loose": "diarrhea", "motions": "diarrhea", "diarrhoea": "diarrhea",
+    "tired": "fatigue", "tiredness": "fatigue", "exhausted": "fatigue",
+    "breathless": "breathlessness", "sob": "breathlessness",
+    "ache": "pain", "aches": "pain", "aching": "pain", "pains": "pain", "sore": "pain",
+    "dizzy": "dizziness", "giddiness": "dizziness", "lightheaded": "dizziness",
+    "day": "days", "week": "weeks", "hour": "hours",
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5",
+    "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10",
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_symptoms(text: str) -> str:
+    """Fold case, punctuation, stopwords, synonyms and word order into a key."""
+    tokens = []
+    negate = False
+    for raw in _TOKEN.findall(text.lower().replace("'", "")):
+        if raw in NEGATIONS:
+            negate = True
+            continue
+        token = SYNONYMS.get(raw, raw)
+        if token in STOPWORDS:
+            continue
+        tokens.append(f"not_{token}" if negate else token)
+        negate = False
+    return " ".join(sorted(set(tokens)))
+
+
+class AnalysisCache:
+    namespace = "analysis"
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 86400, shared: SharedStore | None = None):
+        self._results = TieredCache(self.namespace, maxsize=maxsize, ttl=ttl, shared=shared)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._upstream_seconds = 0.0
+        self._upstream_calls = 0
+
+    def get(self, symptoms: str) -> dict | None:
+        key = normalize_symptoms(symptoms)
+        if not key:
+            return None
+        result, tier = self._results.lookup(key)
+        self._count({MEMORY: "hits", SHARED: "persistent_hits", None: "misses"}[tier])
+        return result
+
+    def set(self, symptoms: str, result: dict) -> None:
+        key = normalize_symptoms(symptoms)
+        if key:
+            self._results.set(key, result)
+
+    def clear(self) -> None:
+        """Forget this process's cached analyses; the shared store is kept."""
+        self._results.clear()
+
+    def record_upstream_latency(self, seconds: float) -> None:
+        """Record how long an uncached analysis took, to estimate time saved."""
+        with self._lock:
+            self._upstream_seconds += seconds
+            self._upstream_calls += 1
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.hits + self.persistent_hits
+            lookups = hits + self.misses
+            avg_upstream = self._upstream_seconds / self._upstream_calls if self._upstream_calls else 0.0
+            return {
+                "hits": self.hits,
+                "persistentHits": self.persistent_hits,
+                "misses": self.misses,
+                "hitRate": round(hits / lookups, 3) if lookups else 0.0,
+                "size": len(self._results),
+                "avgUpstreamSeconds": round(avg_upstream, 3),
+                "estimatedSecondsSaved": round(hits * avg_upstream, 1),
+            }
@@ -0,0 +1,107 @@
+"""
+Background symptom analyses that outlive the request that started them.
+
+When an analysis runs past its latency budget, the request answers with the
+curated fallback and a result token while the Gemini call carries on. The
+call's outcome is recorded here under the token, so the client can poll, or
+long-poll, for the upgraded analysis. With a SharedStore, outcomes are also
+visible to the other worker processes.
+"""
+
+import asyncio
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from shared_store import SharedStore
+from tiered_cache import TieredCache
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+class AnalysisJobs:
+    namespace = "analysis_jobs"
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600, shared: SharedStore | None = None):
+        self._states = TieredCache(self.namespace, maxsize=maxsize, ttl=ttl, shared=shared)
+        # Jobs running in this process; also keeps asyncio tasks referenced
+        self._running: dict = {}
+        self._lock = threading.Lock()
+        # Writes the shared tier for asyncio jobs, off the event loop; one
+        # thread keeps each token's PENDING ahead of its outcome.
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis-jobs")
+
+    def start(self, future) -> str:
+        """Track a concurrent or asyncio future of ``dict | None``; returns its token."""
+        token = secrets.token_urlsafe(16)
+        self._record(token, {"status": PENDING}, future)
+        with self._lock:
+            self._running[token] = (future, threading.Event())
+        future.add_done_callback(lambda done: self._finish(token, done))
+        return token
+
+    def get(self, token: str) -> dict | None:
+        """``{"status": ...}`` plus ``result`` or ``error``; None for unknown tokens."""
+        # A job pending here may have finished in another worker
+        return self._states.get(token, stale=lambda state: state["status"] == PENDING)
+
+    def wait(self, token: str, timeout: float) -> dict | None:
+        """get(), waiting up to ``timeout`` seconds while the job is pending.
+
+        Jobs running in this process wake the waiter as soon as they finish;
+        jobs in other workers are re-checked twice a second.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self.get(token)
+            remaining = deadline - time.monotonic()
+            if state is None or state["status"] != PENDING or remaining <= 0:
+                return state
+            with self._lock:
+                entry = self._running.get(token)
+            if entry is not None:
+                entry[1].wait(remaining)
+            else:
+                time.sleep(min(0.5, remaining))
+
+    async def wait_async(self, token: str, timeout: float) -> dict | None:
+        """wait() for the event loop: awaits jobs running in this process."""
+        deadline = time.monotonic() + timeout
+        while True:
+            state = await asyncio.to_thread(self.get, token)
+            remaining = deadline - time.monotonic()
+            if state is None or state["status"] != PENDING or remaining <= 0:
+                return state
+            with self._lock:
+                entry = self._running.get(token)
+            if entry is not None:
+                future = entry[0] if isinstance(entry[0], asyncio.Future) else asyncio.wrap_future(entry[0])
+                await asyncio.wait([future], timeout=remaining)
+            else:
+                await asyncio.sleep(min(0.5, remaining))
+
+    def _finish(self, token: str, future) -> None:
+        if future.cancelled():
+            state = {"status": FAILED, "error": "Analysis was cancelled"}
+        elif isinstance(future.exception(), ValueError):
+            # Raised for a rejected API key; the message is meant for the user
+            state = {"status": FAILED, "error": str(future.exception())}
+        elif future.exception() is not None or not future.result():
+            state = {"status": FAILED, "error": "AI analysis is unavailable"}
+        else:
+            state = {"status": READY, "result": future.result()}
+        self._record(token, state, future)
+        with self._lock:
+            _, event = self._running.pop(token)
+        event.set()
+
+    def _record(self, token: str, state: dict, future) -> None:
+        if isinstance(future, asyncio.Future):
+            # On the event loop: this process sees it now, the others shortly
+            self._states.remember(token, state)
+            self._writer.submit(self._states.publish, token, state)
+        else:
+            self._states.set(token, state)
@@ -0,0 +1,121 @@
+"""
+Helpers for streaming a Gemini analysis to the browser as it is generated.
+
+Gemini's ``streamGenerateContent?alt=sse`` endpoint returns the JSON
+document in arbitrary text fragments. ``TopLevelFieldParser`` is fed those
+fragments and reports each top-level field of the document as soon as its
+value is complete, so the client can render e.g. ``severityAssessment``
+long before ``preventiveAdvice`` has been generated. ``AnalysisEvents``
+turns those fields into the Server-Sent Events of /api/analyze/stream.
+"""
+
+import json
+import re
+
+from gemini_analysis import parse_analysis
+
+_decoder = json.JSONDecoder()
+_SEPARATOR = re.compile(r"[\s,]*")
+_SPACE = re.compile(r"\s*")
+
+
+class TopLevelFieldParser:
+    def __init__(self):
+        self.text = ""
+        self._pos = None
+        self.closed = False
+
+    def feed(self, fragment: str) -> list[tuple[str, object]]:
+        """Add generated text; return the (key, value) pairs it completed."""
+        self.text += fragment
+        if self._pos is None:
+            start = self.text.find("{")
+            if start < 0:
+                return []
+            self._pos = start + 1
+
+        fields = []
+        while not self.closed:
+            pos = _SEPARATOR.match(self.text, self._pos).end()
+            if pos >= len(self.text):
+                break
+            if self.text[pos] == "}":
+                self.closed = True
+                break
+            try:
+                key, pos = _decoder.raw_decode(self.text, pos)
+                pos = _SPACE.match(self.text, pos).end()
+                if self.text[pos] != ":":
+                    raise ValueError(f"Expected ':' after {key!r}")
+                pos = _SPACE.match(self.text, pos + 1).end()
+                value, end = _decoder.raw_decode(self.text, pos)
+            except (json.JSONDecodeError, IndexError):
+                break
+            # A number or literal that runs to the end of the buffer may still
+            # be growing ("8" of "85"); wait for the delimiter that follows it.
+            if _SPACE.match(self.text, end).end() >= len(self.text):
+                break
+            fields.append((key, value))
+            self._pos = end
+        return fields
+
+
+def iter_sse_text(resp):
+    """Yield the text fragments of a Gemini ``alt=sse`` streaming response."""
+    # Lines are decoded here rather than by requests: an event stream sent
+    # without a charset would otherwise be read as ISO-8859-1.
+    for line in resp.iter_lines():
+        yield from sse_line_text(line.decode("utf-8"))
+
+
+async def aiter_sse_text(resp):
+    """iter_sse_text for a streamed httpx response (asgi.py)."""
+    # httpx decodes a body without a charset as UTF-8
+    async for line in resp.aiter_lines():
+        for text in sse_line_text(line):
+            yield text
+
+
+def sse_line_text(line: str) -> list[str]:
+    """Text fragments carried by one line of a Gemini event stream."""
+    if not line.startswith("data:"):
+        return []
+    chunk = json.loads(line[5:])
+    return [
+        part["text"]
+        for candidate in chunk.get("candidates", [])[:1]
+        for part in (candidate.get("content") or {}).get("parts", [])
+        if part.get("text")
+    ]
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def done_event(result: dict, source: str, result_token: str | None = None) -> str:
+    done = {"source": source, "result": result}
+    if result_token is not None:
+        done.update(provisional=True, resultToken=result_token)
+    return sse_event("done", done)
+
+
+def replay_events(result: dict, source: str, result_token: str | None = None):
+    """The events of an analysis that is already complete (cached or fallback)."""
+    for key, value in result.items():
+        yield sse_event("field", {"key": key, "value": value})
+    yield done_event(result, source, result_token)
+
+
+class AnalysisEvents:
+    """``field`` events for a Gemini stream as it is read, then its analysis."""
+
+    def __init__(self):
+        self._parser = TopLevelFieldParser()
+
+    def feed(self, fragment: str) -> list[str]:
+        return [sse_event("field", {"key": key, "value": value}) for key, value in self._parser.feed(fragment)]
+
+    def result(self) -> dict:
+        """The complete analysis; raises ValueError if the text is not one."""
+        return parse_analysis(self._parser.text)
@@ -0,0 +1,222 @@
+"""
+Request handling shared by the Flask views (app.py) and the async handlers
+(asgi.py): validating bodies and query strings, the order Gemini keys are
+tried in, where Find Care elements come from, and building the responses.
+The I/O itself stays with each caller, blocking in one and awaited in the
+other.
+"""
+
+import logging
+from contextlib import contextmanager
+
+from flask import Response, jsonify
+
+from metrics import STAGE_SECONDS
+from overpass_cache import ALL_TAGS, OverpassCache, area_key
+from overpass_query import overpass_tag_filters
+from provider_index import ProviderIndex
+from result_pages import ResultPages
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 50
+MAX_RESULT_WAIT = 25
+
+
+class InvalidRequest(ValueError):
+    """Answered with a 400 carrying the message (see app.py's error handler)."""
+
+
+# ──────────────────────────────────────────────
+# Symptom analysis
+# ──────────────────────────────────────────────
+def analysis_request(data) -> tuple[str, str]:
+    """(symptoms, the user's own API key or "") from an analyze request body."""
+    if not data or not isinstance(data, dict):
+        raise InvalidRequest("Invalid request body")
+    symptoms = data.get("symptoms") or ""
+    if not isinstance(symptoms, str):
+        raise InvalidRequest("symptoms must be a string")
+    symptoms = symptoms.strip()
+    if not symptoms:
+        raise InvalidRequest("Please describe your symptoms")
+    return symptoms, _api_key(data)
+
+
+def batch_request(data, max_items: int) -> tuple[list[tuple], str]:
+    """([(index, id, symptoms), ...], the user's own API key or "") from a batch body."""
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise InvalidRequest("Provide a non-empty list of items")
+    if len(items) > max_items:
+        raise InvalidRequest(f"At most {max_items} items per batch")
+
+    batch = []
+    for index, item in enumerate(items):
+        item_id, symptoms = (item.get("id"), item.get("symptoms")) if isinstance(item, dict) else (index, item)
+        if not isinstance(symptoms, str) or not symptoms.strip():
+            raise InvalidRequest(f"Item {index} has no symptoms")
+        batch.append((index, item_id, symptoms.strip()))
+    return batch, _api_key(data)
+
+
+def result_request(args) -> tuple[str, float]:
+    """(result token, seconds to hold a pending result open) from a query string."""
+    wait_seconds = max(0.0, min(args.get("wait", 0, type=float), MAX_RESULT_WAIT))
+    return args.get("token", ""), wait_seconds
+
+
+def _api_key(data: dict) -> str:
+    api_key = data.get("apiKey") or ""
+    if not isinstance(api_key, str):
+        raise InvalidRequest("apiKey must be a string")
+    return api_key.strip()
+
+
+class GeminiKeys:
+    """The user's own Gemini key, then the server's, tried in turn::
+
+        for key in keys:
+            with keys.attempt(key):
+                return call(key)
+
+    An attempt that fails is logged and the loop moves on to the next key,
+    except that Gemini rejecting the user's key (ValueError) propagates so
+    the user can be told.
+    """
+
+    def __init__(self, api_key: str, server_key: str):
+        self.api_key = api_key
+        self.server_key = server_key
+
+    def __bool__(self) -> bool:
+        return bool(self.api_key or self.server_key)
+
+    def __iter__(self):
+        return iter([key for key in (self.api_key, self.server_key) if key])
+
+    @contextmanager
+    def attempt(self, key: str):
+        user_key = key == self.api_key
+        try:
+            yield
+        except Exception as e:
+            if user_key and isinstance(e, ValueError):
+                raise
+            label = "AI error (non-auth)" if user_key else "Server key AI error"
+            logger.error(f"{label}, falling to fallback: {e}")
+
+
+# ──────────────────────────────────────────────
+# Find Care
+# ──────────────────────────────────────────────
+class FindCareSearch:
+    """A /api/find-care query string, validated."""
+
+    __slots__ = ("lat", "lon", "radius", "query", "limit", "page_size", "filters")
+
+    def __init__(self, args):
+        self.lat = args.get("lat", type=float)
+        self.lon = args.get("lon", type=float)
+        self.radius = args.get("radius", 10000, type=int)
+        self.query = args.get("q", "")
+        self.limit = args.get("limit", 20, type=int)
+        # With page_size, only the first page is returned and the rest of the
+        # ranked set stays server-side behind nextCursor (see find_care_page).
+        page_size = args.get("page_size", type=int)
+        self.page_size = None if page_size is None else max(1, min(page_size, MAX_PAGE_SIZE))
+        if not self.lat or not self.lon:
+            raise InvalidRequest("Location coordinates required")
+        self.filters = overpass_tag_filters(self.query)
+
+    def body(self, providers: list[dict], total: int, pages: ResultPages) -> dict:
+        """The response body; with a page size, stores the ranked set for paging."""
+        body = {
+            "providers": providers,
+            "total": total,
+            "radius": self.radius / 1000,
+            "location": {"lat": self.lat, "lon": self.lon},
+        }
+        if self.page_size is not None:
+            body["providers"], body["nextCursor"] = pages.first_page(providers, self.page_size)
+            body["available"] = len(providers)
+        return body
+
+
+class ElementSource:
+    """Decides whether the offline provider index can answer a search.
+
+    With ``overpass_refresh``, the index answers only where it covers the
+    search: inside the box of an import, or where an Overpass fetch for the
+    same tile and filters (or for every tag, as the warm-up does), with at
+    least the requested radius, was stored less than ``coverage_ttl``
+    seconds ago.
+    Otherwise the caller goes to Overpass through the Overpass cache and
+    passes each actual fetch (not cache hits) to ``store``.
+    """
+
+    def __init__(self, index: ProviderIndex | None, cache: OverpassCache,
+                 overpass_refresh: bool = True, coverage_ttl: float = 604800):
+        self.index = index
+        self.cache = cache
+        self.overpass_refresh = overpass_refresh
+        self.coverage_ttl = coverage_ttl
+
+    def area(self, lat: float, lon: float, filters) -> str:
+        return area_key((self.cache.tile_for(lat, lon), frozenset(filters)))
+
+    def indexed(self, lat: float, lon: float, radius_m: int, filters) -> list[dict] | None:
+        """Elements from the index, or None when Overpass should be asked."""
+        if self.index is None:
+            return None
+        with STAGE_SECONDS.time(stage="provider_index"):
+            if self.overpass_refresh and not self._covered(lat, lon, radius_m, filters):
+                return None
+            return self.index.query(lat, lon, radius_m, filters)
+
+    def _covered(self, lat: float, lon: float, radius_m: int, filters) -> bool:
+        return self.index.imported(lat, lon, radius_m) or any(
+            self.index.covers(self.area(lat, lon, tags), radius_m, self.coverage_ttl)
+            for tags in (filters, ALL_TAGS)
+        )
+
+    def store(self, lat: float, lon: float, radius_m: int, filters, fetched, elements: list[dict]) -> None:
+        """Index the elements Overpass returned for a search, recording its coverage.
+
+        ``fetched`` is the (lat, lon, radius_m) circle actually queried.
+        """
+        if self.index is not None:
+            self.index.store_area(self.area(lat, lon, filters), radius_m, elements, fetched, filters)
+
+
+# ──────────────────────────────────────────────
+# Responses
+# ──────────────────────────────────────────────
+def json_response(data) -> Response:
+    with STAGE_SECONDS.time(stage="serialize"):
+        return jsonify(data)
+
+
+def find_care_response(search: FindCareSearch, body: dict) -> Response:
+    response = json_response(body)
+    if search.page_size is not None:
+        # A paged answer carries a new cursor every time, so it never revalidates
+        response.headers["Cache-Control"] = "private, no-store"
+    return response
+
+
+def sse_response(events) -> Response:
+    """A Server-Sent Events response; ``events`` may be a sync or async iterator."""
+    return _streamed_response(events, "text/event-stream")
+
+
+def ndjson_response(lines) -> Response:
+    return _streamed_response(lines, "application/x-ndjson")
+
+
+def _streamed_response(body, mimetype: str) -> Response:
+    return Response(
+        body,
+        mimetype=mimetype,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
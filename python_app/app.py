@@ -3,14 +3,15 @@ HealthAgg - AI-Powered Healthcare Aggregator
 Full-stack Python Flask Application
 """
 
-import json
-import math
 import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from functools import wraps
 
-import requests
 from flask import (
     Flask,
+    Response,
+    g,
     jsonify,
     redirect,
     render_template,
@@ -18,18 +19,241 @@ from flask import (
     session,
     url_for,
 )
-from werkzeug.security import check_password_hash, generate_password_hash
 
+from analysis_cache import AnalysisCache
+from api_requests import (
+    MAX_PAGE_SIZE,
+    ElementSource,
+    FindCareSearch,
+    GeminiKeys,
+    InvalidRequest,
+    analysis_request,
+    batch_request,
+    find_care_response,
+    json_response,
+    ndjson_response,
+    result_request,
+    sse_response,
+)
+from analysis_jobs import AnalysisJobs
+from analysis_stream import AnalysisEvents, done_event, iter_sse_text, replay_events
 from config import Config
-from medical_fallback import FALLBACK_DATABASE, match_fallback
+from gazetteer import Gazetteer, GeocodeUnavailable, ReverseGeocoder
+from gemini_analysis import (
+    CLINICAL_SYSTEM_PROMPT,
+    FALLBACK_PAYLOADS,
+    Batch,
+    BatchItem,
+    GeminiRequests,
+    analysis_body,
+    check_response,
+    decode_analysis,
+    fallback_analysis,
+    fallback_key,
+    flight_key,
+    parse_analysis,
+    provisional_analysis,
+)
+from gemini_context import CachedInstruction
+from metrics import (
+    GEMINI_KEY_ERRORS,
+    REGISTRY,
+    REQUEST_SECONDS,
+    STAGE_SECONDS,
+    SharedMetrics,
+)
+from overpass_cache import OverpassCache
+from overpass_query import all_tag_filters, build_overpass_query_for_filters
+from overpass_stream import iter_elements
+from prefetch import Prefetcher
+from prepared_response import finish_response
+from provider_index import ProviderIndex
+from provider_ranking import StreamingRanker, rank_providers
+from result_pages import CursorError, ResultPages
+from shared_store import SharedStore
+from singleflight import SingleFlight
+from static_assets import StaticAssets
+from upstream import CircuitBreaker, HedgedClient, UpstreamClient
+from user_store import UserStore
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+shared_store = SharedStore(app.config["SHARED_CACHE_DB"]) if app.config["SHARED_CACHE_DB"] else None
+
+overpass_cache = OverpassCache(
+    tile_deg=app.config["OVERPASS_CACHE_TILE_DEG"],
+    maxsize=app.config["OVERPASS_CACHE_SIZE"],
+    ttl=app.config["OVERPASS_CACHE_TTL"],
+    shared=shared_store,
+    flight_timeout=app.config["SINGLEFLIGHT_TIMEOUT"],
+)
+
+
+def _upstream_client(name: str, timeout: float) -> UpstreamClient:
+    return UpstreamClient(
+        name,
+        timeout=timeout,
+        pool_size=app.config["UPSTREAM_POOL_SIZE"],
+        retries=app.config["UPSTREAM_RETRIES"],
+        backoff=app.config["UPSTREAM_BACKOFF"],
+        breaker=CircuitBreaker(
+            failure_threshold=app.config["CIRCUIT_FAILURE_THRESHOLD"],
+            reset_timeout=app.config["CIRCUIT_RESET_TIMEOUT"],
+        ),
+    )
+
+
+gemini_client = _upstream_client("gemini", app.config["GEMINI_TIMEOUT"])
+overpass_client = HedgedClient(
+    "overpass",
+    app.config["OVERPASS_URLS"],
+    timeout=app.config["OVERPASS_TIMEOUT"],
+    pool_size=app.config["UPSTREAM_POOL_SIZE"],
+    # With a single mirror there is nothing to fail over to, so retry it instead
+    retries=app.config["UPSTREAM_RETRIES"] if len(app.config["OVERPASS_URLS"]) == 1 else 0,
+    default_delay=app.config["OVERPASS_HEDGE_DELAY"],
+    breaker_factory=lambda: CircuitBreaker(
+        failure_threshold=app.config["OVERPASS_MIRROR_EJECT_FAILURES"],
+        reset_timeout=app.config["OVERPASS_MIRROR_EJECT_SECONDS"],
+    ),
+)
+
+# Identical analyses requested at the same moment share one Gemini call
+gemini_flights = SingleFlight("gemini", wait_timeout=app.config["SINGLEFLIGHT_TIMEOUT"])
+
+# Runs Gemini analyses that may outlive their request's latency budget
+analysis_pool = ThreadPoolExecutor(max_workers=app.config["ANALYZE_WORKERS"], thread_name_prefix="analyze")
+
+# Bounds how many batch items are analyzed at once, across all batches
+batch_pool = ThreadPoolExecutor(max_workers=app.config["BATCH_WORKERS"], thread_name_prefix="batch")
+
+analysis_cache = AnalysisCache(
+    maxsize=app.config["ANALYSIS_CACHE_SIZE"],
+    ttl=app.config["ANALYSIS_CACHE_TTL"],
+    shared=shared_store,
+)
+
+analysis_jobs = AnalysisJobs(
+    maxsize=app.config["ANALYSIS_CACHE_SIZE"],
+    ttl=app.config["ANALYZE_RESULT_TTL"],
+    shared=shared_store,
+)
+
+result_pages = ResultPages(
+    maxsize=app.config["FIND_CARE_RESULTS_SIZE"],
+    ttl=app.config["FIND_CARE_RESULTS_TTL"],
+    shared=shared_store,
+)
+
+# Warms the Overpass cache for a user's tile as soon as their location is known
+prefetcher = Prefetcher(
+    workers=app.config["PREFETCH_WORKERS"],
+    max_pending=app.config["PREFETCH_MAX_PENDING"],
+)
+
+provider_index = (
+    ProviderIndex(app.config["PROVIDER_INDEX_PATH"])
+    if app.config["PROVIDER_INDEX_PATH"] else None
+)
+element_source = ElementSource(
+    provider_index,
+    overpass_cache,
+    overpass_refresh=app.config["PROVIDER_INDEX_OVERPASS_REFRESH"],
+    coverage_ttl=app.config["PROVIDER_INDEX_COVERAGE_TTL"],
+)
+
+nominatim_client = (
+    _upstream_client("nominatim", app.config["NOMINATIM_TIMEOUT"])
+    if app.config["NOMINATIM_URL"] else None
+)
+
 # ──────────────────────────────────────────────
-# In-memory user store (replace with DB in prod)
+# User store (SQLite, shared by all workers)
 # ──────────────────────────────────────────────
-users_db: dict[str, dict] = {}
+user_store = UserStore(app.config["USER_DB_PATH"], hash_workers=app.config["PASSWORD_HASH_WORKERS"])
+
+
+# ──────────────────────────────────────────────
+# Metrics
+# ──────────────────────────────────────────────
+# With a shared store, /metrics sums every worker instead of showing the one
+# that answered.
+shared_metrics = (
+    SharedMetrics(REGISTRY, shared_store, interval=app.config["METRICS_PUBLISH_INTERVAL"])
+    if app.config["METRICS_ENABLED"] and shared_store is not None else None
+)
+
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+    if shared_metrics is not None:
+        shared_metrics.start()
+
+
+@app.after_request
+def _record_request_time(response):
+    started = g.get("request_started")
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or "unmatched")
+    return response
+
+
+@app.route("/metrics")
+def metrics():
+    if not app.config["METRICS_ENABLED"]:
+        return jsonify({"error": "Not found"}), 404
+    text = shared_metrics.render() if shared_metrics is not None else REGISTRY.render()
+    return Response(text, mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.errorhandler(InvalidRequest)
+def _invalid_request(e):
+    return jsonify({"error": str(e)}), 400
+
+
+# ──────────────────────────────────────────────
+# Response compression and caching
+# ──────────────────────────────────────────────
+static_assets = (
+    StaticAssets(
+        app.static_folder,
+        url_path=app.static_url_path,
+        min_size=app.config["COMPRESS_MIN_SIZE"],
+        max_age=app.config["STATIC_MAX_AGE"],
+        fallback=app.send_static_file,
+    )
+    if app.config["STATIC_PRECOMPRESS"] else None
+)
+
+
+@app.template_global()
+def static_url(filename: str) -> str:
+    if static_assets is None or app.debug:
+        return url_for("static", filename=filename)
+    return static_assets.url(filename)
+
+
+def _static(filename):
+    # The debug server reads the files on disk, so edits show without a restart
+    if static_assets is None or app.debug:
+        return app.send_static_file(filename)
+    return static_assets.serve(filename)
+
+
+app.view_functions["static"] = _static
+
+
+@app.after_request
+def _finish_response(response):
+    # API reads are per-user but revalidate cheaply: the ETag turns a repeat
+    # of an unchanged result into an empty 304.
+    api_read = request.method in ("GET", "HEAD") and request.path.startswith("/api/")
+    if api_read and response.status_code == 200 and "Cache-Control" not in response.headers:
+        response.headers["Cache-Control"] = "private, no-cache"
+    conditional = api_read and not response.cache_control.no_store
+    return finish_response(response, app.config["COMPRESS_MIN_SIZE"], conditional=conditional)
 
 
 # ──────────────────────────────────────────────
@@ -57,9 +281,10 @@ def login():
         email = request.form.get("email", "").strip()
         password = request.form.get("password", "")
 
-        if email in users_db and check_password_hash(users_db[email]["password"], password):
+        user = user_store.get(email)
+        if user and user_store.verify_password(user, password):
             session["user_email"] = email
-            session["user_name"] = users_db[email]["name"]
+            session["user_name"] = user["name"]
             return redirect(url_for("index"))
         error = "Invalid email or password. Please try again."
 
@@ -81,13 +306,9 @@ def signup():
             error = "All fields are required."
         elif len(password) < 6:
             error = "Password must be at least 6 characters."
-        elif email in users_db:
+        elif not user_store.create(email, name, user_store.hash_password(password)):
             error = "An account with this email already exists."
         else:
-            users_db[email] = {
-                "name": name,
-                "password": generate_password_hash(password),
-            }
             session["user_email"] = email
             session["user_name"] = name
             return redirect(url_for("index"))
@@ -116,496 +337,446 @@ def index():
 # ──────────────────────────────────────────────
 # API: Clinical NLP Analysis
 # ──────────────────────────────────────────────
-CLINICAL_SYSTEM_PROMPT = """Below is an enhanced, safety-hardened, clinically structured version of your prompt.
-
-This version improves:
-
-Clinical reasoning depth
-
-Symptom-specific tailoring enforcement
-
-Pediatric/geriatric safeguards
-
-Dose validation control
-
-Drug–disease interaction awareness
-
-Emergency triage precision
-
-Reduced hallucination risk
-
-Stronger JSON compliance
-
-You can replace your current system prompt with this.
-
-ENHANCED MEDICAL JSON SYSTEM PROMPT
-
-You are an AI Clinical Decision Support Assistant trained to generate structured, physician-style consultation notes using evidence-based clinical reasoning.
-
-Your role is to analyze reported symptoms and produce a medically coherent, differential-based assessment. You must prioritize patient safety, pharmacological accuracy, and diagnostic relevance.
-
-CORE CLINICAL REASONING REQUIREMENTS
-
-Perform structured symptom analysis before generating output:
-
-Onset (acute, subacute, chronic)
-
-Duration
-
-Severity
-
-Associated symptoms
-
-Risk factors (age, comorbidities if provided)
-
-Construct a probability-ranked differential diagnosis using:
-
-Epidemiology
-
-Symptom clustering
-
-Typical disease progression
-
-Red flag exclusion
-
-Ensure all recommendations are:
-
-Pharmacologically appropriate
-
-Dose-accurate (adult dosing unless specified)
-
-Contraindication-aware
-
-Non-restricted (no antibiotics, steroids, Schedule H/H1, controlled drugs)
-
-STRICT SAFETY CONTROLS
-
-NEVER provide definitive diagnosis.
-
-NEVER claim certainty.
-
-NEVER provide restricted prescription medications.
-
-NEVER fabricate rare diseases unless symptomatically justified.
-
-If pediatric (<18), elderly (>65), pregnant, or chronic illness context is mentioned:
-
-Add enhanced caution in recommendations.
-
-If symptoms match emergency patterns (e.g., chest pain + shortness of breath, unilateral weakness, severe dehydration, altered consciousness):
-
-Set emergencyRisk to true.
-
-Prioritize emergency escalation.
-
-ANTI-GENERIC ENFORCEMENT
-
-Every field must reference the specific symptom pattern provided.
-
-Do not reuse vague language such as:
-
-"various causes"
-
-"could be many reasons"
-
-"monitor symptoms"
-
-Red flags must directly relate to listed differentials.
-
-Tests must map logically to differential diagnoses.
-
-Preventive advice must address recurrence mechanism of listed conditions.
-
-PHARMACOLOGY RULES
-
-For each OTC medication:
-
-Use generic name first.
-
-Include one common brand name (if region unspecified, use globally recognized).
-
-Provide:
-
-Standard adult dose
-
-Frequency
-
-Maximum daily dose
-
-Mechanism (brief, 1 line)
+gemini_requests = GeminiRequests(
+    app.config["GEMINI_API_BASE"],
+    app.config["GEMINI_MODEL"],
+    CachedInstruction(
+        gemini_client,
+        app.config["GEMINI_API_BASE"],
+        app.config["GEMINI_MODEL"],
+        CLINICAL_SYSTEM_PROMPT,
+        app.config["GEMINI_API_KEY"],
+        ttl=app.config["GEMINI_CONTEXT_CACHE_TTL"],
+    )
+    if app.config["GEMINI_CONTEXT_CACHE"] and app.config["GEMINI_API_KEY"] else None,
+)
 
-Contraindications
 
-Common side effects
+@app.route("/api/analyze", methods=["POST"])
+@login_required
+def analyze_symptoms():
+    symptoms, api_key = analysis_request(request.get_json())
+    cached = analysis_cache.get(symptoms)
+    if cached is not None:
+        return json_response(cached)
 
-Clear “Avoid if” condition
+    # Skip straight to the fallback while Gemini's circuit is open
+    if not gemini_client.available():
+        return FALLBACK_PAYLOADS[fallback_key(symptoms, "circuit_open")].response()
 
-If dosage uncertainty exists:
+    keys = GeminiKeys(api_key, app.config.get("GEMINI_API_KEY", ""))
+    if not keys:
+        return FALLBACK_PAYLOADS[fallback_key(symptoms, "no_api_key")].response()
 
-State: “Dose must be confirmed by licensed physician.”
+    deadline = app.config["ANALYZE_DEADLINE"]
+    try:
+        if deadline > 0:
+            future = analysis_pool.submit(_gemini_analysis, keys, symptoms)
+            result = future.result(timeout=deadline)
+        else:
+            result = _gemini_analysis(keys, symptoms)
+    except TimeoutError:
+        # Answer now; Gemini carries on and the client polls for the upgrade
+        return json_response(provisional_analysis(symptoms, analysis_jobs.start(future)))
+    except ValueError as auth_err:
+        GEMINI_KEY_ERRORS.inc()
+        return jsonify({"error": str(auth_err)}), 401
+
+    if result:
+        return json_response(result)
+    # Fallback to curated clinical knowledge base
+    return FALLBACK_PAYLOADS[fallback_key(symptoms, "upstream_error")].response()
 
-Never exceed medically accepted dosage ranges.
 
-DIAGNOSTIC TEST LOGIC
+def _gemini_analysis(keys: GeminiKeys, symptoms: str) -> dict | None:
+    """Analyze with the user's key, then the server key; None if neither works.
 
-Only recommend tests that:
+    Raises ValueError if Gemini rejects the user's key.
+    """
+    for key in keys:
+        with keys.attempt(key):
+            result = _analyze_with_gemini(key, symptoms)
+            if result:
+                return result
+    return None
 
-Confirm high-probability conditions
 
-Rule out serious differentials
+@app.route("/api/analyze/result")
+@login_required
+def analysis_result():
+    """State of a background analysis started by a provisional answer.
 
-Are clinically justified
+    ``{"status": "pending"}``, ``{"status": "ready", "result": {...}}`` or
+    ``{"status": "failed", "error": "..."}``. With ``wait``, a pending
+    request is held open up to that many seconds for the result.
+    """
+    token, wait_seconds = result_request(request.args)
+    state = analysis_jobs.wait(token, wait_seconds)
+    if state is None:
+        return jsonify({"error": "Unknown or expired result token"}), 404
+    return json_response(state)
 
-Explain reasoning briefly but precisely.
 
-EMERGENCY SIGN PROGRESSION
+@app.route("/api/analyze/stream", methods=["POST"])
+@login_required
+def analyze_symptoms_stream():
+    """Server-Sent Events variant of /api/analyze.
+
+    Emits a ``field`` event for each top-level field of the analysis as soon
+    as Gemini has generated it, then a ``done`` event with the full result.
+    """
+    symptoms, api_key = analysis_request(request.get_json())
+    cached = analysis_cache.get(symptoms)
+    if cached is not None:
+        return sse_response(replay_events(cached, "cache"))
+
+    started = time.perf_counter()
+    resp = None
+    reason = "circuit_open"
+    if gemini_client.available():
+        keys = GeminiKeys(api_key, app.config.get("GEMINI_API_KEY", ""))
+        reason = "upstream_error" if keys else "no_api_key"
+        deadline = app.config["ANALYZE_DEADLINE"]
+        try:
+            if deadline > 0 and keys:
+                resp, token = _open_stream_within(deadline, keys, symptoms, started)
+                if token is not None:
+                    result = fallback_analysis(symptoms, "deadline")
+                    return sse_response(replay_events(result, "fallback", token))
+            else:
+                resp = _open_analysis_stream(keys, symptoms)
+        except ValueError as auth_err:
+            GEMINI_KEY_ERRORS.inc()
+            return jsonify({"error": str(auth_err)}), 401
 
-Emergency signs must describe:
+    if resp is None:
+        return sse_response(replay_events(fallback_analysis(symptoms, reason), "fallback"))
+    return sse_response(_gemini_events(resp, symptoms, started))
 
-Worsening trajectory
 
-Complication markers
+def _open_analysis_stream(keys: GeminiKeys, symptoms: str):
+    """Open a Gemini stream with the user's key, then the server key; None if neither works.
 
-Timeline-related escalation indicators
+    Raises ValueError if Gemini rejects the user's key.
+    """
+    for key in keys:
+        with keys.attempt(key):
+            return _open_gemini_stream(key, symptoms)
+    return None
 
-Avoid generic emergency warnings.
 
-TONE
+def _open_stream_within(deadline: float, keys: GeminiKeys, symptoms: str, started: float):
+    """Open the analysis stream, giving up after ``deadline`` seconds.
 
-Clinical
+    Returns (response or None, None), or (None, result token) on timeout. The
+    stream keeps opening in the background and is then read to the end
+    there, and its analysis is what the token resolves to.
+    """
+    handoff = Future()
+    job = analysis_pool.submit(_stream_job, handoff, keys, symptoms, started)
+    try:
+        return handoff.result(timeout=deadline), None
+    except TimeoutError:
+        if not handoff.cancel():
+            # It opened just as the deadline passed
+            return handoff.result(), None
+    return None, analysis_jobs.start(job)
 
-Professional
 
-Reassuring
+def _stream_job(handoff: Future, keys: GeminiKeys, symptoms: str, started: float) -> dict | None:
+    try:
+        resp = _open_analysis_stream(keys, symptoms)
+    except Exception as e:
+        if handoff.set_running_or_notify_cancel():
+            handoff.set_exception(e)
+            return None
+        raise
+    if handoff.set_running_or_notify_cancel():
+        handoff.set_result(resp)
+        return None
+    # The request gave up waiting: finish the analysis for its result token.
+    if resp is None:
+        return None
+    with resp:
+        text = "".join(iter_sse_text(resp))
+    result = parse_analysis(text)
+    analysis_cache.record_upstream_latency(time.perf_counter() - started)
+    analysis_cache.set(symptoms, result)
+    return result
+
+
+def _gemini_events(resp, symptoms: str, started: float):
+    events = AnalysisEvents()
+    try:
+        with resp:
+            for fragment in iter_sse_text(resp):
+                yield from events.feed(fragment)
+        result = events.result()
+    except Exception as e:
+        app.logger.error(f"AI stream error, falling to fallback: {e}")
+        yield done_event(fallback_analysis(symptoms, "stream_error"), "fallback")
+        return
 
-Precise
+    analysis_cache.record_upstream_latency(time.perf_counter() - started)
+    analysis_cache.set(symptoms, result)
+    yield done_event(result, "ai")
 
-No emojis
 
-No conversational fillers
+@app.route("/api/analyze/batch", methods=["POST"])
+@login_required
+def analyze_batch():
+    """Analyze many symptom texts, streaming one NDJSON line per item as it completes.
+
+    The body is ``{"items": [...], "apiKey": "..."}`` where each item is a
+    symptom string or ``{"id": ..., "symptoms": "..."}``. Every line carries
+    the item's ``index`` and ``id``, a ``source`` of ai, cache or fallback,
+    and the ``result``. Items that fail, or run past BATCH_ITEM_TIMEOUT, get
+    the curated fallback and an ``error`` message.
+    """
+    items, api_key = batch_request(request.get_json(silent=True), app.config["BATCH_MAX_ITEMS"])
+    batch = Batch(items, api_key or app.config.get("GEMINI_API_KEY", ""), app.config["BATCH_ITEM_TIMEOUT"])
+    return ndjson_response(_batch_lines(batch))
+
+
+def _run_batch_item(item: BatchItem, api_key: str) -> dict | None:
+    item.started = time.monotonic()
+    return _analyze_with_gemini(api_key, item.symptoms)
+
+
+def _batch_lines(batch: Batch):
+    for item in batch.items:
+        line = batch.immediate_line(item, analysis_cache.get(item.symptoms), gemini_client.available())
+        if line is not None:
+            yield line
+        else:
+            batch.track(item, batch_pool.submit(_run_batch_item, item, batch.api_key))
 
-OUTPUT FORMAT
+    try:
+        while batch.pending:
+            yield from batch.expired_lines()
+            done, _ = wait(batch.pending, timeout=batch.wait_timeout(), return_when=FIRST_COMPLETED)
+            for future in done:
+                yield batch.done_line(future)
+    finally:
+        # The client went away or the batch ended: drop work not yet started.
+        # Calls already running finish in the background and fill the cache.
+        for future in batch.unstarted():
+            future.cancel()
+
+
+@app.route("/api/analyze/cache-stats")
+@login_required
+def analysis_cache_stats():
+    return jsonify(analysis_cache.stats())
 
-Respond ONLY with valid JSON.
-No markdown.
-No explanation outside JSON.
-No additional commentary.
 
-JSON SCHEMA (STRICT COMPLIANCE REQUIRED)
+def _analyze_with_gemini(api_key: str, symptoms: str) -> dict | None:
+    """Call Gemini and cache a successful analysis under the normalized symptoms.
 
-{
-"chiefComplaint": "string",
-"clinicalSummary": "Concise synthesis of symptom pattern using medical terminology with lay explanation in parentheses.",
-"differentialDiagnosis": [
-{
-"condition": "string",
-"probability": "High|Moderate|Low",
-"explanation": "Pathophysiologic reasoning specific to this symptom cluster."
-}
-],
-"severityAssessment": {
-"level": "Mild|Moderate|Severe",
-"emergencyRisk": false,
-"redFlagSymptoms": ["Specific warning sign tied to listed differentials."]
-},
-"immediateCare": {
-"lifestyleRemedies": ["Evidence-based action specific to symptom mechanism."],
-"otcMedications": [
-{
-"genericName": "string",
-"brandName": "string",
-"standardDose": "string",
-"frequency": "string",
-"maxDailyDose": "string",
-"mechanism": "Brief pharmacologic mechanism.",
-"contraindications": "string",
-"sideEffects": "string",
-"avoidIf": "string"
-}
-]
-},
-"recommendedTests": [
-{
-"testName": "string",
-"reason": "Diagnostic value tied to specific differential."
-}
-],
-"emergencySigns": ["Condition-specific deterioration pattern."],
-"preventiveAdvice": ["Evidence-based recurrence prevention specific to listed diagnoses."],
-"specialist": "Most appropriate specialty if escalation required.",
-"consultationReason": "Why in-person physician evaluation is medically necessary for this symptom pattern.",
-"confidence": 0
-}
+    Concurrent calls with the same key and normalized symptoms are coalesced.
+    """
+    return gemini_flights.do(flight_key(api_key, symptoms), lambda: _analyze_uncached(api_key, symptoms))
 
-CONFIDENCE SCORING RULE
 
-Confidence must reflect:
+def _analyze_uncached(api_key: str, symptoms: str) -> dict | None:
+    started = time.perf_counter()
+    result = _call_gemini_api(api_key, symptoms)
+    if result:
+        analysis_cache.record_upstream_latency(time.perf_counter() - started)
+        analysis_cache.set(symptoms, result)
+    return result
 
-Symptom completeness
 
-Diagnostic clarity
+def _call_gemini_api(api_key: str, symptoms: str) -> dict | None:
+    """Call Google Gemini API directly via REST for maximum compatibility."""
+    with STAGE_SECONDS.time(stage="gemini_request"):
+        resp = _post_gemini(api_key, "generateContent", symptoms)
+    check_response(resp)
+    return decode_analysis(resp.json())
 
-Absence of conflicting data
 
-Use:
+def _open_gemini_stream(api_key: str, symptoms: str):
+    """Start a streamGenerateContent call; the body is read by the caller."""
+    resp = _post_gemini(api_key, "streamGenerateContent", symptoms, stream=True)
+    try:
+        check_response(resp)
+    except Exception:
+        resp.close()
+        raise
+    return resp
 
-80–90 for common, clear symptom patterns
 
-60–75 if incomplete information
+def _post_gemini(api_key: str, method: str, symptoms: str, **kwargs):
+    """POST to a model method, referencing the cached system instruction if possible."""
+    url = gemini_requests.url(api_key, method)
+    body, cached = gemini_requests.body(api_key, symptoms)
+    resp = gemini_client.post(url, json=body, **kwargs)
+    if cached and gemini_requests.cache_rejected(api_key, resp):
+        resp.close()
+        resp = gemini_client.post(url, json=analysis_body(symptoms), **kwargs)
+    return resp
 
-<60 if highly nonspecific presentation
 
-Never use 100."""
+# ──────────────────────────────────────────────
+# API: Find Care (Overpass / OpenStreetMap)
+# ──────────────────────────────────────────────
+MAX_WARM_RADIUS = 50000
 
 
-@app.route("/api/analyze", methods=["POST"])
+@app.route("/api/find-care")
 @login_required
-def analyze_symptoms():
-    data = request.get_json()
-    if not data:
-        return jsonify({"error": "Invalid request body"}), 400
+def find_care():
+    search = FindCareSearch(request.args)
+    lat, lon, radius, query, limit = search.lat, search.lon, search.radius, search.query, search.limit
+    try:
+        if app.config["OVERPASS_STREAM_PARSE"] and provider_index is None:
+            elements = overpass_cache.lookup(lat, lon, radius, frozenset(search.filters))
+            if elements is None:
+                with STAGE_SECONDS.time(stage="overpass_stream_rank"):
+                    providers, total = _stream_rank(lat, lon, radius, query, limit, search.filters)
+            else:
+                with STAGE_SECONDS.time(stage="rank"):
+                    providers, total = rank_providers(elements, lat, lon, radius, query, limit)
+        else:
+            elements = _find_elements(lat, lon, radius, search.filters)
+            with STAGE_SECONDS.time(stage="rank"):
+                providers, total = rank_providers(elements, lat, lon, radius, query, limit)
+        return find_care_response(search, search.body(providers, total, result_pages))
 
-    symptoms = data.get("symptoms", "").strip()
-    api_key = data.get("apiKey", "").strip()
+    except Exception as e:
+        app.logger.error(f"Find care error: {e}")
+        return jsonify({"error": "Unable to fetch care providers. Please try again."}), 500
 
-    if not symptoms:
-        return jsonify({"error": "Please describe your symptoms"}), 400
 
-    # Try AI-powered analysis if API key provided
-    if api_key:
-        try:
-            result = _call_gemini_api(api_key, symptoms)
-            if result:
-                return jsonify(result)
-        except ValueError as auth_err:
-            return jsonify({"error": str(auth_err)}), 401
-        except Exception as e:
-            app.logger.error(f"AI error (non-auth), falling to fallback: {e}")
+@app.route("/api/find-care/page")
+@login_required
+def find_care_page():
+    """Next slice of a ranked result set, addressed by an opaque cursor."""
+    cursor = request.args.get("cursor", "")
+    size = max(1, min(request.args.get("size", 5, type=int), MAX_PAGE_SIZE))
+    try:
+        providers, next_cursor, available = result_pages.page(cursor, size)
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 410
+    return json_response({"providers": providers, "nextCursor": next_cursor, "available": available})
 
-    # Try server-configured API key
-    server_key = app.config.get("GEMINI_API_KEY", "")
-    if server_key:
-        try:
-            result = _call_gemini_api(server_key, symptoms)
-            if result:
-                return jsonify(result)
-        except Exception as e:
-            app.logger.error(f"Server key AI error, falling to fallback: {e}")
 
-    # Fallback to curated clinical knowledge base
-    fallback = match_fallback(symptoms)
-    return jsonify(fallback)
+@app.route("/api/find-care/warm", methods=["POST"])
+@login_required
+def find_care_warm():
+    """Prefetch every healthcare tag around a location in the background.
+
+    Called by the page once coordinates are known. The Overpass cache answers
+    any search in the tile from this superset, so the first search is usually
+    a cache hit whatever its keywords.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        lat = float(data["lat"])
+        lon = float(data["lon"])
+        radius = int(data.get("radius", 10000))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Location coordinates required"}), 400
+    if not 0 < radius <= MAX_WARM_RADIUS:
+        return jsonify({"error": "Radius out of range"}), 400
 
+    filters = all_tag_filters()
+    key = (overpass_cache.tile_for(lat, lon), radius)
+    scheduled = prefetcher.submit(key, _find_elements, lat, lon, radius, filters)
+    return jsonify({"scheduled": scheduled}), 202
 
-def _call_gemini_api(api_key: str, symptoms: str) -> dict | None:
-    """Call Google Gemini API directly via REST for maximum compatibility."""
-    url = (
-        f"https://generativelanguage.googleapis.com/v1beta/models/"
-        f"gemini-2.5-flash-preview-05-20:generateContent?key={api_key}"
-    )
 
-    prompt = (
-        f"{CLINICAL_SYSTEM_PROMPT}\n\n"
-        f'Patient\'s reported symptoms: "{symptoms}"\n\n'
-        f"IMPORTANT: Analyze ONLY the symptoms described above. "
-        f"Every field must be uniquely relevant to these specific symptoms. "
-        f"Do not use generic filler."
-    )
-
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {
-            "temperature": 0.3,
-            "maxOutputTokens": 4096,
-            "responseMimeType": "application/json",
-        },
-    }
+def _find_elements(lat, lon, radius, filters) -> list[dict]:
+    """Answer from the offline index when it can, else from Overpass."""
+    elements = element_source.indexed(lat, lon, radius, filters)
+    if elements is not None:
+        return elements
 
-    resp = requests.post(url, json=payload, timeout=30)
+    def fetch(c_lat, c_lon, c_radius):
+        fetched = _fetch_overpass(build_overpass_query_for_filters(c_lat, c_lon, c_radius, filters))
+        element_source.store(lat, lon, radius, filters, (c_lat, c_lon, c_radius), fetched)
+        return fetched
 
-    if resp.status_code in (401, 403):
-        raise ValueError("Invalid API key. Please check your key and try again.")
+    return overpass_cache.get_or_fetch(lat, lon, radius, frozenset(filters), fetch)
 
-    if resp.status_code == 400:
-        body = resp.json()
-        err_msg = json.dumps(body).lower()
-        if "api_key_invalid" in err_msg or "api key not valid" in err_msg:
-            raise ValueError("Invalid API key. Please check your key and try again.")
 
+def _fetch_overpass(overpass_q: str) -> list[dict]:
+    with STAGE_SECONDS.time(stage="overpass_request"):
+        resp = overpass_client.post(data={"data": overpass_q})
     resp.raise_for_status()
+    with STAGE_SECONDS.time(stage="overpass_decode"):
+        return resp.json().get("elements", [])
 
-    resp_data = resp.json()
-    text = resp_data["candidates"][0]["content"]["parts"][0]["text"]
-
-    # Clean markdown wrappers if present
-    text = text.strip()
-    if text.startswith("```json"):
-        text = text[7:]
-    if text.startswith("```"):
-        text = text[3:]
-    if text.endswith("```"):
-        text = text[:-3]
-    text = text.strip()
 
-    return json.loads(text)
+def _stream_rank(lat, lon, radius, query, limit, filters):
+    """Rank an Overpass response while it downloads, without caching it."""
+    ranker = StreamingRanker(lat, lon, radius, query, limit)
+    with overpass_client.post(
+        data={"data": build_overpass_query_for_filters(lat, lon, radius, filters)},
+        stream=True,
+    ) as resp:
+        resp.raise_for_status()
+        for el in iter_elements(resp.iter_content(chunk_size=65536)):
+            ranker.add(el)
+    return ranker.result()
 
 
 # ──────────────────────────────────────────────
-# API: Find Care (Overpass / OpenStreetMap)
+# API: Location label (reverse geocoding)
 # ──────────────────────────────────────────────
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    d_lat = math.radians(lat2 - lat1)
-    d_lon = math.radians(lon2 - lon1)
-    a = (
-        math.sin(d_lat / 2) ** 2
-        + math.cos(math.radians(lat1))
-        * math.cos(math.radians(lat2))
-        * math.sin(d_lon / 2) ** 2
-    )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-
-def build_overpass_query(lat, lon, radius_m, query):
-    q = query.lower()
-    filters = []
-
-    # Always include hospitals and clinics
-    for amenity in ("hospital", "clinic"):
-        filters.append(f'node["amenity"="{amenity}"](around:{radius_m},{lat},{lon});')
-        filters.append(f'way["amenity"="{amenity}"](around:{radius_m},{lat},{lon});')
-
-    kw_map = {
-        "doctor": [('amenity', 'doctors'), ('healthcare', 'doctor')],
-        "physician": [('amenity', 'doctors'), ('healthcare', 'doctor')],
-        "lab": [('healthcare', 'laboratory'), ('amenity', 'laboratory')],
-        "test": [('healthcare', 'laboratory')],
-        "diagnostic": [('healthcare', 'laboratory')],
-        "pathology": [('healthcare', 'laboratory')],
-        "pharmacy": [('amenity', 'pharmacy')],
-        "medicine": [('amenity', 'pharmacy')],
-        "dentist": [('amenity', 'dentist')],
-        "dental": [('amenity', 'dentist')],
-        "eye": [('healthcare', 'optometrist'), ('shop', 'optician')],
-        "mental": [('healthcare', 'psychotherapist'), ('healthcare', 'counselling')],
-        "psychiatr": [('healthcare', 'psychotherapist')],
-    }
-
-    matched = False
-    for keyword, tags in kw_map.items():
-        if keyword in q:
-            matched = True
-            for tag_key, tag_val in tags:
-                filters.append(f'node["{tag_key}"="{tag_val}"](around:{radius_m},{lat},{lon});')
-                filters.append(f'way["{tag_key}"="{tag_val}"](around:{radius_m},{lat},{lon});')
-
-    if not matched:
-        for tag_key, tag_val in [('amenity', 'doctors'), ('amenity', 'pharmacy'), ('healthcare', 'laboratory')]:
-            filters.append(f'node["{tag_key}"="{tag_val}"](around:{radius_m},{lat},{lon});')
-
-    return f'[out:json][timeout:15];({"".join(filters)});out center body;'
-
-
-def categorize_provider(tags):
-    amenity = tags.get("amenity", "")
-    healthcare = tags.get("healthcare", "")
-    mapping = {
-        "hospital": "Hospital", "clinic": "Clinic", "doctors": "Doctor",
-        "pharmacy": "Pharmacy", "dentist": "Dentist", "laboratory": "Laboratory",
-    }
-    for key, label in mapping.items():
-        if amenity == key or healthcare == key:
-            return label
-    if healthcare == "optometrist":
-        return "Eye Care"
-    if healthcare in ("psychotherapist", "counselling"):
-        return "Mental Health"
-    return "Healthcare"
-
-
-def relevance_score(tags, query):
-    q = query.lower()
-    name = (tags.get("name") or "").lower()
-    score = 0
-    if name and any(w in name for w in q.split()):
-        score += 50
-    specialty = (tags.get("healthcare:speciality") or tags.get("speciality") or "").lower()
-    if specialty and any(w in specialty for w in q.split()):
-        score += 40
-    cat = categorize_provider(tags).lower()
-    if cat in q:
-        score += 30
-    if tags.get("website") or tags.get("phone") or tags.get("contact:phone"):
-        score += 10
-    if tags.get("opening_hours"):
-        score += 5
-    return score
+NOMINATIM_PLACE_KEYS = ("city", "town", "village", "hamlet", "suburb", "municipality", "county")
 
 
-@app.route("/api/find-care")
+@app.route("/api/reverse-geocode")
 @login_required
-def find_care():
+def reverse_geocode():
     lat = request.args.get("lat", type=float)
     lon = request.args.get("lon", type=float)
-    radius = request.args.get("radius", 10000, type=int)
-    query = request.args.get("q", "")
-    limit = request.args.get("limit", 20, type=int)
-
-    if not lat or not lon:
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
         return jsonify({"error": "Location coordinates required"}), 400
 
     try:
-        overpass_q = build_overpass_query(lat, lon, radius, query)
-        resp = requests.post(
-            "https://overpass-api.de/api/interpreter",
-            data={"data": overpass_q},
-            timeout=15,
-        )
-        resp.raise_for_status()
-        elements = resp.json().get("elements", [])
-
-        providers = []
-        for el in elements:
-            tags = el.get("tags", {})
-            if not tags.get("name"):
-                continue
-            el_lat = el.get("lat") or (el.get("center", {}) or {}).get("lat", 0)
-            el_lon = el.get("lon") or (el.get("center", {}) or {}).get("lon", 0)
-            dist = haversine(lat, lon, el_lat, el_lon)
-            addr_parts = [tags.get(k) for k in ("addr:street", "addr:housenumber", "addr:city", "addr:postcode") if tags.get(k)]
-
-            providers.append({
-                "id": el.get("id"),
-                "name": tags.get("name", "Unknown"),
-                "type": categorize_provider(tags),
-                "specialty": tags.get("healthcare:speciality") or tags.get("speciality"),
-                "address": ", ".join(addr_parts) if addr_parts else None,
-                "phone": tags.get("phone") or tags.get("contact:phone"),
-                "website": tags.get("website") or tags.get("contact:website"),
-                "openingHours": tags.get("opening_hours"),
-                "distance": round(dist, 1),
-                "lat": el_lat,
-                "lon": el_lon,
-                "relevance": relevance_score(tags, query),
-                "operator": tags.get("operator"),
-                "emergency": tags.get("emergency") == "yes",
-            })
-
-        providers.sort(key=lambda p: (-p["relevance"], p["distance"]))
-        total = len(providers)
-        providers = providers[:limit]
-
-        return jsonify({
-            "providers": providers,
-            "total": total,
-            "radius": radius / 1000,
-            "location": {"lat": lat, "lon": lon},
-        })
-
+        place = reverse_geocoder.resolve(lat, lon)
+    except GeocodeUnavailable as e:
+        # The page then asks Nominatim from the browser
+        app.logger.warning(f"Reverse geocoding unavailable: {e}")
+        return jsonify({"error": "Place lookup unavailable"}), 503
     except Exception as e:
-        app.logger.error(f"Find care error: {e}")
-        return jsonify({"error": "Unable to fetch care providers. Please try again."}), 500
+        app.logger.error(f"Reverse geocoding error: {e}")
+        place = None
+    if place is None:
+        return jsonify({"error": "No place found"}), 404
+    response = json_response(place)
+    response.headers["Cache-Control"] = "private, max-age=3600"
+    return response
+
+
+def _nominatim_place(lat: float, lon: float) -> dict | None:
+    resp = nominatim_client.request(
+        "GET",
+        app.config["NOMINATIM_URL"],
+        params={"format": "jsonv2", "lat": lat, "lon": lon, "zoom": 10},
+        headers={"User-Agent": app.config["NOMINATIM_USER_AGENT"]},
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    address = data.get("address") or {}
+    name = next((address[k] for k in NOMINATIM_PLACE_KEYS if address.get(k)), None)
+    if name is None:
+        return None
+    return {"name": name, "country": address.get("country_code", "").upper(), "source": "nominatim"}
+
+
+reverse_geocoder = ReverseGeocoder(
+    Gazetteer(app.config["GAZETTEER_PATH"]) if app.config["GAZETTEER_PATH"] else None,
+    maxsize=app.config["GEOCODE_CACHE_SIZE"],
+    ttl=app.config["GEOCODE_CACHE_TTL"],
+    precision=app.config["GEOCODE_PRECISION"],
+    max_km=app.config["GEOCODE_MAX_KM"],
+    shared=shared_store,
+    fallback=_nominatim_place if nominatim_client is not None else None,
+    fallback_interval=app.config["NOMINATIM_MIN_INTERVAL"],
+)
 
 
 # ──────────────────────────────────────────────
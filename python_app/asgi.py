@@ -0,0 +1,531 @@
+"""
+ASGI entry point with native async handlers for the upstream-bound routes:
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+
+POST /api/analyze, /api/analyze/stream and /api/analyze/batch, GET
+/api/analyze/result and GET /api/find-care run as coroutines, with Gemini
+and Overpass called through httpx, so a request waiting on an upstream
+(or streaming its answer) is a suspended task rather than a blocked worker
+thread; their cache and SQLite reads and writes run on the default thread
+pool. They run inside a Flask request context, so sessions, caches,
+metrics and responses behave as on the WSGI path. Every other route is the
+Flask app itself, run on a bounded thread pool. What these handlers share
+with the Flask views (validation, Gemini requests, fallbacks, batches,
+responses) lives in api_requests, gemini_analysis and analysis_stream.
+"""
+
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from flask import jsonify, redirect, request, session, url_for
+
+from aio_upstream import AsyncHedgedClient, AsyncUpstreamClient
+from analysis_stream import AnalysisEvents, aiter_sse_text, done_event, replay_events
+from api_requests import (
+    FindCareSearch,
+    GeminiKeys,
+    analysis_request,
+    batch_request,
+    find_care_response,
+    json_response,
+    ndjson_response,
+    result_request,
+    sse_response,
+)
+from app import (
+    analysis_cache,
+    analysis_jobs,
+    app,
+    element_source,
+    gemini_client,
+    gemini_requests,
+    overpass_cache,
+    overpass_client,
+    provider_index,
+    result_pages,
+)
+from gemini_analysis import (
+    FALLBACK_PAYLOADS,
+    Batch,
+    BatchItem,
+    analysis_body,
+    check_response,
+    decode_analysis,
+    fallback_analysis,
+    fallback_key,
+    flight_key,
+    parse_analysis,
+    provisional_analysis,
+)
+from metrics import GEMINI_KEY_ERRORS, STAGE_SECONDS
+from overpass_query import build_overpass_query_for_filters
+from provider_ranking import rank_providers
+from singleflight import AsyncSingleFlight
+
+# Async clients share circuit breakers (and mirror latencies) with the sync ones
+gemini_async = AsyncUpstreamClient(
+    "gemini",
+    timeout=app.config["GEMINI_TIMEOUT"],
+    connections=app.config["ASYNC_UPSTREAM_CONNECTIONS"],
+    retries=app.config["UPSTREAM_RETRIES"],
+    backoff=app.config["UPSTREAM_BACKOFF"],
+    breaker=gemini_client.breaker,
+)
+overpass_async = AsyncHedgedClient(
+    overpass_client,
+    connections=app.config["ASYNC_UPSTREAM_CONNECTIONS"],
+    retries=app.config["UPSTREAM_RETRIES"] if len(overpass_client.mirrors) == 1 else 0,
+    backoff=app.config["UPSTREAM_BACKOFF"],
+)
+
+gemini_flights = AsyncSingleFlight("gemini", wait_timeout=app.config["SINGLEFLIGHT_TIMEOUT"])
+
+# Bounds how many batch items are analyzed at once, across all batches
+batch_slots = asyncio.Semaphore(app.config["BATCH_WORKERS"])
+
+# Work that outlives its request (timed-out batch items, abandoned streams);
+# the event loop only keeps weak references to tasks.
+background_tasks = set()
+
+# Runs the Flask app for every route without an async handler
+wsgi_pool = ThreadPoolExecutor(max_workers=app.config["ASGI_WSGI_THREADS"], thread_name_prefix="wsgi")
+
+
+def login_required(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        if "user_email" not in session:
+            return redirect(url_for("login"))
+        return await f(*args, **kwargs)
+    return decorated
+
+
+# ──────────────────────────────────────────────
+# API: Clinical NLP Analysis
+# ──────────────────────────────────────────────
+@login_required
+async def analyze_symptoms():
+    symptoms, api_key = analysis_request(request.get_json())
+    cached = await asyncio.to_thread(analysis_cache.get, symptoms)
+    if cached is not None:
+        return json_response(cached)
+
+    # Skip straight to the fallback while Gemini's circuit is open
+    if not gemini_async.available():
+        return FALLBACK_PAYLOADS[fallback_key(symptoms, "circuit_open")].response()
+
+    keys = GeminiKeys(api_key, app.config.get("GEMINI_API_KEY", ""))
+    if not keys:
+        return FALLBACK_PAYLOADS[fallback_key(symptoms, "no_api_key")].response()
+
+    task = asyncio.ensure_future(_gemini_analysis(keys, symptoms))
+    try:
+        result = await asyncio.wait_for(asyncio.shield(task), app.config["ANALYZE_DEADLINE"] or None)
+    except TimeoutError:
+        # Answer now; Gemini carries on and the client polls for the upgrade
+        return json_response(provisional_analysis(symptoms, analysis_jobs.start(task)))
+    except ValueError as auth_err:
+        GEMINI_KEY_ERRORS.inc()
+        return jsonify({"error": str(auth_err)}), 401
+
+    if result:
+        return json_response(result)
+    return FALLBACK_PAYLOADS[fallback_key(symptoms, "upstream_error")].response()
+
+
+async def _gemini_analysis(keys: GeminiKeys, symptoms: str) -> dict | None:
+    for key in keys:
+        with keys.attempt(key):
+            result = await _analyze_with_gemini(key, symptoms)
+            if result:
+                return result
+    return None
+
+
+@login_required
+async def analysis_result():
+    token, wait_seconds = result_request(request.args)
+    state = await analysis_jobs.wait_async(token, wait_seconds)
+    if state is None:
+        return jsonify({"error": "Unknown or expired result token"}), 404
+    return json_response(state)
+
+
+async def _analyze_with_gemini(api_key: str, symptoms: str) -> dict | None:
+    return await gemini_flights.do(
+        flight_key(api_key, symptoms), lambda: _analyze_uncached(api_key, symptoms)
+    )
+
+
+async def _analyze_uncached(api_key: str, symptoms: str) -> dict | None:
+    started = time.perf_counter()
+    result = await _call_gemini_api(api_key, symptoms)
+    if result:
+        analysis_cache.record_upstream_latency(time.perf_counter() - started)
+        await asyncio.to_thread(analysis_cache.set, symptoms, result)
+    return result
+
+
+async def _call_gemini_api(api_key: str, symptoms: str) -> dict | None:
+    with STAGE_SECONDS.time(stage="gemini_request"):
+        resp = await _post_gemini(api_key, "generateContent", symptoms)
+    check_response(resp)
+    return decode_analysis(resp.json())
+
+
+async def _open_gemini_stream(api_key: str, symptoms: str):
+    """Start a streamGenerateContent call; the body is read by the caller."""
+    resp = await _post_gemini(api_key, "streamGenerateContent", symptoms, stream=True)
+    try:
+        if resp.is_error:
+            await resp.aread()
+        check_response(resp)
+    except Exception:
+        await resp.aclose()
+        raise
+    return resp
+
+
+async def _post_gemini(api_key: str, method: str, symptoms: str, **kwargs):
+    url = gemini_requests.url(api_key, method)
+    body, cached = gemini_requests.body(api_key, symptoms)
+    resp = await gemini_async.post(url, json=body, **kwargs)
+    if cached and gemini_requests.cache_rejected(api_key, resp):
+        await resp.aclose()
+        resp = await gemini_async.post(url, json=analysis_body(symptoms), **kwargs)
+    return resp
+
+
+# ──────────────────────────────────────────────
+# API: Streamed and batch analysis
+# ──────────────────────────────────────────────
+@login_required
+async def analyze_symptoms_stream():
+    symptoms, api_key = analysis_request(request.get_json())
+    cached = await asyncio.to_thread(analysis_cache.get, symptoms)
+    if cached is not None:
+        return sse_response(replay_events(cached, "cache"))
+
+    started = time.perf_counter()
+    resp = None
+    reason = "circuit_open"
+    if gemini_async.available():
+        keys = GeminiKeys(api_key, app.config.get("GEMINI_API_KEY", ""))
+        reason = "upstream_error" if keys else "no_api_key"
+        opening = asyncio.ensure_future(_open_analysis_stream(keys, symptoms))
+        try:
+            resp = await asyncio.wait_for(asyncio.shield(opening), app.config["ANALYZE_DEADLINE"] or None)
+        except TimeoutError:
+            # The stream keeps opening and is read to the end in the background
+            token = analysis_jobs.start(_background(_read_stream_later(opening, symptoms, started)))
+            result = fallback_analysis(symptoms, "deadline")
+            return sse_response(replay_events(result, "fallback", token))
+        except ValueError as auth_err:
+            GEMINI_KEY_ERRORS.inc()
+            return jsonify({"error": str(auth_err)}), 401
+
+    if resp is None:
+        return sse_response(replay_events(fallback_analysis(symptoms, reason), "fallback"))
+    return sse_response(_gemini_events(resp, symptoms, started))
+
+
+async def _open_analysis_stream(keys: GeminiKeys, symptoms: str):
+    for key in keys:
+        with keys.attempt(key):
+            return await _open_gemini_stream(key, symptoms)
+    return None
+
+
+async def _read_stream_later(opening, symptoms: str, started: float) -> dict | None:
+    resp = await opening
+    if resp is None:
+        return None
+    try:
+        text = "".join([fragment async for fragment in aiter_sse_text(resp)])
+    finally:
+        await resp.aclose()
+    result = parse_analysis(text)
+    analysis_cache.record_upstream_latency(time.perf_counter() - started)
+    await asyncio.to_thread(analysis_cache.set, symptoms, result)
+    return result
+
+
+async def _gemini_events(resp, symptoms: str, started: float):
+    events = AnalysisEvents()
+    try:
+        try:
+            async for fragment in aiter_sse_text(resp):
+                for event in events.feed(fragment):
+                    yield event
+        finally:
+            await resp.aclose()
+        result = events.result()
+    except Exception as e:
+        app.logger.error(f"AI stream error, falling to fallback: {e}")
+        yield done_event(fallback_analysis(symptoms, "stream_error"), "fallback")
+        return
+
+    analysis_cache.record_upstream_latency(time.perf_counter() - started)
+    await asyncio.to_thread(analysis_cache.set, symptoms, result)
+    yield done_event(result, "ai")
+
+
+@login_required
+async def analyze_batch():
+    items, api_key = batch_request(request.get_json(silent=True), app.config["BATCH_MAX_ITEMS"])
+    batch = Batch(items, api_key or app.config.get("GEMINI_API_KEY", ""), app.config["BATCH_ITEM_TIMEOUT"])
+    return ndjson_response(_batch_lines(batch))
+
+
+async def _run_batch_item(item: BatchItem, api_key: str) -> dict | None:
+    async with batch_slots:
+        item.started = time.monotonic()
+        return await _analyze_with_gemini(api_key, item.symptoms)
+
+
+async def _batch_lines(batch: Batch):
+    for item in batch.items:
+        cached = await asyncio.to_thread(analysis_cache.get, item.symptoms)
+        line = batch.immediate_line(item, cached, gemini_async.available())
+        if line is not None:
+            yield line
+        else:
+            batch.track(item, _background(_run_batch_item(item, batch.api_key)))
+
+    try:
+        while batch.pending:
+            for line in batch.expired_lines():
+                yield line
+            if not batch.pending:
+                break
+            done, _ = await asyncio.wait(
+                batch.pending, timeout=batch.wait_timeout(), return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                yield batch.done_line(task)
+    finally:
+        # Drop items still waiting for a slot; running calls finish and fill the cache
+        for task in batch.unstarted():
+            task.cancel()
+
+
+def _background(coro) -> asyncio.Task:
+    task = asyncio.ensure_future(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+# ──────────────────────────────────────────────
+# API: Find Care (Overpass / OpenStreetMap)
+# ──────────────────────────────────────────────
+@login_required
+async def find_care():
+    search = FindCareSearch(request.args)
+    try:
+        elements = await _find_elements(search.lat, search.lon, search.radius, search.filters)
+        with STAGE_SECONDS.time(stage="rank"):
+            providers, total = rank_providers(
+                elements, search.lat, search.lon, search.radius, search.query, search.limit
+            )
+        body = await asyncio.to_thread(search.body, providers, total, result_pages)
+        return find_care_response(search, body)
+
+    except Exception as e:
+        app.logger.error(f"Find care error: {e}")
+        return jsonify({"error": "Unable to fetch care providers. Please try again."}), 500
+
+
+async def _find_elements(lat, lon, radius, filters) -> list[dict]:
+    if provider_index is not None:
+        elements = await asyncio.to_thread(element_source.indexed, lat, lon, radius, filters)
+        if elements is not None:
+            return elements
+
+    async def fetch(c_lat, c_lon, c_radius):
+        fetched = await _fetch_overpass(build_overpass_query_for_filters(c_lat, c_lon, c_radius, filters))
+        if provider_index is not None:
+            await asyncio.to_thread(
+                element_source.store, lat, lon, radius, filters, (c_lat, c_lon, c_radius), fetched,
+            )
+        return fetched
+
+    return await overpass_cache.get_or_fetch_async(lat, lon, radius, frozenset(filters), fetch)
+
+
+async def _fetch_overpass(overpass_q: str) -> list[dict]:
+    with STAGE_SECONDS.time(stage="overpass_request"):
+        resp = await overpass_async.post(data={"data": overpass_q})
+    resp.raise_for_status()
+    with STAGE_SECONDS.time(stage="overpass_decode"):
+        return resp.json().get("elements", [])
+
+
+ROUTES = {
+    ("POST", "/api/analyze"): analyze_symptoms,
+    ("POST", "/api/analyze/stream"): analyze_symptoms_stream,
+    ("POST", "/api/analyze/batch"): analyze_batch,
+    ("GET", "/api/analyze/result"): analysis_result,
+}
+# Stream-parse mode reads Overpass through a blocking incremental parser, so
+# it stays on the Flask view.
+if not app.config["OVERPASS_STREAM_PARSE"] or provider_index is not None:
+    ROUTES[("GET", "/api/find-care")] = find_care
+
+
+# ──────────────────────────────────────────────
+# ASGI plumbing
+# ──────────────────────────────────────────────
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+    elif scope["type"] == "http":
+        handler = ROUTES.get((scope["method"], scope["path"]))
+        environ = _environ(scope, await _read_body(receive))
+        if handler is None:
+            await _call_wsgi(environ, send)
+        else:
+            await _dispatch(handler, environ, receive, send)
+    else:
+        await send({"type": "websocket.close"})
+
+
+async def _dispatch(handler, environ: dict, receive, send) -> None:
+    """Run an async handler the way Flask runs a view.
+
+    A streamed response body may be an async iterator; it is sent as it is
+    produced, and closed early if the client disconnects.
+    """
+    with app.request_context(environ):
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await handler()
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.finalize_request(rv)
+        except Exception as e:
+            response = app.handle_exception(e)
+        body = response.response if response.is_streamed else response.get_data()
+    await send({"type": "http.response.start", "status": response.status_code,
+                "headers": _encode_headers(response.headers.to_wsgi_list())})
+    if response.is_streamed:
+        await _send_streamed(body, receive, send)
+    else:
+        await send({"type": "http.response.body", "body": body})
+
+
+async def _send_streamed(chunks, receive, send) -> None:
+    disconnected = asyncio.ensure_future(_disconnect(receive))
+    try:
+        if not hasattr(chunks, "__aiter__"):
+            chunks = _aiter(chunks)
+        async for chunk in chunks:
+            if disconnected.done():
+                break
+            if chunk:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                await send({"type": "http.response.body", "body": data, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        disconnected.cancel()
+        await chunks.aclose()
+
+
+async def _aiter(iterable):
+    for item in iterable:
+        yield item
+
+
+async def _disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _call_wsgi(environ: dict, send) -> None:
+    """Run the Flask app on the thread pool, forwarding streamed bodies as they come."""
+    loop = asyncio.get_running_loop()
+
+    def forward(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    def run():
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = _encode_headers(headers)
+
+        body = app(environ, start_response)
+        try:
+            forward({"type": "http.response.start", **started})
+            for chunk in body:
+                if chunk:
+                    forward({"type": "http.response.body", "body": chunk, "more_body": True})
+            forward({"type": "http.response.body", "body": b""})
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+
+    await loop.run_in_executor(wsgi_pool, run)
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await gemini_async.aclose()
+            await overpass_async.aclose()
+            wsgi_pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _read_body(receive) -> bytes:
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return bytes(body)
+
+
+def _environ(scope, body: bytes) -> dict:
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin1"),
+        "PATH_INFO": scope["path"].encode().decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": scope["server"][0] if scope.get("server") else "localhost",
+        "SERVER_PORT": str(scope["server"][1]) if scope.get("server") else "80",
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        value = value.decode("latin1")
+        if name in environ:
+            value = f"{environ[name]}{'; ' if name == 'HTTP_COOKIE' else ','}{value}"
+        environ[name] = value
+    return environ
+
+
+def _encode_headers(headers) -> list[tuple[bytes, bytes]]:
+    return [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers]
@@ -0,0 +1,3 @@
+"""
+Offline benchmarks. Run from python_app/, e.g. ``python -m bench.prompt_cache``.
+"""
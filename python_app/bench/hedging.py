@@ -0,0 +1,105 @@
+"""
+Hedged Overpass requests against local mirror stubs.
+
+Starts three Overpass stubs (a fast one with a slow tail, a steady slower
+one, and one that always fails) plus a dead endpoint, then sends the same
+workload through a single-mirror client and through a HedgedClient over all
+four:
+
+    python -m bench.hedging --requests 200 --concurrency 8
+
+Prints p50/p95/p99 latency, errors, hedges fired and won, and each
+mirror's breaker state. Exits non-zero unless hedging lowers p99, no
+request fails, and the failing and dead mirrors end up ejected.
+"""
+
+import argparse
+import socket
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench.load import percentile
+from metrics import HEDGE_WINS, HEDGED_REQUESTS
+from overpass_query import build_overpass_query
+from stubs.overpass import start_stub
+from upstream import CircuitBreaker, HedgedClient
+
+QUERY = build_overpass_query(12.9716, 77.5946, 2000, "doctor")
+
+
+def unused_port_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/api/interpreter"
+
+
+def drive(client: HedgedClient, total: int, concurrency: int) -> tuple[list[float], int]:
+    def one(_):
+        started = time.perf_counter()
+        try:
+            resp = client.post(data={"data": QUERY})
+            ok = resp.ok and bool(resp.json()["elements"])
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    return sorted(r[0] for r in results), sum(not r[1] for r in results)
+
+
+def report(label: str, latencies: list[float], errors: int) -> None:
+    print(
+        f"{label:22s} p50 {percentile(latencies, 50) * 1000:7.1f} ms  "
+        f"p95 {percentile(latencies, 95) * 1000:7.1f} ms  p99 {percentile(latencies, 99) * 1000:7.1f} ms  "
+        f"mean {statistics.fmean(latencies) * 1000:7.1f} ms  errors {errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="slow-response rate of the fast mirror")
+    parser.add_argument("--tail-latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    _, fast, _ = start_stub(base_latency=0.03, tail_rate=args.tail_rate, tail_latency=args.tail_latency)
+    _, steady, _ = start_stub(base_latency=0.08)
+    _, failing, _ = start_stub(base_latency=0.01, error_rate=1.0)
+    dead = unused_port_url()
+
+    def breaker():
+        return CircuitBreaker(failure_threshold=3, reset_timeout=600)
+
+    single = HedgedClient("single", [fast], timeout=10, pool_size=args.concurrency, breaker_factory=breaker)
+    latencies, errors = drive(single, args.requests, args.concurrency)
+    report("single mirror", latencies, errors)
+    single_p99 = percentile(latencies, 99)
+
+    hedged = HedgedClient(
+        "hedged", [failing, dead, fast, steady], timeout=10, pool_size=args.concurrency,
+        default_delay=0.2, breaker_factory=breaker,
+    )
+    latencies, errors = drive(hedged, args.requests, args.concurrency)
+    report("hedged, 4 mirrors", latencies, errors)
+    print(f"hedges fired {HEDGED_REQUESTS.value(upstream='hedged'):.0f}, "
+          f"won by the duplicate {HEDGE_WINS.value(upstream='hedged'):.0f}")
+    for mirror in hedged.mirrors:
+        p90 = mirror.quantile(0.9)
+        print(f"  {mirror.url:45s} breaker {mirror.client.breaker.state:9s} "
+              f"p90 {'-' if p90 is None else f'{p90 * 1000:.1f} ms'}")
+
+    ejected = all(m.client.breaker.state == "open" for m in hedged.mirrors[:2])
+    ok = errors == 0 and ejected and percentile(latencies, 99) < single_p99
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
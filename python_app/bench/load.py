@@ -0,0 +1,320 @@
+"""
+Concurrent load test for /api/analyze, /api/find-care and the login flow.
+
+By default the app (werkzeug, threaded) and the local Gemini and Overpass
+stubs each run in their own subprocess, so runs are offline and repeatable
+and the reported latency and RSS are the server's, not shared with the
+load generator's threads:
+
+    python -m bench.load --concurrency 16 --requests 400
+    python -m bench.load --scenario find-care --unique --overpass-latency 0.5
+    python -m bench.load --asgi --scenario analyze --unique --concurrency 200
+
+``--asgi`` serves asgi.py under uvicorn instead of the threaded WSGI server.
+``--in-process`` runs the stubs and the app inside the bench process, which
+is handy under a profiler but measures client and server together.
+
+With ``--target`` it drives an already running server instead (e.g. under
+gunicorn with GEMINI_API_BASE / OVERPASS_URL pointing at the stubs); pass
+``--pid`` to report that server's RSS.
+
+Reports p50/p95/p99 latency, throughput and error count per scenario, and
+the server's current and peak RSS.
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from stubs import gemini as gemini_stub
+from stubs import overpass as overpass_stub
+
+SCENARIOS = ("analyze", "find-care", "login")
+
+SYMPTOMS = [
+    "headache and fever since 2 days",
+    "dry cough and sore throat",
+    "stomach pain after meals",
+    "fever with body ache and chills",
+    "dizziness when standing up",
+    "itchy rash on both arms",
+]
+CARE_QUERIES = ["", "doctor", "pharmacy", "dentist", "eye clinic", "lab test", "mental health"]
+BASE_LAT, BASE_LON = 12.9716, 77.5946
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def rss_kb(pid: int | str = "self") -> tuple[int, int]:
+    """Return (current RSS, peak RSS) in kB from /proc."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":", 1)
+                    values[key] = int(value.split()[0])
+    except OSError:
+        return 0, 0
+    return values.get("VmRSS", 0), values.get("VmHWM", 0)
+
+
+def serve_in_process(args) -> str:
+    """Start both stubs and the app in this process; returns the app's base URL."""
+    _, gemini_base, _ = gemini_stub.start_stub(
+        base_latency=args.gemini_latency, error_rate=args.gemini_error_rate, pad_bytes=args.gemini_pad_bytes,
+    )
+    _, overpass_url, _ = overpass_stub.start_stub(
+        base_latency=args.overpass_latency, elements=args.overpass_elements,
+        error_rate=args.overpass_error_rate, pad_bytes=args.overpass_pad_bytes,
+    )
+    os.environ.update(_app_env(gemini_base, overpass_url))
+    return _serve_app(args.asgi)
+
+
+def serve_subprocesses(args, processes: list) -> tuple[str, int]:
+    """Start both stubs and the app, each in its own process (appended to
+    ``processes``); returns the app's base URL and PID."""
+    gemini_port, overpass_port, app_port = _free_port(), _free_port(), _free_port()
+    processes.append(_spawn(
+        "-m", "stubs.gemini", "--port", gemini_port, "--base-latency", args.gemini_latency,
+        "--error-rate", args.gemini_error_rate, "--pad-bytes", args.gemini_pad_bytes,
+    ))
+    processes.append(_spawn(
+        "-m", "stubs.overpass", "--port", overpass_port, "--base-latency", args.overpass_latency,
+        "--elements", args.overpass_elements, "--error-rate", args.overpass_error_rate,
+        "--pad-bytes", args.overpass_pad_bytes,
+    ))
+    for port in (gemini_port, overpass_port):
+        _wait_for_port(port)
+
+    env = _app_env(f"http://127.0.0.1:{gemini_port}/v1beta", f"http://127.0.0.1:{overpass_port}/api/interpreter")
+    server = _spawn("-m", "bench.load", "--serve", app_port, *(["--asgi"] if args.asgi else []), env=env)
+    processes.append(server)
+    _wait_for_port(app_port, server)
+    return f"http://127.0.0.1:{app_port}", server.pid
+
+
+def _app_env(gemini_base: str, overpass_url: str) -> dict:
+    workdir = tempfile.mkdtemp(prefix="healthagg-bench-")
+    return {
+        "GEMINI_API_BASE": gemini_base,
+        "GEMINI_API_KEY": "bench-key",
+        "OVERPASS_URL": overpass_url,
+        "USER_DB_PATH": os.path.join(workdir, "users.sqlite"),
+        "SHARED_CACHE_DB": "",
+    }
+
+
+def _serve_app(asgi: bool, port: int = 0) -> str:
+    from app import app
+
+    app.logger.disabled = True
+    if asgi:
+        return _serve_asgi(port)
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def _serve_asgi(port: int = 0) -> str:
+    import uvicorn
+
+    from asgi import application
+
+    port = port or _free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        application, host="127.0.0.1", port=port, log_level="error", backlog=4096,
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _spawn(*argv, env: dict | None = None) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *map(str, argv)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def _wait_for_port(port: int, process: subprocess.Popen | None = None, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port} after {timeout:.0f} s")
+
+
+def login_session(base: str) -> requests.Session:
+    session = requests.Session()
+    resp = session.post(f"{base}/login", data={"email": EMAIL, "password": PASSWORD}, allow_redirects=False)
+    if resp.status_code != 302:
+        raise RuntimeError(f"login failed with HTTP {resp.status_code}")
+    return session
+
+
+def make_request(scenario: str, base: str, session: requests.Session, n: int, unique: bool) -> bool:
+    if scenario == "analyze":
+        symptoms = SYMPTOMS[n % len(SYMPTOMS)]
+        if unique:
+            symptoms += f" case{n}"
+        resp = session.post(f"{base}/api/analyze", json={"symptoms": symptoms})
+        return resp.ok
+    if scenario == "find-care":
+        # Without --unique, searches cycle through a handful of nearby spots.
+        spot = n if unique else n % 4
+        params = {
+            "lat": BASE_LAT + spot * 0.013, "lon": BASE_LON + (spot % 7) * 0.011,
+            "q": CARE_QUERIES[n % len(CARE_QUERIES)], "radius": 5000, "limit": 50,
+        }
+        resp = session.get(f"{base}/api/find-care", params=params)
+        return resp.ok
+    # A full sign-in: fresh cookie jar, POST credentials, follow to the page.
+    with requests.Session() as fresh:
+        resp = fresh.post(f"{base}/login", data={"email": EMAIL, "password": PASSWORD})
+        return resp.ok and resp.url.rstrip("/") == base
+
+
+def run_scenario(scenario: str, base: str, concurrency: int, total: int, unique: bool) -> dict:
+    counter = itertools.count()
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors
+        session = login_session(base)
+        local = []
+        failed = 0
+        while (n := next(counter)) < total:
+            started = time.perf_counter()
+            try:
+                ok = make_request(scenario, base, session, n, unique)
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - started)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "mean": statistics.fmean(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": latencies[-1] if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", help="base URL of a running server (default: start one)")
+    parser.add_argument("--pid", help="server PID for RSS reporting with --target")
+    parser.add_argument("--asgi", action="store_true", help="serve asgi.py with uvicorn")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run the stubs and the app in the bench process")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="scenario to run; repeatable (default: all)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--unique", action="store_true",
+                        help="vary symptoms and locations per request to defeat caches")
+    stub = parser.add_argument_group("stubs")
+    stub.add_argument("--gemini-latency", type=float, default=0.3)
+    stub.add_argument("--gemini-error-rate", type=float, default=0.0)
+    stub.add_argument("--gemini-pad-bytes", type=int, default=0)
+    stub.add_argument("--overpass-latency", type=float, default=0.2)
+    stub.add_argument("--overpass-elements", type=int, default=300)
+    stub.add_argument("--overpass-error-rate", type=float, default=0.0)
+    stub.add_argument("--overpass-pad-bytes", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.serve:
+        # The server subprocess started by serve_subprocesses
+        _serve_app(args.asgi, args.serve)
+        threading.Event().wait()
+
+    processes = []
+    try:
+        if args.target:
+            base, pid = args.target.rstrip("/"), args.pid
+        elif args.in_process:
+            base, pid = serve_in_process(args), "self"
+        else:
+            base, pid = serve_subprocesses(args, processes)
+        run(args, base, pid)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def run(args, base: str, pid) -> None:
+    # Make sure the bench account exists; an existing one is fine.
+    requests.post(f"{base}/signup", data={"name": "Bench", "email": EMAIL, "password": PASSWORD})
+
+    print(f"{'scenario':10s} {'reqs':>6s} {'errs':>5s} {'req/s':>8s} "
+          f"{'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'max ms':>8s}")
+    for scenario in args.scenario or SCENARIOS:
+        r = run_scenario(scenario, base, args.concurrency, args.requests, args.unique)
+        print(
+            f"{scenario:10s} {r['requests']:6d} {r['errors']:5d} {r['throughput']:8.1f} "
+            f"{r['p50'] * 1000:8.1f} {r['p95'] * 1000:8.1f} {r['p99'] * 1000:8.1f} {r['max'] * 1000:8.1f}"
+        )
+    if pid:
+        current, peak = rss_kb(pid)
+        print(f"server RSS {current / 1024:.1f} MiB (peak {peak / 1024:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmarks for the request hot paths.
+
+    python -m bench.micro
+    python -m bench.micro --only match_fallback --repeat 7
+
+Each case reports the best per-call time over ``--repeat`` runs, so numbers
+are comparable between commits on the same machine.
+"""
+
+import argparse
+import random
+import timeit
+
+from geo import haversine
+from medical_fallback import match_fallback
+from overpass_query import build_overpass_query
+from provider_ranking import StreamingRanker, rank_providers
+from relevance import relevance_scores
+from stubs.overpass import synthetic_elements
+
+LAT, LON = 12.9716, 77.5946
+SYMPTOMS = [
+    "headache and fever since 2 days",
+    "I have had a high temperature with chills and a throbbing migraine since yesterday",
+    "dry cough and sore throat",
+    "stomach pain after meals " * 20,
+]
+QUERIES = ["", "doctor", "dentist near me", "eye clinic", "mental health counselling", "lab test pathology"]
+
+
+def _elements(count: int) -> list[dict]:
+    query = build_overpass_query(LAT, LON, 10000, "doctor")
+    return synthetic_elements(query, count)
+
+
+def _stream_rank(elements: list[dict], query: str):
+    ranker = StreamingRanker(LAT, LON, 10000, query, 50)
+    for el in elements:
+        ranker.add(el)
+    return ranker.result()
+
+
+def cases():
+    """Yield (name, calls per run, callable)."""
+    rng = random.Random(0)
+    points = [(LAT + rng.uniform(-0.1, 0.1), LON + rng.uniform(-0.1, 0.1)) for _ in range(1000)]
+    yield "haversine", len(points), lambda: [haversine(LAT, LON, p_lat, p_lon) for p_lat, p_lon in points]
+
+    tags = [el["tags"] for el in _elements(1000)]
+    yield "relevance_scores", len(tags) * len(QUERIES), lambda: [
+        relevance_scores(tags, q) for q in QUERIES
+    ]
+
+    yield "build_overpass_query", len(QUERIES), lambda: [
+        build_overpass_query(LAT, LON, 10000, q) for q in QUERIES
+    ]
+
+    yield "match_fallback", len(SYMPTOMS), lambda: [match_fallback(s) for s in SYMPTOMS]
+
+    for count in (300, 5000):
+        elements = _elements(count)
+        yield f"rank_providers[{count}]", 1, lambda elements=elements: rank_providers(
+            elements, LAT, LON, 10000, "doctor", 50
+        )
+        yield f"StreamingRanker[{count}]", 1, lambda elements=elements: _stream_rank(elements, "doctor")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", action="append", help="run only cases starting with this name")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing run")
+    args = parser.parse_args()
+
+    for name, calls, fn in cases():
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        timer = timeit.Timer(fn)
+        number, elapsed = timer.autorange()
+        number = max(1, int(number * args.min_time / max(elapsed, 1e-9)))
+        best = min(timer.repeat(repeat=args.repeat, number=number)) / number
+        print(f"{name:24s} {best / calls * 1e6:10.3f} µs/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Check the compact Overpass query against the legacy one-clause-per-pair query.
+
+Offline, every search keyword (and a few combinations) is compiled both ways
+and the (element type, key, value) selections are compared, along with query
+size and clause count:
+
+    python -m bench.overpass_query
+
+With ``--live`` both queries are also run against a real Overpass endpoint,
+comparing the returned elements, response size and execution time:
+
+    python -m bench.overpass_query --live https://overpass-api.de/api/interpreter \\
+        --lat 12.9716 --lon 77.5946 --radius 3000
+"""
+
+import argparse
+import itertools
+import re
+import sys
+import time
+
+import requests
+
+from overpass_query import (
+    OVERPASS_KW_MAP,
+    build_overpass_query_for_filters,
+    legacy_overpass_query_for_filters,
+    overpass_tag_filters,
+)
+from provider_ranking import rank_providers
+
+_CLAUSE = re.compile(r'(nwr|nw|nr|wr|node|way|rel)\["([^"]+)"(=|~)"([^"]+)"\]\(around:')
+_SELECTOR_TYPES = {
+    "node": ("node",), "way": ("way",), "rel": ("relation",),
+    "nw": ("node", "way"), "nr": ("node", "relation"), "wr": ("way", "relation"),
+    "nwr": ("node", "way", "relation"),
+}
+
+
+def selections(query: str) -> set[tuple[str, str, str]]:
+    """Expand a query's clauses into the (element type, key, value) pairs they select."""
+    selected = set()
+    for selector, key, op, value in _CLAUSE.findall(query):
+        values = value[2:-2].split("|") if op == "~" else [value]
+        for el_type in _SELECTOR_TYPES[selector]:
+            for v in values:
+                selected.add((el_type, key, v))
+    return selected
+
+
+def search_strings() -> list[str]:
+    keywords = list(OVERPASS_KW_MAP)
+    return ["", "hospital near me"] + keywords + [" ".join(p) for p in itertools.combinations(keywords, 2)]
+
+
+def check_offline(lat, lon, radius) -> bool:
+    ok = True
+    legacy_bytes = compact_bytes = legacy_clauses = compact_clauses = 0
+    for search in search_strings():
+        filters = overpass_tag_filters(search)
+        legacy = legacy_overpass_query_for_filters(lat, lon, radius, filters)
+        compact = build_overpass_query_for_filters(lat, lon, radius, filters)
+        if selections(legacy) != selections(compact):
+            ok = False
+            print(f"MISMATCH for {search!r}:\n  legacy  {legacy}\n  compact {compact}")
+        legacy_bytes += len(legacy)
+        compact_bytes += len(compact)
+        legacy_clauses += legacy.count("(around:")
+        compact_clauses += compact.count("(around:")
+    n = len(search_strings())
+    print(f"{n} searches, selections {'identical' if ok else 'DIFFER'}")
+    print(f"  around clauses/query  legacy {legacy_clauses / n:5.1f}  compact {compact_clauses / n:5.1f}")
+    print(f"  query bytes/query     legacy {legacy_bytes / n:5.0f}  compact {compact_bytes / n:5.0f}")
+    return ok
+
+
+def check_live(url, lat, lon, radius, searches) -> bool:
+    ok = True
+    for search in searches:
+        filters = overpass_tag_filters(search)
+        results = {}
+        for label, build in (("legacy", legacy_overpass_query_for_filters),
+                             ("compact", build_overpass_query_for_filters)):
+            started = time.perf_counter()
+            resp = requests.post(url, data={"data": build(lat, lon, radius, filters)}, timeout=60)
+            resp.raise_for_status()
+            elapsed = time.perf_counter() - started
+            elements = resp.json().get("elements", [])
+            results[label] = elements
+            print(f"{search!r:20s} {label:8s} {len(elements):5d} elements {len(resp.content):9d} bytes "
+                  f"{elapsed * 1000:8.0f} ms")
+        ids = {label: [(el["type"], el["id"]) for el in elements] for label, elements in results.items()}
+        ranked = {
+            label: rank_providers(elements, lat, lon, radius, search, 50)
+            for label, elements in results.items()
+        }
+        if ids["legacy"] != ids["compact"] or ranked["legacy"] != ranked["compact"]:
+            ok = False
+            print(f"  MISMATCH: elements or ranked providers differ for {search!r}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--live", metavar="URL", help="Overpass interpreter to run both queries against")
+    parser.add_argument("--lat", type=float, default=12.9716)
+    parser.add_argument("--lon", type=float, default=77.5946)
+    parser.add_argument("--radius", type=int, default=3000)
+    parser.add_argument("--search", action="append", help="search text for --live; repeatable")
+    args = parser.parse_args()
+
+    ok = check_offline(args.lat, args.lon, args.radius)
+    if args.live:
+        ok = check_live(args.live, args.lat, args.lon, args.radius, args.search or ["", "doctor", "eye"]) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure prompt tokens and latency with and without the cached system instruction.
+
+Runs analyses against the local Gemini stub, once with the instruction sent
+inline on every request and once referencing a cachedContents handle.
+
+    python -m bench.prompt_cache --requests 50
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from stubs.gemini import start_stub
+
+SYMPTOMS = [
+    "headache and fever since 2 days",
+    "dry cough and sore throat",
+    "stomach pain after meals",
+    "fever with body ache and chills",
+]
+
+
+def run(app_module, stub_base, state, requests_count, use_cache):
+    app_module.analysis_cache.clear()
+    requests = app_module.gemini_requests
+    requests.system_instruction = None
+    if use_cache:
+        requests.system_instruction = app_module.CachedInstruction(
+            app_module.gemini_client, stub_base, requests.model,
+            app_module.CLINICAL_SYSTEM_PROMPT, "bench-key",
+        )
+        # Requests never wait for the handle, so create it before measuring
+        requests.system_instruction.refresh()
+    before = dict(state.stats)
+    latencies = []
+    for i in range(requests_count):
+        started = time.perf_counter()
+        app_module._call_gemini_api("bench-key", SYMPTOMS[i % len(SYMPTOMS)])
+        latencies.append(time.perf_counter() - started)
+    after = state.stats
+    billed = (after["promptTokens"] - before["promptTokens"]) - (after["cachedTokens"] - before["cachedTokens"])
+    return {
+        "billed_prompt_tokens_per_request": billed / requests_count,
+        "cached_tokens_per_request": (after["cachedTokens"] - before["cachedTokens"]) / requests_count,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=40.0)
+    args = parser.parse_args()
+
+    _, base_url, state = start_stub(base_latency=0.01, prefill_ms_per_1k=args.prefill_ms_per_1k,
+                                    decode_tokens_per_s=50000)
+    os.environ["GEMINI_API_BASE"] = base_url
+    import app as app_module
+    app_module.app.config["GEMINI_API_BASE"] = base_url
+
+    for label, use_cache in (("inline instruction", False), ("cached instruction", True)):
+        r = run(app_module, base_url, state, args.requests, use_cache)
+        print(
+            f"{label:20s} billed prompt tokens/req {r['billed_prompt_tokens_per_request']:7.0f}  "
+            f"cached tokens/req {r['cached_tokens_per_request']:7.0f}  "
+            f"p50 {r['p50_ms']:6.1f} ms  mean {r['mean_ms']:6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,121 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "healthagg-secret-key-change-in-production")
     GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
+
+    # SQLite store shared by all workers behind the in-process caches
+    # (Overpass results, symptom analyses). Empty disables it.
+    SHARED_CACHE_DB = os.environ.get("SHARED_CACHE_DB", "")
+
+    # Find Care: Overpass result cache
+    OVERPASS_CACHE_TILE_DEG = float(os.environ.get("OVERPASS_CACHE_TILE_DEG", "0.01"))
+    OVERPASS_CACHE_SIZE = int(os.environ.get("OVERPASS_CACHE_SIZE", "256"))
+    OVERPASS_CACHE_TTL = int(os.environ.get("OVERPASS_CACHE_TTL", "600"))
+    # Parse cache misses incrementally, keeping only the top results in memory.
+    # Streamed responses are not added to the Overpass cache.
+    OVERPASS_STREAM_PARSE = os.environ.get("OVERPASS_STREAM_PARSE", "false").lower() in ("1", "true", "yes")
+
+    # Find Care: ranked result sets kept server-side for "show more" paging
+    FIND_CARE_RESULTS_SIZE = int(os.environ.get("FIND_CARE_RESULTS_SIZE", "1024"))
+    FIND_CARE_RESULTS_TTL = int(os.environ.get("FIND_CARE_RESULTS_TTL", "600"))
+
+    # Find Care: background warm-up of the Overpass cache (/api/find-care/warm)
+    PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "2"))
+    PREFETCH_MAX_PENDING = int(os.environ.get("PREFETCH_MAX_PENDING", "32"))
+
+    # Find Care: offline provider index (built with import_providers.py)
+    # With PROVIDER_INDEX_OVERPASS_REFRESH, a search outside every imported
+    # extract that the index has no Overpass fetch of the same tile, filters
+    # and radius for (within PROVIDER_INDEX_COVERAGE_TTL seconds) goes to
+    # Overpass and the result replaces that area in the index; without it,
+    # the index answers every search on its own.
+    PROVIDER_INDEX_PATH = os.environ.get("PROVIDER_INDEX_PATH", "")
+    PROVIDER_INDEX_OVERPASS_REFRESH = os.environ.get("PROVIDER_INDEX_OVERPASS_REFRESH", "true").lower() in ("1", "true", "yes")
+    PROVIDER_INDEX_COVERAGE_TTL = int(os.environ.get("PROVIDER_INDEX_COVERAGE_TTL", "604800"))
+
+    # Location label: offline gazetteer (built with import_gazetteer.py) with a
+    # cache keyed by coordinates rounded to GEOCODE_PRECISION decimals.
+    # Nominatim is asked only for points the gazetteer cannot place, at most
+    # once per NOMINATIM_MIN_INTERVAL seconds across the workers sharing
+    # SHARED_CACHE_DB (per worker without it); empty NOMINATIM_URL disables
+    # it. While it is throttled or failing the endpoint answers 503 and the
+    # page asks Nominatim from the browser instead.
+    GAZETTEER_PATH = os.environ.get("GAZETTEER_PATH", "")
+    GEOCODE_MAX_KM = float(os.environ.get("GEOCODE_MAX_KM", "50"))
+    GEOCODE_PRECISION = int(os.environ.get("GEOCODE_PRECISION", "2"))
+    GEOCODE_CACHE_SIZE = int(os.environ.get("GEOCODE_CACHE_SIZE", "4096"))
+    GEOCODE_CACHE_TTL = int(os.environ.get("GEOCODE_CACHE_TTL", "604800"))
+    NOMINATIM_URL = os.environ.get("NOMINATIM_URL", "https://nominatim.openstreetmap.org/reverse")
+    NOMINATIM_TIMEOUT = float(os.environ.get("NOMINATIM_TIMEOUT", "5"))
+    NOMINATIM_MIN_INTERVAL = float(os.environ.get("NOMINATIM_MIN_INTERVAL", "1"))
+    NOMINATIM_USER_AGENT = os.environ.get("NOMINATIM_USER_AGENT", "HealthAgg/1.0")
+
+    # Upstream HTTP clients (connection pools, retries, circuit breakers)
+    GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", "30"))
+    OVERPASS_URL = os.environ.get("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+    # Comma-separated Overpass mirrors for hedged requests (default: OVERPASS_URL alone).
+    # A mirror is ejected after OVERPASS_MIRROR_EJECT_FAILURES consecutive failures
+    # for OVERPASS_MIRROR_EJECT_SECONDS; the hedge delay is each mirror's recent p90
+    # latency, or OVERPASS_HEDGE_DELAY until it has enough samples.
+    OVERPASS_URLS = [u.strip() for u in os.environ.get("OVERPASS_URLS", OVERPASS_URL).split(",") if u.strip()]
+    OVERPASS_HEDGE_DELAY = float(os.environ.get("OVERPASS_HEDGE_DELAY", "1.0"))
+    OVERPASS_MIRROR_EJECT_FAILURES = int(os.environ.get("OVERPASS_MIRROR_EJECT_FAILURES", "3"))
+    OVERPASS_MIRROR_EJECT_SECONDS = float(os.environ.get("OVERPASS_MIRROR_EJECT_SECONDS", "60"))
+    OVERPASS_TIMEOUT = float(os.environ.get("OVERPASS_TIMEOUT", "15"))
+    UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", "10"))
+    UPSTREAM_RETRIES = int(os.environ.get("UPSTREAM_RETRIES", "2"))
+    UPSTREAM_BACKOFF = float(os.environ.get("UPSTREAM_BACKOFF", "0.5"))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", "30"))
+    # How long a request waits on an identical in-flight upstream call
+    SINGLEFLIGHT_TIMEOUT = float(os.environ.get("SINGLEFLIGHT_TIMEOUT", "90"))
+
+    # ASGI serving (uvicorn asgi:application): connection limit per upstream host
+    # for the async clients, and threads for routes still served by Flask
+    ASYNC_UPSTREAM_CONNECTIONS = int(os.environ.get("ASYNC_UPSTREAM_CONNECTIONS", "200"))
+    ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", "32"))
+
+    # Symptom analysis result cache
+    ANALYSIS_CACHE_SIZE = int(os.environ.get("ANALYSIS_CACHE_SIZE", "1024"))
+    ANALYSIS_CACHE_TTL = int(os.environ.get("ANALYSIS_CACHE_TTL", "86400"))
+
+    # Latency budget for an analysis: past it the curated fallback is returned as
+    # provisional, with a token for polling /api/analyze/result, while Gemini
+    # carries on in the background (0 waits for Gemini however long it takes).
+    # For /api/analyze/stream the budget covers opening the stream.
+    ANALYZE_DEADLINE = float(os.environ.get("ANALYZE_DEADLINE", "10"))
+    ANALYZE_WORKERS = int(os.environ.get("ANALYZE_WORKERS", "16"))
+    ANALYZE_RESULT_TTL = int(os.environ.get("ANALYZE_RESULT_TTL", "600"))
+
+    # Batch analysis (/api/analyze/batch)
+    BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "100"))
+    BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "4"))
+    BATCH_ITEM_TIMEOUT = float(os.environ.get("BATCH_ITEM_TIMEOUT", "45"))
+
+    # Gemini model and cached system instruction. GEMINI_CONTEXT_CACHE uploads
+    # the instruction once as cachedContents on GEMINI_API_KEY (never on a
+    # user's key) so analyses on the server key reference it instead of
+    # resending it; it is billed storage, so deployments opt in.
+    GEMINI_API_BASE = os.environ.get("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+    GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash-preview-05-20")
+    GEMINI_CONTEXT_CACHE = os.environ.get("GEMINI_CONTEXT_CACHE", "false").lower() in ("1", "true", "yes")
+    GEMINI_CONTEXT_CACHE_TTL = int(os.environ.get("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+
+    # Responses of at least COMPRESS_MIN_SIZE bytes are sent gzip- or (with the
+    # brotli package installed) brotli-compressed. With STATIC_PRECOMPRESS,
+    # static files are compressed once at startup and served under
+    # content-hashed URLs cached for STATIC_MAX_AGE; the debug server always
+    # serves them from disk so edits show without a restart.
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+    STATIC_PRECOMPRESS = os.environ.get("STATIC_PRECOMPRESS", "true").lower() in ("1", "true", "yes")
+    STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", "31536000"))
+
+    # Prometheus text-format metrics at /metrics, summed over the workers that
+    # share SHARED_CACHE_DB. The endpoint has no authentication: enable it only
+    # where the proxy keeps /metrics off the public internet.
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+    METRICS_PUBLISH_INTERVAL = float(os.environ.get("METRICS_PUBLISH_INTERVAL", "5"))
+
+    # User accounts
+    USER_DB_PATH = os.environ.get("USER_DB_PATH", "users.sqlite")
+    # Most password hashes (signup, login) computed at once per process
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "4"))
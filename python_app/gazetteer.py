@@ -0,0 +1,203 @@
+"""
+Offline reverse geocoding: coordinates to the nearest named place.
+
+Places come from a GeoNames dump (``cities500.txt``, ``cities15000.zip``,
+...) imported with ``import_gazetteer.py`` into a SQLite database with an
+R*Tree over their coordinates. A lookup searches a bounding box that grows
+until it holds a place, then picks the nearest one in it by great-circle
+distance.
+
+ReverseGeocoder puts an LRU/TTL cache keyed by rounded coordinates in front
+of the gazetteer, and can fall back to a remote geocoder (Nominatim) for
+points the gazetteer cannot place. When that fallback is rate limited or
+failing the lookup raises GeocodeUnavailable rather than reporting "no
+place", so the caller can send the client elsewhere.
+"""
+
+import csv
+import io
+import math
+import threading
+import time
+import zipfile
+
+from geo import bounding_box, haversine
+from shared_store import SharedStore
+from sqlite_local import ThreadLocalConnections
+from tiered_cache import TieredCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    country TEXT NOT NULL,
+    population INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS places_rtree USING rtree(
+    id, min_lat, max_lat, min_lon, max_lon
+);
+"""
+
+# Bounding-box half-widths tried in turn; most points have a place in the first
+SEARCH_RADII_KM = (5, 20, 80)
+
+
+class GeocodeUnavailable(Exception):
+    """The point needs the fallback geocoder, which is throttled or failing."""
+
+
+def read_geonames(path: str):
+    """Yield (id, name, lat, lon, country, population) from a GeoNames dump.
+
+    Accepts the tab-separated ``.txt`` or the ``.zip`` it is published in;
+    only populated places (feature class P) are kept.
+    """
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            member = next(n for n in archive.namelist() if n.endswith(".txt") and "readme" not in n.lower())
+            with archive.open(member) as raw:
+                yield from _geonames_rows(io.TextIOWrapper(raw, encoding="utf-8"))
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield from _geonames_rows(f)
+
+
+def _geonames_rows(lines):
+    for row in csv.reader(lines, delimiter="\t", quoting=csv.QUOTE_NONE):
+        if len(row) < 15 or row[6] != "P":
+            continue
+        yield (
+            int(row[0]), row[1], float(row[4]), float(row[5]),
+            row[8], int(row[14] or 0),
+        )
+
+
+class Gazetteer:
+    def __init__(self, path: str):
+        self.path = path
+        self._db = ThreadLocalConnections(path, SCHEMA)
+
+    def upsert(self, places) -> int:
+        """Insert or replace rows from read_geonames(); returns how many were stored."""
+        conn = self._db.get()
+        count = 0
+        with conn:
+            for place_id, name, lat, lon, country, population in places:
+                conn.execute(
+                    "INSERT OR REPLACE INTO places (id, name, country, population) VALUES (?, ?, ?, ?)",
+                    (place_id, name, country, population),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO places_rtree VALUES (?, ?, ?, ?, ?)",
+                    (place_id, lat, lat, lon, lon),
+                )
+                count += 1
+        return count
+
+    def count(self) -> int:
+        return self._db.get().execute("SELECT COUNT(*) FROM places").fetchone()[0]
+
+    def nearest(self, lat: float, lon: float, max_km: float = 50) -> dict | None:
+        """The place nearest to (lat, lon) within ``max_km``, or None."""
+        conn = self._db.get()
+        for radius_km in [r for r in SEARCH_RADII_KM if r < max_km] + [max_km]:
+            rows = conn.execute(
+                "SELECT p.name, p.country, r.min_lat, r.min_lon FROM places_rtree r "
+                "JOIN places p ON p.id = r.id "
+                "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?",
+                bounding_box(lat, lon, radius_km),
+            ).fetchall()
+            if not rows:
+                continue
+            distance, name, country = min(
+                (haversine(lat, lon, p_lat, p_lon), name, country)
+                for name, country, p_lat, p_lon in rows
+            )
+            # A place in the box corner may be farther than one just outside
+            # it, so only accept distances the box fully covers.
+            if distance <= radius_km:
+                return {"name": name, "country": country, "distanceKm": round(distance, 1)}
+        return None
+
+
+class ReverseGeocoder:
+    """Cached place names for coordinates.
+
+    Coordinates are rounded to ``precision`` decimals (2 is about 1 km) before
+    anything else, so nearby users share a cache entry and the fallback never
+    sees a precise location. ``fallback(lat, lon)`` is called for points the
+    gazetteer cannot place (or for every miss when there is no gazetteer), at
+    most once per ``fallback_interval`` seconds: across all workers when they
+    share a SharedStore, per process otherwise. Misses are cached too, as
+    ``{}``; a throttled or failed fallback is not.
+    """
+
+    namespace = "geocode"
+
+    def __init__(
+        self,
+        gazetteer: Gazetteer | None,
+        maxsize: int = 4096,
+        ttl: float = 86400,
+        precision: int = 2,
+        max_km: float = 50,
+        shared: SharedStore | None = None,
+        fallback=None,
+        fallback_interval: float = 1.0,
+    ):
+        self.gazetteer = gazetteer
+        self.precision = precision
+        self.max_km = max_km
+        self.fallback = fallback
+        self.fallback_interval = fallback_interval
+        self._places = TieredCache(
+            self.namespace, maxsize=maxsize, ttl=ttl, shared=shared,
+            shared_key=lambda key: f"{key[0]},{key[1]}",
+        )
+        self._shared = shared
+        self._lock = threading.Lock()
+        self._last_fallback = -math.inf
+
+    def key_for(self, lat: float, lon: float) -> tuple[float, float]:
+        return round(lat, self.precision), round(lon, self.precision)
+
+    def resolve(self, lat: float, lon: float) -> dict | None:
+        """``{"name", "country", "source", ...}`` for the point, or None.
+
+        Raises GeocodeUnavailable if only the fallback could answer and it
+        is throttled or fails.
+        """
+        key = self.key_for(lat, lon)
+        place = self._places.get(key)
+        if place is not None:
+            return place or None
+
+        place = self._lookup(*key)
+        if place is None and self.fallback is not None:
+            if not self._may_fall_back():
+                raise GeocodeUnavailable("fallback geocoder throttled")
+            try:
+                place = self.fallback(*key)
+            except Exception as e:
+                raise GeocodeUnavailable(f"fallback geocoder failed: {e}") from e
+
+        self._places.set(key, place or {})
+        return place
+
+    def _lookup(self, lat: float, lon: float) -> dict | None:
+        if self.gazetteer is None:
+            return None
+        place = self.gazetteer.nearest(lat, lon, self.max_km)
+        if place is not None:
+            place["source"] = "gazetteer"
+        return place
+
+    def _may_fall_back(self) -> bool:
+        if self._shared is not None:
+            return self._shared.claim(f"{self.namespace}-fallback", "slot", self.fallback_interval)
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_fallback < self.fallback_interval:
+                return False
+            self._last_fallback = now
+            return True
@@ -0,0 +1,453 @@
+"""
+Gemini symptom analysis, shared by the Flask views (app.py) and the async
+handlers (asgi.py): the clinical system instruction, request URLs and
+bodies, decoding answers, the curated fallback, and the bookkeeping of a
+batch. Sending requests and waiting on them stays with each caller,
+blocking in one and awaited in the other.
+"""
+
+import hashlib
+import json
+import logging
+import time
+
+from analysis_cache import normalize_symptoms
+from gemini_context import CachedInstruction
+from medical_fallback import FALLBACK_DATABASE, match_fallback_key
+from metrics import FALLBACK_ACTIVATIONS, STAGE_SECONDS
+from prepared_response import PreparedPayload, dumps_json
+
+logger = logging.getLogger(__name__)
+
+INVALID_KEY_MESSAGE = "Invalid API key. Please check your key and try again."
+
+CLINICAL_SYSTEM_PROMPT = """You are an AI Clinical Decision Support Assistant trained to generate structured, physician-style consultation notes using evidence-based clinical reasoning.
+
+Your role is to analyze reported symptoms and produce a medically coherent, differential-based assessment. You must prioritize patient safety, pharmacological accuracy, and diagnostic relevance.
+
+CORE CLINICAL REASONING REQUIREMENTS
+
+Perform structured symptom analysis before generating output:
+
+Onset (acute, subacute, chronic)
+
+Duration
+
+Severity
+
+Associated symptoms
+
+Risk factors (age, comorbidities if provided)
+
+Construct a probability-ranked differential diagnosis using:
+
+Epidemiology
+
+Symptom clustering
+
+Typical disease progression
+
+Red flag exclusion
+
+Ensure all recommendations are:
+
+Pharmacologically appropriate
+
+Dose-accurate (adult dosing unless specified)
+
+Contraindication-aware
+
+Non-restricted (no antibiotics, steroids, Schedule H/H1, controlled drugs)
+
+STRICT SAFETY CONTROLS
+
+NEVER provide definitive diagnosis.
+
+NEVER claim certainty.
+
+NEVER provide restricted prescription medications.
+
+NEVER fabricate rare diseases unless symptomatically justified.
+
+If pediatric (<18), elderly (>65), pregnant, or chronic illness context is mentioned:
+
+Add enhanced caution in recommendations.
+
+If symptoms match emergency patterns (e.g., chest pain + shortness of breath, unilateral weakness, severe dehydration, altered consciousness):
+
+Set emergencyRisk to true.
+
+Prioritize emergency escalation.
+
+ANTI-GENERIC ENFORCEMENT
+
+Every field must reference the specific symptom pattern provided.
+
+Do not reuse vague language such as:
+
+"various causes"
+
+"could be many reasons"
+
+"monitor symptoms"
+
+Red flags must directly relate to listed differentials.
+
+Tests must map logically to differential diagnoses.
+
+Preventive advice must address recurrence mechanism of listed conditions.
+
+PHARMACOLOGY RULES
+
+For each OTC medication:
+
+Use generic name first.
+
+Include one common brand name (if region unspecified, use globally recognized).
+
+Provide:
+
+Standard adult dose
+
+Frequency
+
+Maximum daily dose
+
+Mechanism (brief, 1 line)
+
+Contraindications
+
+Common side effects
+
+Clear “Avoid if” condition
+
+If dosage uncertainty exists:
+
+State: “Dose must be confirmed by licensed physician.”
+
+Never exceed medically accepted dosage ranges.
+
+DIAGNOSTIC TEST LOGIC
+
+Only recommend tests that:
+
+Confirm high-probability conditions
+
+Rule out serious differentials
+
+Are clinically justified
+
+Explain reasoning briefly but precisely.
+
+EMERGENCY SIGN PROGRESSION
+
+Emergency signs must describe:
+
+Worsening trajectory
+
+Complication markers
+
+Timeline-related escalation indicators
+
+Avoid generic emergency warnings.
+
+TONE
+
+Clinical
+
+Professional
+
+Reassuring
+
+Precise
+
+No emojis
+
+No conversational fillers
+
+OUTPUT FORMAT
+
+Respond ONLY with valid JSON.
+No markdown.
+No explanation outside JSON.
+No additional commentary.
+
+JSON SCHEMA (STRICT COMPLIANCE REQUIRED)
+
+{
+"chiefComplaint": "string",
+"clinicalSummary": "Concise synthesis of symptom pattern using medical terminology with lay explanation in parentheses.",
+"differentialDiagnosis": [
+{
+"condition": "string",
+"probability": "High|Moderate|Low",
+"explanation": "Pathophysiologic reasoning specific to this symptom cluster."
+}
+],
+"severityAssessment": {
+"level": "Mild|Moderate|Severe",
+"emergencyRisk": false,
+"redFlagSymptoms": ["Specific warning sign tied to listed differentials."]
+},
+"immediateCare": {
+"lifestyleRemedies": ["Evidence-based action specific to symptom mechanism."],
+"otcMedications": [
+{
+"genericName": "string",
+"brandName": "string",
+"standardDose": "string",
+"frequency": "string",
+"maxDailyDose": "string",
+"mechanism": "Brief pharmacologic mechanism.",
+"contraindications": "string",
+"sideEffects": "string",
+"avoidIf": "string"
+}
+]
+},
+"recommendedTests": [
+{
+"testName": "string",
+"reason": "Diagnostic value tied to specific differential."
+}
+],
+"emergencySigns": ["Condition-specific deterioration pattern."],
+"preventiveAdvice": ["Evidence-based recurrence prevention specific to listed diagnoses."],
+"specialist": "Most appropriate specialty if escalation required.",
+"consultationReason": "Why in-person physician evaluation is medically necessary for this symptom pattern.",
+"confidence": 0
+}
+
+CONFIDENCE SCORING RULE
+
+Confidence must reflect:
+
+Symptom completeness
+
+Diagnostic clarity
+
+Absence of conflicting data
+
+Use:
+
+80–90 for common, clear symptom patterns
+
+60–75 if incomplete information
+
+<60 if highly nonspecific presentation
+
+Never use 100."""
+
+
+# ──────────────────────────────────────────────
+# Requests and answers
+# ──────────────────────────────────────────────
+class GeminiRequests:
+    """URLs and bodies for the model's generate methods.
+
+    With a CachedInstruction, a body references its cachedContents handle,
+    when the key has one, instead of carrying the instruction.
+    """
+
+    def __init__(self, api_base: str, model: str, system_instruction: CachedInstruction | None = None):
+        self.api_base = api_base
+        self.model = model
+        self.system_instruction = system_instruction
+
+    def url(self, api_key: str, method: str) -> str:
+        url = f"{self.api_base}/models/{self.model}:{method}?key={api_key}"
+        if method == "streamGenerateContent":
+            url += "&alt=sse"
+        return url
+
+    def body(self, api_key: str, symptoms: str) -> tuple[dict, bool]:
+        """(request body, whether it references cached content)."""
+        handle = self.system_instruction.handle_for(api_key) if self.system_instruction else None
+        return analysis_body(symptoms, handle), handle is not None
+
+    def cache_rejected(self, api_key: str, resp) -> bool:
+        """Whether a body that referenced cached content must be resent inline.
+
+        True when the cached content expired or was deleted upstream; the
+        handle is dropped so it gets recreated.
+        """
+        if resp.status_code not in (403, 404):
+            return False
+        self.system_instruction.invalidate(api_key)
+        return True
+
+
+def analysis_body(symptoms: str, cached_content: str | None = None) -> dict:
+    prompt = (
+        f'Patient\'s reported symptoms: "{symptoms}"\n\n'
+        f"IMPORTANT: Analyze ONLY the symptoms described above. "
+        f"Every field must be uniquely relevant to these specific symptoms. "
+        f"Do not use generic filler."
+    )
+
+    payload = {
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "generationConfig": {
+            "temperature": 0.3,
+            "maxOutputTokens": 4096,
+            "responseMimeType": "application/json",
+        },
+    }
+    if cached_content:
+        payload["cachedContent"] = cached_content
+    else:
+        payload["systemInstruction"] = {"parts": [{"text": CLINICAL_SYSTEM_PROMPT}]}
+    return payload
+
+
+def check_response(resp) -> None:
+    """Raise ValueError if Gemini rejected the key, else as ``raise_for_status``.
+
+    Works on requests and httpx responses alike; a streamed httpx error
+    response must have been read first.
+    """
+    if resp.status_code in (401, 403):
+        raise ValueError(INVALID_KEY_MESSAGE)
+
+    if resp.status_code == 400:
+        body = resp.json()
+        err_msg = json.dumps(body).lower()
+        if "api_key_invalid" in err_msg or "api key not valid" in err_msg:
+            raise ValueError(INVALID_KEY_MESSAGE)
+
+    resp.raise_for_status()
+
+
+def decode_analysis(data: dict) -> dict:
+    """The analysis in a generateContent answer."""
+    with STAGE_SECONDS.time(stage="gemini_decode"):
+        return parse_analysis(data["candidates"][0]["content"]["parts"][0]["text"])
+
+
+def parse_analysis(text: str) -> dict:
+    """The analysis in the model's text, without any markdown code fence."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return json.loads(text.strip())
+
+
+def flight_key(api_key: str, symptoms: str) -> tuple[str, str]:
+    """Coalescing key: calls with the same key and normalized symptoms share one request."""
+    return hashlib.sha256(api_key.encode()).hexdigest(), normalize_symptoms(symptoms) or symptoms
+
+
+# ──────────────────────────────────────────────
+# Curated fallback
+# ──────────────────────────────────────────────
+# Fallback analyses never change, so serialize and compress them once
+FALLBACK_PAYLOADS = {
+    key: PreparedPayload.from_json(response) for key, response in FALLBACK_DATABASE.items()
+}
+
+
+def fallback_key(symptoms: str, reason: str) -> str:
+    """Match the curated fallback for ``symptoms``, counting why it was needed."""
+    FALLBACK_ACTIVATIONS.inc(reason=reason)
+    with STAGE_SECONDS.time(stage="match_fallback"):
+        return match_fallback_key(symptoms)
+
+
+def fallback_analysis(symptoms: str, reason: str) -> dict:
+    return FALLBACK_DATABASE[fallback_key(symptoms, reason)]
+
+
+def provisional_analysis(symptoms: str, token: str) -> dict:
+    """The fallback answered at the deadline, with the token of the analysis still running."""
+    body = dict(fallback_analysis(symptoms, "deadline"))
+    body.update(provisional=True, resultToken=token)
+    return body
+
+
+# ──────────────────────────────────────────────
+# Batches
+# ──────────────────────────────────────────────
+class BatchItem:
+    __slots__ = ("index", "id", "symptoms", "started")
+
+    def __init__(self, index, item_id, symptoms):
+        self.index = index
+        self.id = item_id
+        self.symptoms = symptoms
+        # When a worker picked it up (time.monotonic())
+        self.started = None
+
+    def line(self, source: str, result: dict, error: str | None = None) -> bytes:
+        body = {"index": self.index, "id": self.id, "source": source, "result": result}
+        if error:
+            body["error"] = error
+        return dumps_json(body)
+
+    def fallback(self, reason: str, error: str | None = None) -> bytes:
+        return self.line("fallback", fallback_analysis(self.symptoms, reason), error)
+
+
+class Batch:
+    """The items of one /api/analyze/batch request and the ones still running.
+
+    Callers run each item that needs Gemini as a future (concurrent or
+    asyncio) registered with ``track``, and wait on ``pending``; this class
+    turns outcomes and timeouts into NDJSON lines. An item's timeout runs
+    from when it was picked up, so items queued behind a full pool are not
+    penalized for waiting.
+    """
+
+    def __init__(self, items: list[tuple], api_key: str, item_timeout: float):
+        self.items = [BatchItem(*item) for item in items]
+        self.api_key = api_key
+        self.item_timeout = item_timeout
+        self.pending: dict = {}
+
+    def immediate_line(self, item: BatchItem, cached: dict | None, available: bool) -> bytes | None:
+        """The item's line if it needs no Gemini call, else None."""
+        if cached is not None:
+            return item.line("cache", cached)
+        if not self.api_key:
+            return item.fallback("no_api_key")
+        if not available:
+            return item.fallback("circuit_open")
+        return None
+
+    def track(self, item: BatchItem, future) -> None:
+        self.pending[future] = item
+
+    def expired_lines(self) -> list[bytes]:
+        """Fallback lines for running items past their timeout, which stop being pending."""
+        now = time.monotonic()
+        lines = []
+        for future, item in list(self.pending.items()):
+            if item.started is not None and now - item.started > self.item_timeout and not future.done():
+                del self.pending[future]
+                lines.append(item.fallback("batch_timeout", "Analysis timed out"))
+        return lines
+
+    def wait_timeout(self) -> float:
+        """How long to wait for the next outcome before checking timeouts again."""
+        now = time.monotonic()
+        deadlines = [item.started + self.item_timeout for item in self.pending.values() if item.started is not None]
+        return max(min([*deadlines, now + 0.5]) - now, 0)
+
+    def done_line(self, future) -> bytes:
+        """The line for a finished pending future."""
+        item = self.pending.pop(future)
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Batch item {item.index} AI error, falling to fallback: {e}")
+            return item.fallback("upstream_error", str(e))
+        if result:
+            return item.line("ai", result)
+        return item.fallback("upstream_error", "Empty analysis")
+
+    def unstarted(self) -> list:
+        """Pending futures whose item has not been picked up yet."""
+        return [future for future, item in self.pending.items() if item.started is None]
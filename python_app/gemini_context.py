@@ -0,0 +1,107 @@
+"""
+Gemini cached-content handle for the clinical system instruction.
+
+The system instruction is identical on every analysis, so instead of
+sending it with each request it can be uploaded once as a
+``cachedContents`` resource and referenced by name. Only the server's own
+key gets a handle: creating cached content on a user's key would store
+(and bill) a resource in their project that they never asked for.
+
+The handle is created, and extended shortly before it expires, on a
+background thread; requests never wait for it and carry the instruction
+inline until it exists. If the API refuses to cache the instruction (too
+few tokens for the model, unsupported key tier, ...) that is remembered
+for a while before trying again.
+"""
+
+import threading
+import time
+
+
+class CachedInstruction:
+    def __init__(self, client, api_base: str, model: str, instruction: str, api_key: str,
+                 ttl: int = 3600, refresh_margin: int = 300, retry_after: int = 600,
+                 clock=time.monotonic):
+        self.client = client
+        self.api_base = api_base
+        self.model = model
+        self.instruction = instruction
+        self.api_key = api_key
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self._clock = clock
+        # cachedContents name (or None) and when it expires, or when to
+        # try again after a refused create
+        self._name: str | None = None
+        self._expires_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def handle_for(self, api_key: str) -> str | None:
+        """A live ``cachedContents/...`` name to send with ``api_key``, or None.
+
+        Never blocks: a missing or expiring handle is refreshed in the
+        background and this request goes inline (or keeps the old handle).
+        """
+        if not api_key or api_key != self.api_key:
+            return None
+        with self._lock:
+            now = self._clock()
+            name = self._name if now < self._expires_at else None
+            margin = self.refresh_margin if self._name else 0
+            if now >= self._expires_at - margin and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self.refresh, name="gemini-context", daemon=True).start()
+        return name
+
+    def refresh(self) -> str | None:
+        """Extend the handle, or create one; returns the live name or None."""
+        with self._lock:
+            current = self._name if self._clock() < self._expires_at else None
+        name, ttl = None, self.retry_after
+        try:
+            if current and self._extend(current):
+                name, ttl = current, self.ttl
+            else:
+                name = self._create()
+                ttl = self.ttl if name else self.retry_after
+        finally:
+            with self._lock:
+                self._name, self._expires_at = name, self._clock() + ttl
+                self._refreshing = False
+        return name
+
+    def invalidate(self, api_key: str) -> None:
+        """Drop the handle after Gemini rejected it; the next call recreates it."""
+        if api_key != self.api_key:
+            return
+        with self._lock:
+            self._name, self._expires_at = None, 0.0
+
+    def _create(self) -> str | None:
+        try:
+            resp = self.client.post(
+                f"{self.api_base}/cachedContents?key={self.api_key}",
+                json={
+                    "model": f"models/{self.model}",
+                    "systemInstruction": {"parts": [{"text": self.instruction}]},
+                    "ttl": f"{self.ttl}s",
+                },
+            )
+        except Exception:
+            return None
+        if not resp.ok:
+            return None
+        return resp.json().get("name")
+
+    def _extend(self, name: str) -> bool:
+        try:
+            resp = self.client.request(
+                "PATCH",
+                f"{self.api_base}/{name}?key={self.api_key}&updateMask=ttl",
+                json={"ttl": f"{self.ttl}s"},
+            )
+        except Exception:
+            return False
+        return resp.ok
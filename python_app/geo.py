@@ -0,0 +1,37 @@
+"""
+Geographic helpers shared by the Find Care search.
+"""
+
+import math
+
+KM_PER_DEG_LAT = 111.32
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371
+    d_lat = math.radians(lat2 - lat1)
+    d_lon = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_lat / 2) ** 2
+        + math.cos(math.radians(lat1))
+        * math.cos(math.radians(lat2))
+        * math.sin(d_lon / 2) ** 2
+    )
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+
+def element_coords(el):
+    """Return (lat, lon) of an Overpass node, or the center of a way."""
+    center = el.get("center", {}) or {}
+    return (
+        el.get("lat") or center.get("lat", 0),
+        el.get("lon") or center.get("lon", 0),
+    )
+
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) of a box around a ``radius_km`` circle."""
+    d_lat = radius_km / KM_PER_DEG_LAT
+    d_lon = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+    return lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon
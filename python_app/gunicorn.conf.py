@@ -0,0 +1,80 @@
+"""
+Gunicorn settings for production serving.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment.
+
+The app is preloaded in the master, so SIGHUP re-forks workers from the
+code already imported there and does not pick up changes. To deploy new
+code without dropping requests, start a new master next to the old one and
+then retire the old one:
+
+    kill -USR2 $(cat gunicorn.pid)            # new master + workers, new code
+    kill -WINCH $(cat gunicorn.pid.oldbin)    # old workers finish and exit
+    kill -QUIT $(cat gunicorn.pid.oldbin)     # old master exits
+
+With GUNICORN_PRELOAD=false each worker imports the app itself, and SIGHUP
+is enough.
+"""
+
+import multiprocessing
+import os
+
+# Workers share caches through SQLite, so turn the shared store on by default.
+os.environ.setdefault("SHARED_CACHE_DB", "cache.sqlite")
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+
+# Pre-fork workers, each serving several requests on threads ("gthread").
+# Set GUNICORN_WORKER_CLASS=gevent (pip install gevent) for green threads.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+# Import the app once in the master so workers fork ready to serve. Not with
+# gevent: its monkey-patching runs in each worker, after the preloaded app has
+# already created its locks and thread pools.
+preload_app = os.environ.get(
+    "GUNICORN_PRELOAD", "false" if worker_class == "gevent" else "true"
+).lower() in ("1", "true", "yes")
+
+# Upstream calls may retry a 30 s Gemini request; leave room before the
+# master kills a worker, and let in-flight requests finish on reload.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+
+pidfile = os.environ.get("GUNICORN_PIDFILE", "gunicorn.pid")
+accesslog = "-"
+errorlog = "-"
+
+
+def worker_exit(server, worker):
+    # Publish the exiting worker's last metrics so child_exit can retire them
+    from app import shared_metrics
+
+    if shared_metrics is not None:
+        shared_metrics.publish()
+
+
+def child_exit(server, worker):
+    # Fold an exited worker's metrics into the retired total (metrics.SharedMetrics)
+    from config import Config
+
+    if not Config.METRICS_ENABLED or not Config.SHARED_CACHE_DB:
+        return
+    from metrics import REGISTRY, SharedMetrics
+    from shared_store import SharedStore
+
+    store = SharedStore(Config.SHARED_CACHE_DB)
+    try:
+        SharedMetrics(REGISTRY, store).retire(worker.pid)
+    finally:
+        # Nothing may stay open in the master for the next fork to inherit
+        store.close()
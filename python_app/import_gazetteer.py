@@ -0,0 +1,34 @@
+"""
+Build or refresh the offline gazetteer used by /api/reverse-geocode.
+
+Usage:
+    python import_gazetteer.py cities15000.zip
+    python import_gazetteer.py cities500.txt --db gazetteer.sqlite
+
+Dumps are published at https://download.geonames.org/export/dump/
+(cities500 places every town and most villages; cities15000 is ~30k cities).
+"""
+
+import argparse
+
+from config import Config
+from gazetteer import Gazetteer, read_geonames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="GeoNames dump (.txt or .zip)")
+    parser.add_argument("--db", default=Config.GAZETTEER_PATH or "gazetteer.sqlite",
+                        help="gazetteer database path (default: GAZETTEER_PATH or gazetteer.sqlite)")
+    parser.add_argument("--min-population", type=int, default=0,
+                        help="skip places with fewer inhabitants")
+    args = parser.parse_args(argv)
+
+    places = (p for p in read_geonames(args.source) if p[5] >= args.min_population)
+    gazetteer = Gazetteer(args.db)
+    stored = gazetteer.upsert(places)
+    print(f"Imported {stored} places into {args.db} ({gazetteer.count()} total).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Build or refresh the offline provider index used by /api/find-care.
+
+Usage:
+    python import_providers.py extract.osm.pbf
+    python import_providers.py city.osm --index providers.sqlite
+    python import_providers.py overpass-dump.json
+    python import_providers.py --overpass 28.61 77.21 25000
+
+Extracts and --overpass fetches record the box they cover, and searches
+inside it are answered from the index. An Overpass JSON dump may hold any
+subset of tags, so it adds elements without claiming coverage.
+"""
+
+import argparse
+import json
+import math
+import sys
+import xml.etree.ElementTree as ET
+
+import requests
+
+from config import Config
+from geo import bounding_box
+from overpass_query import all_tag_filters, build_overpass_query_for_filters
+from provider_index import ProviderIndex, is_healthcare_element
+
+# Elements stored per transaction
+BATCH_SIZE = 5000
+
+
+class Extent:
+    """Running bounding box of every coordinate an import has read."""
+
+    __slots__ = ("min_lat", "max_lat", "min_lon", "max_lon")
+
+    def __init__(self):
+        self.min_lat = self.min_lon = math.inf
+        self.max_lat = self.max_lon = -math.inf
+
+    def add(self, lat: float, lon: float) -> None:
+        self.min_lat = min(self.min_lat, lat)
+        self.max_lat = max(self.max_lat, lat)
+        self.min_lon = min(self.min_lon, lon)
+        self.max_lon = max(self.max_lon, lon)
+
+    def box(self) -> tuple | None:
+        """(min_lat, max_lat, min_lon, max_lon), or None if nothing was read."""
+        if self.min_lat > self.max_lat:
+            return None
+        return self.min_lat, self.max_lat, self.min_lon, self.max_lon
+
+
+def read_overpass_json(path: str):
+    with open(path, encoding="utf-8") as f:
+        yield from json.load(f).get("elements", [])
+
+
+def read_osm_xml(path: str, extent: Extent | None = None):
+    """Yield nodes and ways from an OSM XML file in Overpass ``out center`` shape.
+
+    Every node, tagged or not, is added to ``extent``.
+    """
+    node_coords: dict[int, tuple[float, float]] = {}
+    tags: dict[str, str] = {}
+    refs: list[int] = []
+
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "tag":
+            tags[elem.get("k")] = elem.get("v")
+        elif elem.tag == "nd":
+            refs.append(int(elem.get("ref")))
+        elif elem.tag == "node":
+            node_id = int(elem.get("id"))
+            lat, lon = float(elem.get("lat")), float(elem.get("lon"))
+            node_coords[node_id] = (lat, lon)
+            if extent is not None:
+                extent.add(lat, lon)
+            if tags:
+                yield {"type": "node", "id": node_id, "lat": lat, "lon": lon, "tags": tags}
+            tags, refs = {}, []
+            elem.clear()
+        elif elem.tag == "way":
+            coords = [node_coords[r] for r in refs if r in node_coords]
+            if tags and coords:
+                yield {"type": "way", "id": int(elem.get("id")), "center": _bbox_center(coords), "tags": tags}
+            tags, refs = {}, []
+            elem.clear()
+        elif elem.tag == "relation":
+            tags, refs = {}, []
+            elem.clear()
+
+
+def import_osm_pbf(path: str, index: ProviderIndex, batch_size: int = BATCH_SIZE,
+                   extent: Extent | None = None) -> int:
+    """Index the healthcare nodes and ways of an OSM PBF extract (requires pyosmium).
+
+    osmium calls back for every object, so elements are filtered in the
+    handler and stored a batch at a time; memory stays flat however large
+    the extract is. Every node is added to ``extent``. Returns how many
+    were stored.
+    """
+    try:
+        import osmium
+    except ImportError:
+        sys.exit("Reading .pbf extracts requires pyosmium: pip install osmium")
+
+    class Handler(osmium.SimpleHandler):
+        def __init__(self):
+            super().__init__()
+            self.batch = []
+            self.stored = 0
+
+        def node(self, n):
+            if extent is not None:
+                extent.add(n.location.lat, n.location.lon)
+            if "name" not in n.tags:
+                return
+            el = {
+                "type": "node", "id": n.id,
+                "lat": n.location.lat, "lon": n.location.lon,
+                "tags": {t.k: t.v for t in n.tags},
+            }
+            if is_healthcare_element(el):
+                self.add(el)
+
+        def way(self, w):
+            if "name" not in w.tags:
+                return
+            el = {"type": "way", "id": w.id, "tags": {t.k: t.v for t in w.tags}}
+            if not is_healthcare_element(el):
+                return
+            coords = [(nd.lat, nd.lon) for nd in w.nodes if nd.location.valid()]
+            if coords:
+                el["center"] = _bbox_center(coords)
+                self.add(el)
+
+        def add(self, el):
+            self.batch.append(el)
+            if len(self.batch) >= batch_size:
+                self.flush()
+
+        def flush(self):
+            self.stored += index.upsert(self.batch)
+            self.batch = []
+
+    handler = Handler()
+    handler.apply_file(path, locations=True)
+    handler.flush()
+    return handler.stored
+
+
+def store_in_batches(index: ProviderIndex, elements, batch_size: int = BATCH_SIZE) -> int:
+    """upsert() ``elements`` one batch (and transaction) at a time."""
+    stored = 0
+    batch = []
+    for el in elements:
+        batch.append(el)
+        if len(batch) >= batch_size:
+            stored += index.upsert(batch)
+            batch = []
+    return stored + index.upsert(batch)
+
+
+def fetch_overpass(lat: float, lon: float, radius_m: int):
+    """Fetch every indexed healthcare tag around a point from Overpass."""
+    resp = requests.post(
+        Config.OVERPASS_URL,
+        data={"data": build_overpass_query_for_filters(lat, lon, radius_m, all_tag_filters())},
+        timeout=180,
+    )
+    resp.raise_for_status()
+    return resp.json().get("elements", [])
+
+
+def overpass_box(lat: float, lon: float, radius_m: float) -> tuple:
+    """The largest box inside the circle an --overpass fetch covers."""
+    return bounding_box(lat, lon, radius_m / 1000 / math.sqrt(2))
+
+
+def _bbox_center(coords):
+    lats = [c[0] for c in coords]
+    lons = [c[1] for c in coords]
+    return {"lat": (min(lats) + max(lats)) / 2, "lon": (min(lons) + max(lons)) / 2}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", nargs="?", help=".osm/.xml, .osm.pbf or Overpass .json file")
+    parser.add_argument("--index", default=Config.PROVIDER_INDEX_PATH or "providers.sqlite",
+                        help="index database path (default: PROVIDER_INDEX_PATH or providers.sqlite)")
+    parser.add_argument("--overpass", nargs=3, type=float, metavar=("LAT", "LON", "RADIUS_M"),
+                        help="refresh the index from Overpass around a point instead of a file")
+    args = parser.parse_args(argv)
+
+    if not args.overpass and not args.source:
+        parser.error("a source file or --overpass is required")
+
+    index = ProviderIndex(args.index)
+    extent = Extent()
+    if args.overpass:
+        lat, lon, radius_m = args.overpass
+        stored = store_in_batches(index, fetch_overpass(lat, lon, int(radius_m)))
+        box = overpass_box(lat, lon, radius_m)
+    elif args.source.endswith(".pbf"):
+        stored = import_osm_pbf(args.source, index, extent=extent)
+        box = extent.box()
+    elif args.source.endswith(".json"):
+        stored = store_in_batches(index, read_overpass_json(args.source))
+        box = None
+    else:
+        stored = store_in_batches(index, read_osm_xml(args.source, extent))
+        box = extent.box()
+    print(f"Indexed {stored} providers into {args.index} ({index.count()} total).")
+
+    if box is not None:
+        index.record_import(*box)
+        print("Searches within lat {:.4f}..{:.4f}, lon {:.4f}..{:.4f} are answered from the index.".format(*box))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+In-process counters and latency histograms, rendered in Prometheus text format.
+
+Stages of a request are timed with ``STAGE_SECONDS.time(stage=...)``, so a
+slow /api/find-care or /api/analyze can be split into upstream wait,
+decoding, ranking and serialization.
+
+Each worker process keeps its own registry. With a SharedStore (see
+SharedMetrics), every worker publishes a snapshot of it every few seconds
+and a scrape renders the sum over all workers, so counters do not jump
+with whichever worker answered. Every metric is a counter or histogram,
+so sums stay meaningful; the counts of exited workers are folded into a
+retired total rather than dropped.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_text(labelnames: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def snapshot(self) -> list:
+        """JSON-serializable ``[[label values, value], ...]``."""
+        with self._lock:
+            return self.dump(self._values)
+
+    @staticmethod
+    def dump(values: dict) -> list:
+        return [[list(key), value] for key, value in values.items()]
+
+    @staticmethod
+    def merge(snapshots) -> dict:
+        total = {}
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                key = tuple(key)
+                total[key] = total.get(key, 0) + value
+        return total
+
+    def samples(self, snapshots=None):
+        """Sample lines for this process, or for the sum of ``snapshots``."""
+        for key, value in sorted(self.merge(snapshots or [self.snapshot()]).items()):
+            yield f"{self.name}{_label_text(self.labelnames, key)} {_format(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> list:
+        """JSON-serializable ``[[label values, bucket counts, sum], ...]``."""
+        with self._lock:
+            return self.dump(self._series)
+
+    @staticmethod
+    def dump(series: dict) -> list:
+        return [[list(key), list(counts), total] for key, (counts, total) in series.items()]
+
+    @staticmethod
+    def merge(snapshots) -> dict:
+        series = {}
+        for snapshot in snapshots:
+            for key, counts, total in snapshot:
+                key = tuple(key)
+                if key not in series:
+                    series[key] = [list(counts), total]
+                else:
+                    merged = series[key]
+                    merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                    merged[1] += total
+        return series
+
+    def samples(self, snapshots=None):
+        """Sample lines for this process, or for the sum of ``snapshots``."""
+        for key, (counts, total) in sorted(self.merge(snapshots or [self.snapshot()]).items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format(bound)}"'
+                yield f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}"
+            labels = _label_text(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Counter | Histogram] = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> dict:
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def render(self, snapshots=None) -> str:
+        """Prometheus text for this process, or for the sum of registry ``snapshots``."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if snapshots is None:
+                lines.extend(metric.samples())
+            else:
+                lines.extend(metric.samples([s.get(metric.name, []) for s in snapshots]))
+        return "\n".join(lines) + "\n"
+
+    def merge(self, snapshots) -> dict:
+        """The sum of registry ``snapshots``, as one snapshot."""
+        return {
+            metric.name: metric.dump(metric.merge([s.get(metric.name, []) for s in snapshots]))
+            for metric in self._metrics
+        }
+
+
+class SharedMetrics:
+    """Publishes this process's registry to a SharedStore and renders the
+    sum over every process that did.
+
+    Each process writes its snapshot under its pid every ``interval``
+    seconds from a daemon thread, started on first use in each process so a
+    preloading master does not start it before forking. When a worker exits,
+    ``retire(pid)`` (run by the gunicorn master) adds its last snapshot to
+    the retired total, so the sum never goes backwards.
+    """
+
+    namespace = "metrics"
+    # Snapshots are rewritten every interval; this only bounds how long the
+    # rows of processes that died without being retired are kept.
+    ttl = 30 * 86400
+
+    def __init__(self, registry: Registry, store, interval: float = 5):
+        self.registry = registry
+        self.store = store
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start publishing from this process (a no-op once it has)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name="metrics-publish", daemon=True).start()
+
+    def publish(self) -> None:
+        self.store.set(self.namespace, str(os.getpid()), self.registry.snapshot(), self.ttl)
+
+    def render(self) -> str:
+        self.start()
+        self.publish()
+        return self.registry.render(self.store.values(self.namespace))
+
+    def retire(self, pid: int) -> None:
+        """Fold an exited process's snapshot into the retired total."""
+        snapshot = self.store.get(self.namespace, str(pid))
+        if snapshot is None:
+            return
+        retired = self.store.get(self.namespace, "retired") or {}
+        self.store.set(self.namespace, "retired", self.registry.merge([retired, snapshot]), self.ttl)
+        self.store.delete(self.namespace, str(pid))
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.publish()
+            except Exception:
+                logger.warning("Publishing metrics failed", exc_info=True)
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "healthagg_request_duration_seconds", "Time spent handling a request.", ("endpoint",),
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "healthagg_stage_duration_seconds", "Time spent in one stage of a request.", ("stage",),
+)
+FALLBACK_ACTIVATIONS = REGISTRY.counter(
+    "healthagg_fallback_activations_total", "Analyses answered from the curated fallback.", ("reason",),
+)
+GEMINI_KEY_ERRORS = REGISTRY.counter(
+    "healthagg_gemini_key_errors_total", "Analyses rejected with 401 for an invalid Gemini key.",
+)
+UPSTREAM_TIMEOUTS = REGISTRY.counter(
+    "healthagg_upstream_timeouts_total", "Upstream requests that timed out.", ("upstream",),
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "healthagg_upstream_errors_total", "Upstream requests that failed or returned 429/5xx.", ("upstream",),
+)
+COALESCED_CALLS = REGISTRY.counter(
+    "healthagg_coalesced_calls_total", "Calls that joined an identical in-flight upstream call.", ("flight",),
+)
+HEDGED_REQUESTS = REGISTRY.counter(
+    "healthagg_hedged_requests_total", "Requests duplicated to a second mirror after the hedge delay.", ("upstream",),
+)
+HEDGE_WINS = REGISTRY.counter(
+    "healthagg_hedge_wins_total", "Hedged requests answered first by the duplicate.", ("upstream",),
+)
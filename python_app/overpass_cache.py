@@ -0,0 +1,143 @@
+"""
+Geo-tiled cache of Overpass results for the Find Care search.
+
+Locations are snapped to a grid of square tiles. The first search in a tile
+queries Overpass around the tile center with the requested radius plus half
+the tile diagonal, so the result covers that radius from any point inside the
+tile. Later searches in the same tile with the same tag set and a radius no
+larger than the cached one reuse the cached elements. A search can also be
+answered from the area cached for every healthcare tag (ALL_TAGS, what
+/api/find-care/warm fetches), filtered down to the tags it selects.
+
+Concurrent misses for the same tile, tag set and radius share a single
+Overpass request. With a SharedStore, fills are also written to SQLite so
+other worker processes can reuse them.
+"""
+
+import json
+import math
+
+from geo import haversine
+from overpass_query import all_tag_filters, element_matches
+from shared_store import SharedStore
+from singleflight import AsyncSingleFlight, SingleFlight
+from tiered_cache import TieredCache
+
+ALL_TAGS = frozenset(all_tag_filters())
+
+
+class OverpassCache:
+    namespace = "overpass"
+
+    def __init__(self, tile_deg: float = 0.01, maxsize: int = 256, ttl: float = 600,
+                 shared: SharedStore | None = None, flight_timeout: float | None = None):
+        self.tile_deg = tile_deg
+        # Areas are {"radius_m": ..., "elements": [...]} keyed by (tile, tags)
+        self._areas = TieredCache(self.namespace, maxsize=maxsize, ttl=ttl, shared=shared, shared_key=area_key)
+        self._flights = SingleFlight("overpass", wait_timeout=flight_timeout)
+        self._async_flights = AsyncSingleFlight("overpass", wait_timeout=flight_timeout)
+        self.hits = 0
+        self.misses = 0
+
+    def tile_for(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.tile_deg), math.floor(lon / self.tile_deg)
+
+    def tile_center(self, tile: tuple[int, int]) -> tuple[float, float]:
+        return (
+            round((tile[0] + 0.5) * self.tile_deg, 6),
+            round((tile[1] + 0.5) * self.tile_deg, 6),
+        )
+
+    def _tile_pad_m(self, tile: tuple[int, int]) -> int:
+        """Distance in metres from the tile center to its farthest corner."""
+        c_lat, c_lon = self.tile_center(tile)
+        half = self.tile_deg / 2
+        corner_lat = c_lat + half if c_lat >= 0 else c_lat - half
+        return math.ceil(haversine(c_lat, c_lon, corner_lat, c_lon + half) * 1000)
+
+    def lookup(self, lat: float, lon: float, radius_m: int, tags) -> list[dict] | None:
+        """Return cached elements covering ``radius_m`` around (lat, lon), or None."""
+        tile = self.tile_for(lat, lon)
+        elements = self._covering(tile, tags, radius_m)
+        if elements is None and tags != ALL_TAGS:
+            elements = self._covering(tile, ALL_TAGS, radius_m)
+            if elements is not None:
+                elements = [el for el in elements if element_matches(el, tags)]
+        if elements is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return elements
+
+    def _covering(self, tile, tags, radius_m: int) -> list[dict] | None:
+        # Another worker may have cached a wider area than this one has
+        area = self._areas.get((tile, tags), stale=lambda a: a["radius_m"] < radius_m)
+        if area is not None and area["radius_m"] >= radius_m:
+            return area["elements"]
+        return None
+
+    def get_or_fetch(self, lat: float, lon: float, radius_m: int, tags, fetch) -> list[dict]:
+        """Return cached elements covering ``radius_m`` around (lat, lon).
+
+        ``tags`` is the hashable tag set the query selects and ``fetch`` is
+        called as ``fetch(center_lat, center_lon, radius_m)`` on a miss. The
+        result is a superset; callers drop elements beyond ``radius_m``.
+        """
+        elements = self.lookup(lat, lon, radius_m, tags)
+        if elements is not None:
+            return elements
+
+        tile = self.tile_for(lat, lon)
+        return self._flights.do((tile, tags, radius_m), lambda: self._fill(tile, tags, radius_m, fetch))
+
+    async def get_or_fetch_async(self, lat: float, lon: float, radius_m: int, tags, fetch) -> list[dict]:
+        """get_or_fetch for the async path: ``fetch`` is a coroutine function."""
+        elements = self.lookup(lat, lon, radius_m, tags)
+        if elements is not None:
+            return elements
+
+        tile = self.tile_for(lat, lon)
+        return await self._async_flights.do(
+            (tile, tags, radius_m), lambda: self._fill_async(tile, tags, radius_m, fetch)
+        )
+
+    def _fill(self, tile, tags, radius_m: int, fetch) -> list[dict]:
+        elements = self._filled(tile, tags, radius_m)
+        if elements is None:
+            c_lat, c_lon = self.tile_center(tile)
+            elements = fetch(c_lat, c_lon, radius_m + self._tile_pad_m(tile))
+            self._store(tile, tags, radius_m, elements)
+        return elements
+
+    async def _fill_async(self, tile, tags, radius_m: int, fetch) -> list[dict]:
+        elements = self._filled(tile, tags, radius_m)
+        if elements is None:
+            c_lat, c_lon = self.tile_center(tile)
+            elements = await fetch(c_lat, c_lon, radius_m + self._tile_pad_m(tile))
+            self._store(tile, tags, radius_m, elements)
+        return elements
+
+    def _filled(self, tile, tags, radius_m: int) -> list[dict] | None:
+        # A flight that finished just before this one started may have
+        # filled the area already.
+        area = self._areas.get((tile, tags))
+        if area is not None and area["radius_m"] >= radius_m:
+            return area["elements"]
+        return None
+
+    def _store(self, tile, tags, radius_m: int, elements: list[dict]) -> None:
+        # Flights for different radii can finish in any order; never let a
+        # narrower area replace a wider one that has not expired yet.
+        key = (tile, tags)
+        current = self._areas.get(key, stale=lambda a: a["radius_m"] < radius_m)
+        if current is None or current["radius_m"] <= radius_m:
+            self._areas.set(key, {"radius_m": radius_m, "elements": elements})
+
+    def clear(self) -> None:
+        self._areas.clear()
+
+
+def area_key(key) -> str:
+    """Text form of a (tile, tags) cache key, for storage outside the process."""
+    tile, tags = key
+    return json.dumps([tile, sorted(tags)], separators=(",", ":"))
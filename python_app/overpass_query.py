@@ -0,0 +1,121 @@
+"""
+Overpass QL generation for the Find Care search.
+"""
+
+OVERPASS_KW_MAP = {
+    "doctor": [('amenity', 'doctors'), ('healthcare', 'doctor')],
+    "physician": [('amenity', 'doctors'), ('healthcare', 'doctor')],
+    "lab": [('healthcare', 'laboratory'), ('amenity', 'laboratory')],
+    "test": [('healthcare', 'laboratory')],
+    "diagnostic": [('healthcare', 'laboratory')],
+    "pathology": [('healthcare', 'laboratory')],
+    "pharmacy": [('amenity', 'pharmacy')],
+    "medicine": [('amenity', 'pharmacy')],
+    "dentist": [('amenity', 'dentist')],
+    "dental": [('amenity', 'dentist')],
+    "eye": [('healthcare', 'optometrist'), ('shop', 'optician')],
+    "mental": [('healthcare', 'psychotherapist'), ('healthcare', 'counselling')],
+    "psychiatr": [('healthcare', 'psychotherapist')],
+}
+
+
+def overpass_tag_filters(query):
+    """Return the (element types, tag key, tag value) filters a search selects."""
+    q = query.lower()
+    filters = []
+
+    # Always include hospitals and clinics
+    for amenity in ("hospital", "clinic"):
+        filters.append((("node", "way"), "amenity", amenity))
+
+    matched = False
+    for keyword, tags in OVERPASS_KW_MAP.items():
+        if keyword in q:
+            matched = True
+            for tag_key, tag_val in tags:
+                filters.append((("node", "way"), tag_key, tag_val))
+
+    if not matched:
+        for tag_key, tag_val in [('amenity', 'doctors'), ('amenity', 'pharmacy'), ('healthcare', 'laboratory')]:
+            filters.append((("node",), tag_key, tag_val))
+
+    return filters
+
+
+def indexed_tag_pairs():
+    """Every (tag key, tag value) pair any search can select, in first-seen order."""
+    pairs = [("amenity", "hospital"), ("amenity", "clinic")]
+    for tags in OVERPASS_KW_MAP.values():
+        pairs.extend(tags)
+    pairs.extend([('amenity', 'doctors'), ('amenity', 'pharmacy'), ('healthcare', 'laboratory')])
+    return list(dict.fromkeys(pairs))
+
+
+def all_tag_filters():
+    """Filters selecting every indexed pair on nodes and ways: a superset of
+    what any search selects."""
+    return [(("node", "way"), k, v) for k, v in indexed_tag_pairs()]
+
+
+def element_matches(el: dict, filters) -> bool:
+    tags = el.get("tags") or {}
+    el_type = el.get("type", "node")
+    return any(
+        el_type in el_types and tags.get(tag_key) == tag_val
+        for el_types, tag_key, tag_val in filters
+    )
+
+
+# Overpass QL selectors for a set of element types
+_TYPE_SELECTORS = {
+    frozenset({"node"}): "node",
+    frozenset({"way"}): "way",
+    frozenset({"relation"}): "rel",
+    frozenset({"node", "way"}): "nw",
+    frozenset({"node", "relation"}): "nr",
+    frozenset({"way", "relation"}): "wr",
+    frozenset({"node", "way", "relation"}): "nwr",
+}
+
+
+def build_overpass_query(lat, lon, radius_m, query):
+    return build_overpass_query_for_filters(lat, lon, radius_m, overpass_tag_filters(query))
+
+
+def build_overpass_query_for_filters(lat, lon, radius_m, filters):
+    """Compile filters into the smallest equivalent query.
+
+    Duplicate filters are dropped and the values of one tag key that apply
+    to the same element types are merged into a single anchored regex, so
+    the query has one ``around`` clause per (element types, key) group
+    instead of one per element type and tag pair. Nodes are printed with
+    ``out body`` (coordinates and tags) and ways with ``out tags center``,
+    which leaves out their node lists. Elements come back in the same order
+    as from ``legacy_overpass_query_for_filters``: nodes, then ways, by id.
+    """
+    groups: dict[tuple[str, str], list[str]] = {}
+    for el_types, tag_key, tag_val in filters:
+        values = groups.setdefault((_TYPE_SELECTORS[frozenset(el_types)], tag_key), [])
+        if tag_val not in values:
+            values.append(tag_val)
+
+    around = f"(around:{radius_m},{lat},{lon})"
+    clauses = []
+    for (selector, tag_key), values in groups.items():
+        if len(values) == 1:
+            clauses.append(f'{selector}["{tag_key}"="{values[0]}"]{around};')
+        else:
+            clauses.append(f'{selector}["{tag_key}"~"^({"|".join(values)})$"]{around};')
+    return (
+        f'[out:json][timeout:15];({"".join(clauses)})->.hits;'
+        f"node.hits;out body;(way.hits;rel.hits;);out tags center;"
+    )
+
+
+def legacy_overpass_query_for_filters(lat, lon, radius_m, filters):
+    """The original one-clause-per-pair query, kept for parity checks."""
+    clauses = []
+    for el_types, tag_key, tag_val in filters:
+        for el_type in el_types:
+            clauses.append(f'{el_type}["{tag_key}"="{tag_val}"](around:{radius_m},{lat},{lon});')
+    return f'[out:json][timeout:15];({"".join(clauses)});out center body;'
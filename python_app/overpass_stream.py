@@ -0,0 +1,63 @@
+"""
+Incremental parser for Overpass JSON responses.
+
+Yields the objects of the top-level ``elements`` array one at a time as
+bytes arrive, so a response never has to be held in memory as a whole.
+"""
+
+import codecs
+import json
+import re
+
+_ELEMENTS_START = re.compile(r'"elements"\s*:\s*\[')
+_SKIP = re.compile(r"[\s,]*")
+_decoder = json.JSONDecoder()
+
+
+def iter_elements(chunks):
+    """Yield each element of an Overpass ``{"elements": [...]}`` body.
+
+    ``chunks`` is any iterable of bytes, e.g. ``resp.iter_content(65536)``.
+    Raises ValueError if the body ends before the array is closed.
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    in_array = False
+    chunks = iter(chunks)
+    eof = False
+
+    while True:
+        if not in_array:
+            match = _ELEMENTS_START.search(buf)
+            if match:
+                in_array = True
+                buf = buf[match.end():]
+                pos = 0
+                continue
+            # Keep enough of the tail to match a key split across chunks.
+            buf = buf[-32:]
+        else:
+            pos = _SKIP.match(buf, pos).end()
+            if pos < len(buf):
+                if buf[pos] == "]":
+                    return
+                try:
+                    element, pos = _decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise ValueError("Truncated Overpass response") from None
+                else:
+                    yield element
+                    continue
+            buf = buf[pos:]
+            pos = 0
+
+        if eof:
+            raise ValueError("Truncated Overpass response" if in_array else "Overpass response has no elements array")
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buf += utf8.decode(b"", final=True)
+        else:
+            buf += utf8.decode(chunk)
@@ -0,0 +1,40 @@
+"""
+Background prefetching on a small bounded thread pool.
+
+Work is keyed so the same warm-up is never queued twice, and submissions
+are refused rather than queued without limit once ``max_pending`` tasks are
+waiting. Prefetching is best effort: failures are logged and dropped.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    def __init__(self, workers: int = 2, max_pending: int = 32):
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._pending: set = set()
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args) -> bool:
+        """Run ``fn(*args)`` in the background unless ``key`` is already
+        pending or the queue is full; returns whether it was scheduled."""
+        with self._lock:
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.add(key)
+        self._pool.submit(self._run, key, fn, args)
+        return True
+
+    def _run(self, key, fn, args) -> None:
+        try:
+            fn(*args)
+        except Exception:
+            logger.warning("Prefetch %r failed", key, exc_info=True)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
@@ -0,0 +1,151 @@
+"""
+Response encoding: compression, validators and ready-made payloads.
+
+PreparedPayload holds a body serialized and compressed once, for responses
+that never change between requests (the curated fallback analyses, static
+files), so the per-request cost is a dict lookup and a header check.
+finish_response() does the same negotiation for bodies built per request.
+Brotli is used when the ``brotli`` package is installed, gzip otherwise.
+"""
+
+import gzip
+import hashlib
+import json
+from datetime import datetime
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:  # optional faster encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+# Preference order for Accept-Encoding negotiation
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json", "application/javascript", "text/javascript", "text/css",
+    "text/html", "text/plain", "image/svg+xml",
+})
+
+
+def dumps_json(obj) -> bytes:
+    """Encode like Flask's jsonify (sorted keys, compact, trailing newline)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False) + "\n").encode()
+
+
+def negotiate_encoding(offered=ENCODINGS) -> str | None:
+    """The first of ``offered`` the current request accepts, or None."""
+    accepted = request.accept_encodings
+    return next((e for e in offered if accepted[e]), None)
+
+
+def compress(body: bytes, encoding: str, best: bool = False) -> bytes:
+    """Encode ``body``; ``best`` trades time for size, for bodies compressed once."""
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else 5)
+    return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+
+
+def body_etag(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+class PreparedPayload:
+    __slots__ = ("body", "encoded", "etag", "mimetype", "last_modified")
+
+    def __init__(
+        self,
+        body: bytes,
+        mimetype: str = "application/json",
+        min_size: int = 0,
+        last_modified: datetime | None = None,
+    ):
+        self.body = body
+        self.etag = body_etag(body)
+        self.mimetype = mimetype
+        # HTTP dates have whole seconds; truncate so If-Modified-Since compares equal
+        self.last_modified = last_modified.replace(microsecond=0) if last_modified else None
+        self.encoded = {}
+        if len(body) >= min_size and mimetype in COMPRESSIBLE_TYPES:
+            for encoding in ENCODINGS:
+                data = compress(body, encoding, best=True)
+                if len(data) < len(body):
+                    self.encoded[encoding] = data
+
+    @classmethod
+    def from_json(cls, obj) -> "PreparedPayload":
+        return cls(dumps_json(obj))
+
+    def response(self, cache_control: str | None = None) -> Response:
+        """Build a response for the current request, honouring Accept-Encoding,
+        and for GET/HEAD If-None-Match and If-Modified-Since. Each encoding has
+        its own strong ETag."""
+        encoding = negotiate_encoding(self.encoded)
+        etag = self.etag + ETAG_SUFFIXES.get(encoding, "")
+        if request.method not in ("GET", "HEAD"):
+            not_modified = False
+        elif request.if_none_match:
+            not_modified = etag in request.if_none_match
+        else:
+            since = request.if_modified_since
+            not_modified = bool(self.last_modified and since and self.last_modified <= since)
+        if not_modified:
+            resp = Response(status=304)
+        elif encoding:
+            resp = Response(self.encoded[encoding], mimetype=self.mimetype)
+            resp.headers["Content-Encoding"] = encoding
+        else:
+            resp = Response(self.body, mimetype=self.mimetype)
+        resp.set_etag(etag)
+        if self.last_modified:
+            resp.last_modified = self.last_modified
+        if cache_control:
+            resp.headers["Cache-Control"] = cache_control
+        if self.encoded:
+            resp.vary.add("Accept-Encoding")
+        return resp
+
+
+def finish_response(response: Response, min_size: int, conditional: bool = False) -> Response:
+    """Compress a buffered 200 response of at least ``min_size`` bytes if the
+    client accepts it.
+
+    With ``conditional``, the response also gets a strong ETag for its body
+    (one per encoding, if the view did not set one) and a matching
+    If-None-Match, or If-Modified-Since against a Last-Modified the view set,
+    turns it into a 304.
+    """
+    if (
+        response.status_code != 200
+        or response.is_streamed
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    body = response.get_data()
+    encoding = None
+    if response.mimetype in COMPRESSIBLE_TYPES and len(body) >= min_size:
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate_encoding()
+
+    if conditional:
+        if response.get_etag() == (None, None):
+            response.set_etag(body_etag(body) + ETAG_SUFFIXES.get(encoding, ""))
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+    return response
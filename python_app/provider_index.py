@@ -0,0 +1,178 @@
+"""
+On-disk spatial index of healthcare providers for offline Find Care searches.
+
+Elements are stored in Overpass ``out center`` shape (nodes carry lat/lon,
+ways carry a center) in a SQLite database with an R*Tree over their
+coordinates, so radius queries are a bounding-box lookup plus a distance
+check. Build it with ``import_providers.py``.
+
+Areas refreshed from Overpass while serving are recorded in a coverage
+table, keyed like the Overpass cache (tile and tag filters) with the radius
+the fetch covered, so a later search knows whether the index alone can
+answer it; a refresh also drops indexed elements the fetch no longer
+returned. The bounding box of each import is recorded too, and searches
+inside it are answered from the index until the next import.
+"""
+
+import json
+import time
+
+from geo import bounding_box, element_coords, haversine
+from overpass_query import element_matches, indexed_tag_pairs
+from sqlite_local import ThreadLocalConnections
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS providers (
+    id INTEGER PRIMARY KEY,
+    osm_type TEXT NOT NULL,
+    osm_id INTEGER NOT NULL,
+    element TEXT NOT NULL,
+    UNIQUE (osm_type, osm_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS providers_rtree USING rtree(
+    id, min_lat, max_lat, min_lon, max_lon
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    area TEXT NOT NULL,
+    radius_m INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (area, radius_m)
+);
+CREATE TABLE IF NOT EXISTS imports (
+    id INTEGER PRIMARY KEY,
+    min_lat REAL NOT NULL,
+    max_lat REAL NOT NULL,
+    min_lon REAL NOT NULL,
+    max_lon REAL NOT NULL,
+    imported_at REAL NOT NULL
+);
+"""
+
+_INDEXED_PAIRS = indexed_tag_pairs()
+
+
+def is_healthcare_element(el: dict) -> bool:
+    """True for named elements carrying a tag some search can select."""
+    tags = el.get("tags") or {}
+    if not tags.get("name"):
+        return False
+    return any(tags.get(k) == v for k, v in _INDEXED_PAIRS)
+
+
+class ProviderIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._db = ThreadLocalConnections(path, SCHEMA)
+
+    def upsert(self, elements) -> int:
+        """Insert or replace healthcare elements; returns how many were stored."""
+        conn = self._db.get()
+        with conn:
+            return len(self._upsert(conn, elements))
+
+    def store_area(self, area: str, radius_m: int, elements, fetched, filters) -> int:
+        """Replace the index's view of a fresh fetch and record that it covers
+        ``radius_m`` around ``area``.
+
+        ``fetched`` is the (lat, lon, radius_m) circle the fetch asked for
+        and ``filters`` its tag filters; indexed elements inside that circle
+        which match the filters but were not returned are deleted.
+        """
+        conn = self._db.get()
+        with conn:
+            stored = self._upsert(conn, elements)
+            self._delete_missing(conn, *fetched, filters, stored)
+            conn.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?)", (area, radius_m, time.time())
+            )
+        return len(stored)
+
+    def record_import(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> None:
+        """Record that an import holds every indexed element in this box."""
+        conn = self._db.get()
+        with conn:
+            conn.execute(
+                "INSERT INTO imports (min_lat, max_lat, min_lon, max_lon, imported_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (min_lat, max_lat, min_lon, max_lon, time.time()),
+            )
+
+    def imported(self, lat: float, lon: float, radius_m: int) -> bool:
+        """Whether one imported box contains the whole ``radius_m`` circle around (lat, lon)."""
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_m / 1000)
+        row = self._db.get().execute(
+            "SELECT 1 FROM imports WHERE min_lat <= ? AND max_lat >= ? AND min_lon <= ? AND max_lon >= ? "
+            "LIMIT 1",
+            (min_lat, max_lat, min_lon, max_lon),
+        ).fetchone()
+        return row is not None
+
+    def covers(self, area: str, radius_m: int, max_age: float) -> bool:
+        """Whether ``area`` was fetched with at least ``radius_m`` in the last ``max_age`` seconds."""
+        row = self._db.get().execute(
+            "SELECT 1 FROM coverage WHERE area = ? AND radius_m >= ? AND fetched_at > ? LIMIT 1",
+            (area, radius_m, time.time() - max_age),
+        ).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _upsert(conn, elements) -> set[tuple[str, int]]:
+        stored = set()
+        for el in elements:
+            if el.get("type") not in ("node", "way") or not is_healthcare_element(el):
+                continue
+            lat, lon = element_coords(el)
+            if not lat and not lon:
+                continue
+            conn.execute(
+                "INSERT INTO providers (osm_type, osm_id, element) VALUES (?, ?, ?) "
+                "ON CONFLICT (osm_type, osm_id) DO UPDATE SET element = excluded.element",
+                (el["type"], el["id"], json.dumps(el, separators=(",", ":"))),
+            )
+            row = conn.execute(
+                "SELECT id FROM providers WHERE osm_type = ? AND osm_id = ?",
+                (el["type"], el["id"]),
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO providers_rtree VALUES (?, ?, ?, ?, ?)",
+                (row[0], lat, lat, lon, lon),
+            )
+            stored.add((el["type"], el["id"]))
+        return stored
+
+    @staticmethod
+    def _delete_missing(conn, lat: float, lon: float, radius_m: int, filters, kept) -> None:
+        radius_km = radius_m / 1000
+        rows = conn.execute(
+            "SELECT p.id, p.element FROM providers_rtree r JOIN providers p ON p.id = r.id "
+            "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?",
+            bounding_box(lat, lon, radius_km),
+        ).fetchall()
+        for row_id, raw in rows:
+            el = json.loads(raw)
+            if (el["type"], el["id"]) in kept or not element_matches(el, filters):
+                continue
+            if haversine(lat, lon, *element_coords(el)) <= radius_km:
+                conn.execute("DELETE FROM providers WHERE id = ?", (row_id,))
+                conn.execute("DELETE FROM providers_rtree WHERE id = ?", (row_id,))
+
+    def count(self) -> int:
+        return self._db.get().execute("SELECT COUNT(*) FROM providers").fetchone()[0]
+
+    def query(self, lat: float, lon: float, radius_m: int, filters=None) -> list[dict]:
+        """Return indexed elements within ``radius_m`` of (lat, lon) matching ``filters``."""
+        radius_km = radius_m / 1000
+        rows = self._db.get().execute(
+            "SELECT p.element FROM providers_rtree r JOIN providers p ON p.id = r.id "
+            "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?",
+            bounding_box(lat, lon, radius_km),
+        )
+        elements = []
+        for (raw,) in rows:
+            el = json.loads(raw)
+            if filters is not None and not element_matches(el, filters):
+                continue
+            el_lat, el_lon = element_coords(el)
+            if haversine(lat, lon, el_lat, el_lon) <= radius_km:
+                elements.append(el)
+        return elements
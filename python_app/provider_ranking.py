@@ -0,0 +1,159 @@
+"""
+Scoring and top-k selection of Find Care results.
+
+Distances for a whole Overpass response are computed in one NumPy pass,
+unnamed and out-of-radius elements are dropped with masks, the remaining
+candidates are scored by ``relevance.relevance_scores``, and only the
+``limit`` best rows by (relevance, distance) are turned into provider dicts.
+"""
+
+import heapq
+
+import numpy as np
+
+from relevance import categorize_provider, relevance_scores
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_many(lat, lon, lats, lons):
+    """Vectorized haversine distance in km from one point to arrays of points."""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    d_lat = lat2 - lat1
+    d_lon = np.radians(lons - lon)
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_lon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def element_arrays(elements):
+    """Return (lats, lons, named) arrays for a list of Overpass elements."""
+    n = len(elements)
+    lats = np.zeros(n)
+    lons = np.zeros(n)
+    named = np.zeros(n, dtype=bool)
+    for i, el in enumerate(elements):
+        tags = el.get("tags") or {}
+        named[i] = bool(tags.get("name"))
+        center = el.get("center") or {}
+        lats[i] = el.get("lat") or center.get("lat", 0)
+        lons[i] = el.get("lon") or center.get("lon", 0)
+    return lats, lons, named
+
+
+def build_provider(el, el_lat, el_lon, distance, relevance):
+    tags = el.get("tags", {})
+    addr_parts = [tags.get(k) for k in ("addr:street", "addr:housenumber", "addr:city", "addr:postcode") if tags.get(k)]
+    return {
+        "id": el.get("id"),
+        "name": tags.get("name", "Unknown"),
+        "type": categorize_provider(tags),
+        "specialty": tags.get("healthcare:speciality") or tags.get("speciality"),
+        "address": ", ".join(addr_parts) if addr_parts else None,
+        "phone": tags.get("phone") or tags.get("contact:phone"),
+        "website": tags.get("website") or tags.get("contact:website"),
+        "openingHours": tags.get("opening_hours"),
+        "distance": distance,
+        "lat": el_lat,
+        "lon": el_lon,
+        "relevance": relevance,
+        "operator": tags.get("operator"),
+        "emergency": tags.get("emergency") == "yes",
+    }
+
+
+def rank_providers(elements, lat, lon, radius_m, query, limit):
+    """Return (top ``limit`` providers, number of named elements in radius)."""
+    if not elements:
+        return [], 0
+
+    lats, lons, named = element_arrays(elements)
+    raw_dist = haversine_many(lat, lon, lats, lons)
+    rows = np.flatnonzero(named & (raw_dist <= radius_m / 1000))
+    total = len(rows)
+    limit = max(0, min(limit, total))
+    if not limit:
+        return [], total
+
+    relevance = relevance_scores([elements[i]["tags"] for i in rows], query)
+    row_dist = np.round(raw_dist[rows], 1)
+
+    # Partial selection of the best `limit` rows, then an exact ordering of
+    # just those. Relevance is an integer and distances are rounded to 0.1 km,
+    # so one composite key orders by (-relevance, distance, response order).
+    candidates = np.arange(total)
+    if limit < total:
+        key = -relevance * 1e6 + row_dist + candidates * (0.05 / total)
+        candidates = np.argpartition(key, limit - 1)[:limit]
+    order = candidates[np.lexsort((rows[candidates], row_dist[candidates], -relevance[candidates]))]
+
+    return [
+        build_provider(
+            elements[rows[j]], float(lats[rows[j]]), float(lons[rows[j]]),
+            float(row_dist[j]), int(relevance[j]),
+        )
+        for j in order
+    ], total
+
+
+class StreamingRanker:
+    """Bounded top-k ranking over elements that arrive one at a time.
+
+    Unnamed elements are dropped on arrival, the rest are scored in small
+    vectorized batches, and only the best ``limit`` rows are kept in a heap,
+    so memory depends on ``limit`` and ``batch_size`` rather than on how many
+    elements a response contains. Relevance and ordering are the same as
+    ``rank_providers`` gives for the whole response.
+    """
+
+    def __init__(self, lat, lon, radius_m, query, limit, batch_size=512):
+        self.lat = lat
+        self.lon = lon
+        self.radius_km = radius_m / 1000
+        self.query = query
+        self.limit = max(0, limit)
+        self.batch_size = batch_size
+        self.total = 0
+        self._seen = 0
+        self._batch = []
+        self._heap = []
+
+    def add(self, el):
+        seq = self._seen
+        self._seen += 1
+        if not (el.get("tags") or {}).get("name"):
+            return
+        self._batch.append((seq, el))
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        lats, lons, _ = element_arrays([el for _, el in batch])
+        raw_dist = haversine_many(self.lat, self.lon, lats, lons)
+        dist = np.round(raw_dist, 1)
+        in_radius = np.flatnonzero(raw_dist <= self.radius_km)
+        self.total += len(in_radius)
+        if not self.limit or not len(in_radius):
+            return
+        relevance = relevance_scores([batch[i][1]["tags"] for i in in_radius], self.query)
+        for i, rel in zip(in_radius, relevance.tolist()):
+            seq, el = batch[i]
+            # The heap root is the worst kept row: lowest relevance, then
+            # farthest, then latest in the response.
+            item = (rel, -dist[i], -seq, el, lats[i], lons[i])
+            if len(self._heap) < self.limit:
+                heapq.heappush(self._heap, item)
+            elif item[:3] > self._heap[0][:3]:
+                heapq.heapreplace(self._heap, item)
+
+    def result(self):
+        """Return (top providers, number of named elements in radius)."""
+        self._flush()
+        best = sorted(self._heap, key=lambda item: item[:3], reverse=True)
+        return [
+            build_provider(el, float(el_lat), float(el_lon), float(-neg_dist), int(rel))
+            for rel, neg_dist, _, el, el_lat, el_lon in best
+        ], self.total
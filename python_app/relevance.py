@@ -0,0 +1,164 @@
+"""
+Query compilation and relevance scoring for Find Care results.
+
+A search string is compiled once into stemmed, stopword-free terms plus the
+provider categories it asks for ("dentist", "teeth" -> Dentist). Provider
+text (name, specialty, operator) is scored with BM25's term saturation and
+field-length normalization, but without IDF: corpus statistics would make a
+provider's score depend on which other providers came back, so the buffered
+and streaming rankers (and cached and fresh results) would disagree. Fixed
+bonuses are added for a category match and for contact details and opening
+hours, and scores are rounded to integers so ties fall through to distance.
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+QUERY_STOPWORDS = frozenset("""
+a an and any around at best by close closest find for from good in me my near
+nearby nearest of on open or please show some the to top with
+""".split())
+
+CATEGORY_TAGS = {
+    "hospital": "Hospital", "clinic": "Clinic", "doctors": "Doctor",
+    "pharmacy": "Pharmacy", "dentist": "Dentist", "laboratory": "Laboratory",
+}
+
+# Query stems that express a category intent
+CATEGORY_INTENTS = {
+    "hospital": "Hospital", "emergency": "Hospital",
+    "clinic": "Clinic", "polyclinic": "Clinic",
+    "doctor": "Doctor", "physician": "Doctor", "gp": "Doctor",
+    "pharmacy": "Pharmacy", "chemist": "Pharmacy", "medicine": "Pharmacy", "drugstore": "Pharmacy",
+    "dentist": "Dentist", "dental": "Dentist", "teeth": "Dentist", "tooth": "Dentist",
+    "lab": "Laboratory", "laboratory": "Laboratory", "test": "Laboratory",
+    "diagnostic": "Laboratory", "pathology": "Laboratory", "blood": "Laboratory",
+    "eye": "Eye Care", "optometrist": "Eye Care", "optician": "Eye Care", "vision": "Eye Care",
+    "mental": "Mental Health", "psychiatrist": "Mental Health", "psychologist": "Mental Health",
+    "therapy": "Mental Health", "therapist": "Mental Health", "counselling": "Mental Health",
+}
+
+FIELDS = ("name", "specialty", "operator")
+FIELD_WEIGHTS = np.array([1.0, 0.8, 0.3])
+# Field lengths (in tokens) that get no length penalty or boost
+TYPICAL_FIELD_LENGTHS = np.array([3.0, 1.0, 3.0])
+K1 = 1.2
+B = 0.75
+# One strong name match is worth about what the old substring check gave (50)
+BM25_SCALE = 20
+INTENT_BONUS = 30
+CONTACT_BONUS = 10
+HOURS_BONUS = 5
+# Query terms at least this long also match longer words they prefix
+# ("cardio" -> "cardiology", "psychiatr" -> "psychiatrist")
+PREFIX_MIN = 4
+
+
+def tokenize(text: str) -> list[str]:
+    # Drops a plural "s" on words longer than three letters, except "ss"
+    # ("clinics" -> "clinic", but "glass" and "gps" stay as they are).
+    return [
+        t[:-1] if len(t) > 3 and t[-1] == "s" and t[-2] != "s" else t
+        for t in _TOKEN.findall(text.lower())
+    ]
+
+
+@lru_cache(maxsize=16384)
+def _term_counts(text: str, terms: tuple[str, ...]) -> tuple[int, tuple[int, ...]]:
+    """(token count of ``text``, occurrences of each term in it).
+
+    Cached because specialty and operator values repeat across providers,
+    and the same names come back while an Overpass result stays cached.
+    """
+    tokens = tokenize(text)
+    return len(tokens), tuple(
+        sum(1 for token in tokens if token.startswith(term)) if len(term) >= PREFIX_MIN
+        else tokens.count(term)
+        for term in terms
+    )
+
+
+def categorize_provider(tags):
+    amenity = tags.get("amenity", "")
+    healthcare = tags.get("healthcare", "")
+    for key, label in CATEGORY_TAGS.items():
+        if amenity == key or healthcare == key:
+            return label
+    if healthcare == "optometrist":
+        return "Eye Care"
+    if healthcare in ("psychotherapist", "counselling"):
+        return "Mental Health"
+    return "Healthcare"
+
+
+def specialty_text(tags) -> str:
+    return tags.get("healthcare:speciality") or tags.get("speciality") or ""
+
+
+class CompiledQuery:
+    __slots__ = ("terms", "intents")
+
+    def __init__(self, query: str):
+        terms = []
+        intents = set()
+        for token in tokenize(query):
+            if token in QUERY_STOPWORDS:
+                continue
+            if token in CATEGORY_INTENTS:
+                intents.add(CATEGORY_INTENTS[token])
+            if token not in terms:
+                terms.append(token)
+        self.terms = tuple(terms)
+        self.intents = frozenset(intents)
+
+
+@lru_cache(maxsize=1024)
+def compile_query(query: str) -> CompiledQuery:
+    return CompiledQuery(query)
+
+
+def relevance_scores(tags_list: list[dict], query: str) -> np.ndarray:
+    """Integer relevance of each provider (by its tags) for ``query``.
+
+    Each score depends only on the provider and the query, never on the
+    other candidates, so it is the same whether the provider was ranked from
+    a cached list, a fresh one, or a stream, and at any radius.
+    """
+    compiled = compile_query(query)
+    n = len(tags_list)
+    relevance = np.fromiter((_static_bonus(tags, compiled) for tags in tags_list), dtype=np.int64, count=n)
+    if not compiled.terms or not n:
+        return relevance
+
+    terms = compiled.terms
+    lengths = []
+    counts = []
+    for tags in tags_list:
+        for text in (tags.get("name"), specialty_text(tags), tags.get("operator")):
+            length, field_counts = _term_counts(text, terms) if text else (0, (0,) * len(terms))
+            lengths.append(length)
+            counts.append(field_counts)
+    lengths = np.array(lengths, dtype=float).reshape(n, len(FIELDS))
+    tf = np.array(counts, dtype=float).reshape(n, len(FIELDS), len(terms))
+
+    # BM25 term-frequency saturation and field-length normalization, with
+    # lengths measured against a typical field instead of the candidate set
+    norm = K1 * (1 - B + B * lengths / TYPICAL_FIELD_LENGTHS)
+    saturated = tf * (K1 + 1) / (tf + norm[:, :, None])
+    text = (saturated * FIELD_WEIGHTS[:, None]).sum(axis=(1, 2))
+    return relevance + np.rint(text * BM25_SCALE).astype(np.int64)
+
+
+def _static_bonus(tags, compiled: CompiledQuery) -> int:
+    bonus = 0
+    if tags.get("website") or tags.get("phone") or tags.get("contact:phone"):
+        bonus += CONTACT_BONUS
+    if tags.get("opening_hours"):
+        bonus += HOURS_BONUS
+    if compiled.intents and categorize_provider(tags) in compiled.intents:
+        bonus += INTENT_BONUS
+    return bonus
@@ -0,0 +1,65 @@
+"""
+Short-lived server-side storage of ranked Find Care results, read in pages.
+
+A search ranks its providers once and stores the list under a random result
+id. The client receives the first page with an opaque cursor, and "show
+more" fetches the next slice from here instead of re-running the search or
+shipping every provider up front. With a SharedStore, result sets are also
+visible to the other worker processes.
+"""
+
+import base64
+import binascii
+import secrets
+
+from shared_store import SharedStore
+from tiered_cache import TieredCache
+
+
+class CursorError(ValueError):
+    """The cursor is malformed, or its result set has expired."""
+
+
+class ResultPages:
+    namespace = "results"
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600, shared: SharedStore | None = None):
+        self._results = TieredCache(self.namespace, maxsize=maxsize, ttl=ttl, shared=shared)
+
+    def store(self, items: list) -> str:
+        """Keep ``items`` for ``ttl`` seconds; returns the new result id."""
+        result_id = secrets.token_urlsafe(12)
+        self._results.set(result_id, items)
+        return result_id
+
+    def first_page(self, items: list, size: int) -> tuple[list, str | None]:
+        """Store ``items`` and return (first ``size`` items, cursor or None)."""
+        if len(items) <= size:
+            return items, None
+        return items[:size], encode_cursor(self.store(items), size)
+
+    def page(self, cursor: str, size: int) -> tuple[list, str | None, int]:
+        """Return (items after ``cursor``, next cursor or None, result set size)."""
+        result_id, offset = decode_cursor(cursor)
+        items = self._results.get(result_id)
+        if items is None:
+            raise CursorError("Results expired, please search again.")
+        end = offset + size
+        next_cursor = encode_cursor(result_id, end) if end < len(items) else None
+        return items[offset:end], next_cursor, len(items)
+
+
+def encode_cursor(result_id: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{result_id}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        result_id, offset = raw.rsplit(":", 1)
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorError("Invalid cursor.") from None
+    if offset < 0 or not result_id:
+        raise CursorError("Invalid cursor.")
+    return result_id, offset
@@ -1,6 +1,8 @@
 #!/bin/bash
 # HealthAgg - Python Flask Application Runner
-# Usage: ./run.sh
+# Usage: ./run.sh          development server (Flask, auto-reload)
+#        ./run.sh prod     production server (gunicorn, see gunicorn.conf.py)
+#        ./run.sh async    production server (uvicorn, async analyze/find-care, see asgi.py)
 
 echo "========================================="
 echo "  HealthAgg - AI Healthcare Aggregator"
@@ -37,4 +39,15 @@ echo "Starting server at http://localhost:5000"
 echo "Press Ctrl+C to stop."
 echo ""
 
+if [ "$1" = "prod" ]; then
+    exec gunicorn -c gunicorn.conf.py wsgi:app
+fi
+
+if [ "$1" = "async" ]; then
+    # Workers share caches through SQLite, as under gunicorn
+    export SHARED_CACHE_DB="${SHARED_CACHE_DB-cache.sqlite}"
+    exec uvicorn asgi:application --host 0.0.0.0 --port 5000 \
+        --workers "${WEB_CONCURRENCY:-$(nproc)}" --backlog 4096
+fi
+
 python3 app.py
@@ -0,0 +1,94 @@
+"""
+SQLite key/value store with expiry, shared by every worker process.
+
+In-process caches sit in front of this store: a fill in one gunicorn worker
+is written here and picked up by the others on their next miss. WAL mode
+lets all workers read while one writes.
+"""
+
+import json
+import time
+
+from sqlite_local import ThreadLocalConnections
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entries_expiry ON cache_entries (expires_at);
+"""
+
+
+class SharedStore:
+    def __init__(self, path: str, purge_every: int = 500):
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._db = ThreadLocalConnections(path, SCHEMA, wal=True)
+
+    def get(self, namespace: str, key: str):
+        entry = self.get_entry(namespace, key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, namespace: str, key: str) -> tuple | None:
+        """(value, expires_at as a time.time() timestamp), or None."""
+        row = self._db.get().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def values(self, namespace: str) -> list:
+        """Every live value in ``namespace``."""
+        rows = self._db.get().execute(
+            "SELECT value FROM cache_entries WHERE namespace = ? AND expires_at > ?",
+            (namespace, time.time()),
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def set(self, namespace: str, key: str, value, ttl: float) -> None:
+        conn = self._db.get()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, separators=(",", ":")), time.time() + ttl),
+            )
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def delete(self, namespace: str, key: str) -> None:
+        conn = self._db.get()
+        with conn:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        self._db.close()
+
+    def claim(self, namespace: str, key: str, ttl: float) -> bool:
+        """Hold ``key`` for ``ttl`` seconds unless it is already held; True if this call got it.
+
+        A single statement, so two workers racing for the key cannot both win.
+        """
+        now = time.time()
+        conn = self._db.get()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, 'null', ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET expires_at = excluded.expires_at "
+                "WHERE cache_entries.expires_at <= ?",
+                (namespace, key, now + ttl, now),
+            )
+        return cursor.rowcount == 1
+
+    def purge(self) -> None:
+        """Delete expired entries."""
+        conn = self._db.get()
+        with conn:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
@@ -0,0 +1,105 @@
+"""
+Coalescing of identical concurrent calls ("single flight").
+
+The first caller for a key runs the function; callers arriving with the same
+key while it is in flight wait for that call and receive its result, or its
+exception, instead of issuing a duplicate upstream request. Nothing is kept
+once the call finishes, so this complements the caches rather than being
+one.
+
+AsyncSingleFlight does the same for coroutines on one event loop (the ASGI
+serving path).
+"""
+
+import asyncio
+import threading
+
+from metrics import COALESCED_CALLS
+
+
+class FlightTimeout(TimeoutError):
+    """A waiting caller gave up before the in-flight call finished."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name: str, wait_timeout: float | None = None):
+        self.name = name
+        self.wait_timeout = wait_timeout
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return ``fn()``, sharing one execution among concurrent callers of ``key``.
+
+        Waiting callers raise FlightTimeout after ``wait_timeout`` seconds;
+        the leader is bounded only by ``fn`` itself.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED_CALLS.inc(flight=self.name)
+            if not call.done.wait(self.wait_timeout):
+                raise FlightTimeout(f"{self.name} call still in flight after {self.wait_timeout}s")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    def __init__(self, name: str, wait_timeout: float | None = None):
+        self.name = name
+        self.wait_timeout = wait_timeout
+        self._tasks: dict = {}
+
+    async def do(self, key, fn):
+        """Await ``fn()``, sharing one task among concurrent callers of ``key``.
+
+        The call runs as its own task, so it finishes (and fills any cache)
+        even if the caller that started it is cancelled. Waiting callers
+        raise FlightTimeout after ``wait_timeout`` seconds.
+        """
+        task = self._tasks.get(key)
+        timeout = None
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            COALESCED_CALLS.inc(flight=self.name)
+            timeout = self.wait_timeout
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            if task.done():
+                raise
+            raise FlightTimeout(f"{self.name} call still in flight after {self.wait_timeout}s") from None
+
+    def _finished(self, key, task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the outcome retrieved even if every caller went away
+            task.exception()
@@ -0,0 +1,44 @@
+"""
+Per-thread SQLite connections to one database file.
+
+sqlite3 connections must not be shared between threads, and opening one per
+query is wasteful, so each thread keeps its own. The schema (and WAL mode,
+which is persistent) is set up on a throwaway connection at construction,
+so nothing is left open before gunicorn forks workers from a preloaded app.
+"""
+
+import sqlite3
+import threading
+
+
+class ThreadLocalConnections:
+    def __init__(self, path: str, schema: str = "", wal: bool = False, timeout: float = 10, **connect_kwargs):
+        self.path = path
+        self.wal = wal
+        self.timeout = timeout
+        self._connect_kwargs = connect_kwargs
+        self._local = threading.local()
+        conn = sqlite3.connect(path, timeout=timeout)
+        if wal:
+            conn.execute("PRAGMA journal_mode=WAL")
+        if schema:
+            conn.executescript(schema)
+        conn.close()
+
+    def get(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, **self._connect_kwargs)
+            if self.wal:
+                # Safe with WAL: a crash can lose the last commits, never corrupt
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close this thread's connection, if it opened one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
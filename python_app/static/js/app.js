@@ -9,7 +9,8 @@
 let userCoords = null;
 let currentRadius = 10000;
 let allProviders = [];
-let displayLimit = 3;
+let availableProviders = 0;
+let nextCursor = null;
 let storedApiKey = sessionStorage.getItem("healthagg_api_key") || "";
 
 // ──────────────────────────────────────────────
@@ -23,16 +24,20 @@ let storedApiKey = sessionStorage.getItem("healthagg_api_key") || "";
   navigator.geolocation.getCurrentPosition(
     async (pos) => {
       userCoords = { lat: pos.coords.latitude, lon: pos.coords.longitude };
+      warmCareProviders();
+      let name = null;
       try {
-        const res = await fetch(
-          `https://nominatim.openstreetmap.org/reverse?format=json&lat=${userCoords.lat}&lon=${userCoords.lon}`
-        );
-        const data = await res.json();
-        const city = data.address.city || data.address.town || data.address.village || "Location Available";
-        document.getElementById("location-text").textContent = city;
+        const res = await fetch(`/api/reverse-geocode?lat=${userCoords.lat}&lon=${userCoords.lon}`);
+        if (res.ok) {
+          name = (await res.json()).name;
+        } else if (res.status === 503) {
+          // The server's Nominatim quota is spent; ask from the browser instead
+          name = await nominatimPlaceName(userCoords);
+        }
       } catch {
-        document.getElementById("location-text").textContent = "Location Available";
+        name = null;
       }
+      document.getElementById("location-text").textContent = name || "Location Available";
     },
     () => {
       document.getElementById("location-text").textContent = "Location Access Denied";
@@ -40,6 +45,23 @@ let storedApiKey = sessionStorage.getItem("healthagg_api_key") || "";
   );
 })();
 
+async function nominatimPlaceName({ lat, lon }) {
+  const res = await fetch(
+    `https://nominatim.openstreetmap.org/reverse?format=json&zoom=10&lat=${lat.toFixed(2)}&lon=${lon.toFixed(2)}`
+  );
+  const address = (await res.json()).address || {};
+  return address.city || address.town || address.village || null;
+}
+
+// Ask the server to prefetch nearby providers while the user is still typing
+function warmCareProviders() {
+  fetch("/api/find-care/warm", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ lat: userCoords.lat, lon: userCoords.lon, radius: currentRadius }),
+  }).catch(() => {});
+}
+
 // Init API key UI
 (function initApiKey() {
   updateApiKeyUI();
@@ -58,7 +80,6 @@ function handleFindCare() {
     alert("Please allow location access to find care providers near you.");
     return;
   }
-  displayLimit = 3;
   document.getElementById("care-results").classList.remove("hidden");
   fetchCareProviders();
 }
@@ -85,6 +106,7 @@ async function fetchCareProviders() {
       radius: currentRadius,
       q: query,
       limit: 50,
+      page_size: 3,
     });
     const res = await fetch(`/api/find-care?${params}`);
     const data = await res.json();
@@ -92,6 +114,8 @@ async function fetchCareProviders() {
     if (!res.ok) throw new Error(data.error || "Search failed");
 
     allProviders = data.providers || [];
+    availableProviders = data.available ?? allProviders.length;
+    nextCursor = data.nextCursor || null;
     const total = data.total || 0;
     const locationName = document.getElementById("location-text").textContent;
 
@@ -124,32 +148,47 @@ function renderProviders() {
   }
 
   empty.classList.add("hidden");
-  const visible = allProviders.slice(0, displayLimit);
 
   document.getElementById("results-badge").textContent =
-    `Top ${Math.min(displayLimit, allProviders.length)} of ${allProviders.length} results`;
+    `Top ${allProviders.length} of ${availableProviders} results`;
 
-  visible.forEach((p, i) => {
+  allProviders.forEach((p, i) => {
     cards.insertAdjacentHTML("beforeend", providerCardHTML(p, i));
   });
 
-  if (allProviders.length > displayLimit) {
+  if (nextCursor) {
     showMoreWrap.classList.remove("hidden");
     document.getElementById("show-more-text").textContent =
-      `Show More Providers (${allProviders.length - displayLimit} remaining)`;
+      `Show More Providers (${availableProviders - allProviders.length} remaining)`;
   } else {
     showMoreWrap.classList.add("hidden");
   }
 }
 
-function showMoreProviders() {
-  displayLimit += 5;
-  renderProviders();
+async function showMoreProviders() {
+  if (!nextCursor) return;
+  try {
+    const params = new URLSearchParams({ cursor: nextCursor, size: 5 });
+    const res = await fetch(`/api/find-care/page?${params}`);
+    const data = await res.json();
+    if (res.status === 410) {
+      // The server dropped this result set; search again from the top.
+      fetchCareProviders();
+      return;
+    }
+    if (!res.ok) throw new Error(data.error || "Unable to load more providers");
+
+    allProviders = allProviders.concat(data.providers || []);
+    availableProviders = data.available ?? availableProviders;
+    nextCursor = data.nextCursor || null;
+    renderProviders();
+  } catch (err) {
+    document.getElementById("show-more-text").textContent = err.message || "Unable to load more providers";
+  }
 }
 
 function changeRadius(radius) {
   currentRadius = radius;
-  displayLimit = 3;
   document.querySelectorAll(".radius-btn").forEach((btn) => {
     if (parseInt(btn.dataset.radius) === radius) {
       btn.className = "radius-btn px-4 py-1.5 text-xs font-semibold rounded-full border transition bg-primary text-white border-primary";
@@ -225,26 +264,43 @@ function providerCardHTML(p, index) {
 // ──────────────────────────────────────────────
 // Symptom Checker
 // ──────────────────────────────────────────────
+let analysisSeq = 0;
+
 async function analyzeSymptoms(e) {
   e.preventDefault();
   const input = document.getElementById("symptoms-input").value.trim();
   if (!input) return;
+  const seq = ++analysisSeq;
 
   const btn = document.getElementById("analyze-btn");
   btn.disabled = true;
   btn.innerHTML = '<div class="spinner" style="width:18px;height:18px;border-width:2px;"></div> Analyzing...';
 
   try {
-    const res = await fetch("/api/analyze", {
+    const res = await fetch("/api/analyze/stream", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ symptoms: input, apiKey: storedApiKey || "" }),
     });
-    const data = await res.json();
 
-    if (!res.ok) throw new Error(data.error || "Analysis failed");
+    if (!res.ok) {
+      const data = await res.json();
+      throw new Error(data.error || "Analysis failed");
+    }
 
-    showResults(data);
+    // Render each field as soon as the server has it, then the final result
+    const partial = {};
+    let resultToken = null;
+    await readEventStream(res, (event, data) => {
+      if (event === "field") {
+        partial[data.key] = data.value;
+        showResults(partial);
+      } else if (event === "done") {
+        resultToken = data.provisional ? data.resultToken : null;
+        showResults(data.result, Boolean(resultToken));
+      }
+    });
+    if (resultToken) upgradeAnalysis(resultToken, seq, partial);
   } catch (err) {
     alert(err.message || "Unable to analyze symptoms. Please try again.");
   } finally {
@@ -253,7 +309,50 @@ async function analyzeSymptoms(e) {
   }
 }
 
-function showResults(r) {
+// The AI analysis missed the server's deadline, so general guidance is shown
+// while it finishes; long-poll for it and swap it in unless the user has
+// started another analysis meanwhile.
+async function upgradeAnalysis(token, seq, provisional) {
+  let state = { status: "pending" };
+  while (state.status === "pending" && seq === analysisSeq) {
+    try {
+      const res = await fetch(`/api/analyze/result?token=${encodeURIComponent(token)}&wait=20`);
+      if (!res.ok) break;
+      state = await res.json();
+    } catch {
+      break;
+    }
+  }
+  if (seq !== analysisSeq) return;
+  showResults(state.status === "ready" ? state.result : provisional);
+}
+
+async function readEventStream(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message";
+      let data = "";
+      block.split("\n").forEach((line) => {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      });
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
+function showResults(r, provisional = false) {
   document.getElementById("checker-input").classList.add("hidden");
   document.getElementById("checker-results").classList.remove("hidden");
 
@@ -274,6 +373,13 @@ function showResults(r) {
   </div>
   <div class="p-6 space-y-6">`;
 
+  if (provisional) {
+    html += `<div class="p-3 bg-muted/30 border border-border rounded-xl flex items-center gap-3 text-xs text-muted-foreground">
+      <div class="spinner" style="width:14px;height:14px;border-width:2px;"></div>
+      Showing general guidance while the detailed AI analysis finishes. This report will update automatically.
+    </div>`;
+  }
+
   // Emergency warning
   if (r.severityAssessment?.emergencyRisk) {
     html += `<div class="p-4 bg-red-50 border-2 border-red-300 rounded-xl">
@@ -416,6 +522,7 @@ function toggleMed(i) {
 }
 
 function resetChecker() {
+  analysisSeq++; // drop any pending upgrade of the previous analysis
   document.getElementById("checker-input").classList.remove("hidden");
   document.getElementById("checker-results").classList.add("hidden");
 }
@@ -0,0 +1,64 @@
+"""
+Static files served from memory, precompressed, under content-hashed URLs.
+
+At startup every file under the static folder is read and compressed once
+(see PreparedPayload), and gets a URL carrying a hash of its content, e.g.
+``/static/js/app.3f2a9c1b7d4e.js``. A hashed URL changes whenever the file
+does, so it is served as immutable; the plain URL keeps working but has to
+be revalidated. Templates link with ``static_url("js/app.js")``. Files
+added after startup are left to a fallback view (Flask's own).
+"""
+
+import mimetypes
+import os
+import posixpath
+from datetime import datetime, timezone
+
+from flask import abort
+
+from prepared_response import PreparedPayload
+
+HASH_LENGTH = 12
+
+
+class StaticAssets:
+    def __init__(self, folder: str, url_path: str = "/static", min_size: int = 1024,
+                 max_age: int = 31536000, fallback=None):
+        self.url_path = url_path
+        self.max_age = max_age
+        self.fallback = fallback
+        self.assets: dict[str, PreparedPayload] = {}
+        self.urls: dict[str, str] = {}
+        self._by_hashed: dict[str, str] = {}
+        for root, _, files in os.walk(folder):
+            for name in files:
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, folder).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    body = f.read()
+                mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                modified = datetime.fromtimestamp(os.stat(path).st_mtime, tz=timezone.utc)
+                payload = PreparedPayload(body, mimetype, min_size=min_size, last_modified=modified)
+                stem, ext = posixpath.splitext(filename)
+                hashed = f"{stem}.{payload.etag[:HASH_LENGTH]}{ext}"
+                self.assets[filename] = payload
+                self.urls[filename] = f"{url_path}/{hashed}"
+                self._by_hashed[hashed] = filename
+
+    def url(self, filename: str) -> str:
+        """Content-hashed URL of a static file (the plain URL if it is unknown)."""
+        return self.urls.get(filename, f"{self.url_path}/{filename}")
+
+    def serve(self, filename: str):
+        """View for ``/static/<path:filename>``."""
+        if filename in self._by_hashed:
+            payload = self.assets[self._by_hashed[filename]]
+            cache_control = f"public, max-age={self.max_age}, immutable"
+        elif filename in self.assets:
+            payload = self.assets[filename]
+            cache_control = "public, no-cache"
+        elif self.fallback is not None:
+            return self.fallback(filename)
+        else:
+            abort(404)
+        return payload.response(cache_control=cache_control)
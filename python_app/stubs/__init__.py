@@ -0,0 +1,12 @@
+"""
+Local stand-in servers for upstream APIs, used for offline measurement.
+"""
+
+from http.server import ThreadingHTTPServer
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops connections (and adds SYN
+    # retransmit delays) as soon as a benchmark opens many at once.
+    request_queue_size = 1024
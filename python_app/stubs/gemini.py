@@ -0,0 +1,227 @@
+"""
+Stand-in for the Gemini REST API.
+
+Implements the parts the app uses: ``models/*:generateContent``,
+``models/*:streamGenerateContent?alt=sse``, and creating/extending
+``cachedContents``. Latency is modelled as a fixed overhead plus prefill
+time per uncached prompt token plus decode time per output token, and every
+response carries ``usageMetadata`` so token savings can be measured offline.
+
+Run standalone:
+    python -m stubs.gemini --port 8090
+and point the app at it with GEMINI_API_BASE=http://127.0.0.1:8090/v1beta
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+from medical_fallback import match_fallback
+from stubs import StubServer
+
+_SYMPTOMS = re.compile(r'reported symptoms: "(.*?)"', re.S)
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class GeminiStubState:
+    def __init__(self, base_latency=0.05, prefill_ms_per_1k=40.0, decode_tokens_per_s=2000.0,
+                 error_rate=0.0, pad_bytes=0, stream_chunks=12):
+        self.base_latency = base_latency
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+        self.decode_tokens_per_s = decode_tokens_per_s
+        self.error_rate = error_rate
+        self.pad_bytes = pad_bytes
+        self.stream_chunks = stream_chunks
+        self.cached_contents: dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0, "errors": 0, "cachesCreated": 0,
+            "promptTokens": 0, "cachedTokens": 0, "outputTokens": 0,
+        }
+
+    def count(self, **deltas) -> None:
+        with self.lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+
+class GeminiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: GeminiStubState
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/stats":
+            with self.state.lock:
+                self._send_json(200, dict(self.state.stats))
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_PATCH(self):
+        path = urlparse(self.path).path
+        name = path.split("/v1beta/", 1)[-1]
+        body = self._read_json()
+        with self.state.lock:
+            entry = self.state.cached_contents.get(name)
+            if entry is None:
+                self._send_json(404, {"error": {"message": "CachedContent not found"}})
+                return
+            entry["expires"] = time.time() + _ttl_seconds(body.get("ttl"))
+        self._send_json(200, {"name": name})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        body = self._read_json()
+
+        if query.get("key", [""])[0] in ("", "invalid"):
+            self._send_json(400, {"error": {"status": "INVALID_ARGUMENT", "message": "API key not valid. API_KEY_INVALID"}})
+            return
+
+        if url.path.endswith("/cachedContents"):
+            self._create_cache(body)
+        elif url.path.endswith(":generateContent"):
+            self._generate(body, stream=False)
+        elif url.path.endswith(":streamGenerateContent"):
+            self._generate(body, stream=True)
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def _create_cache(self, body):
+        text = "".join(p.get("text", "") for p in body.get("systemInstruction", {}).get("parts", []))
+        name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+        tokens = estimate_tokens(text)
+        with self.state.lock:
+            self.state.cached_contents[name] = {
+                "tokens": tokens,
+                "expires": time.time() + _ttl_seconds(body.get("ttl")),
+            }
+        self.state.count(cachesCreated=1)
+        self._send_json(200, {"name": name, "usageMetadata": {"totalTokenCount": tokens}})
+
+    def _generate(self, body, stream):
+        state = self.state
+        cached_tokens = 0
+        if body.get("cachedContent"):
+            with state.lock:
+                entry = state.cached_contents.get(body["cachedContent"])
+            if entry is None or entry["expires"] < time.time():
+                self._send_json(404, {"error": {"message": "CachedContent not found"}})
+                return
+            cached_tokens = entry["tokens"]
+
+        user_text = "".join(
+            p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", [])
+        )
+        system_text = "".join(p.get("text", "") for p in body.get("systemInstruction", {}).get("parts", []))
+        uncached_tokens = estimate_tokens(user_text) + (estimate_tokens(system_text) if system_text else 0)
+
+        if random.random() < state.error_rate:
+            state.count(requests=1, errors=1)
+            self._send_json(503, {"error": {"status": "UNAVAILABLE", "message": "Stub overloaded"}})
+            return
+
+        match = _SYMPTOMS.search(user_text)
+        result = dict(match_fallback(match.group(1) if match else user_text))
+        if state.pad_bytes:
+            result["clinicalSummary"] = "x" * state.pad_bytes
+        text = json.dumps(result)
+        output_tokens = estimate_tokens(text)
+        usage = {
+            "promptTokenCount": uncached_tokens + cached_tokens,
+            "cachedContentTokenCount": cached_tokens,
+            "candidatesTokenCount": output_tokens,
+        }
+        state.count(requests=1, promptTokens=uncached_tokens + cached_tokens,
+                    cachedTokens=cached_tokens, outputTokens=output_tokens)
+
+        time.sleep(state.base_latency + uncached_tokens / 1000 * state.prefill_ms_per_1k / 1000)
+        decode_time = output_tokens / state.decode_tokens_per_s
+
+        if not stream:
+            time.sleep(decode_time)
+            self._send_json(200, {
+                "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}],
+                "usageMetadata": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        size = max(1, -(-len(text) // state.stream_chunks))
+        for start in range(0, len(text), size):
+            time.sleep(decode_time / state.stream_chunks)
+            chunk = {"candidates": [{"content": {"parts": [{"text": text[start:start + size]}], "role": "model"}}]}
+            if start + size >= len(text):
+                chunk["usageMetadata"] = usage
+            self._write_chunk(f"data: {json.dumps(chunk)}\r\n\r\n".encode())
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, data):
+        raw = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+def _ttl_seconds(ttl) -> float:
+    return float(str(ttl or "3600s").rstrip("s"))
+
+
+def start_stub(host="127.0.0.1", port=0, **options):
+    """Start the stub in a daemon thread; returns (server, base_url, state)."""
+    state = GeminiStubState(**options)
+    handler = type("Handler", (GeminiStubHandler,), {"state": state})
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/v1beta", state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gemini API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--base-latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=40.0, help="ms per 1k uncached prompt tokens")
+    parser.add_argument("--decode-tps", type=float, default=2000.0, help="output tokens per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--pad-bytes", type=int, default=0, help="extra bytes added to each analysis")
+    args = parser.parse_args()
+
+    server, base_url, _ = start_stub(
+        args.host, args.port,
+        base_latency=args.base_latency, prefill_ms_per_1k=args.prefill_ms_per_1k,
+        decode_tokens_per_s=args.decode_tps, error_rate=args.error_rate, pad_bytes=args.pad_bytes,
+    )
+    print(f"Gemini stub listening; set GEMINI_API_BASE={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
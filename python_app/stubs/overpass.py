@@ -0,0 +1,181 @@
+"""
+Stand-in for the Overpass API interpreter.
+
+Answers ``POST /api/interpreter`` with synthetic healthcare elements spread
+around the ``around:`` filter of the query. Each element carries one of the
+tag pairs the query selects, and the same query always gets the same
+elements. Latency (including a slow tail), element count, per-element
+padding and the error rate are configurable.
+
+Run standalone:
+    python -m stubs.overpass --port 8091
+and point the app at it with OVERPASS_URL=http://127.0.0.1:8091/api/interpreter
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+from stubs import StubServer
+
+_AROUND = re.compile(r"around:(\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)")
+_TAG = re.compile(r'(nwr|nw|node|way)\["([^"]+)"[=~]"([^"]+)"\]')
+
+NAMES = ["City", "Care", "Sunrise", "Apollo", "Lotus", "Metro", "Green", "Family", "Central", "Hope"]
+SPECIALTIES = ["general", "cardiology", "dermatology", "paediatrics", "orthopaedics", "ophthalmology"]
+
+
+class OverpassStubState:
+    def __init__(self, base_latency=0.2, ms_per_1k_elements=50.0, elements=300,
+                 error_rate=0.0, pad_bytes=0, tail_rate=0.0, tail_latency=2.0):
+        self.base_latency = base_latency
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.ms_per_1k_elements = ms_per_1k_elements
+        self.elements = elements
+        self.error_rate = error_rate
+        self.pad_bytes = pad_bytes
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "elements": 0, "bytes": 0}
+
+    def count(self, **deltas) -> None:
+        with self.lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+
+def synthetic_elements(query: str, count: int, pad_bytes: int = 0) -> list[dict]:
+    """Deterministic elements within the query's ``around`` circle."""
+    around = _AROUND.search(query)
+    if around is None:
+        return []
+    radius_m, lat, lon = (float(g) for g in around.groups())
+    pairs = []
+    for el_type, key, value in _TAG.findall(query):
+        for v in value.strip("^$()").split("|"):
+            pairs.append((el_type, key, v))
+    if not pairs:
+        return []
+
+    rng = random.Random(zlib.crc32(query.encode()))
+    elements = []
+    for i in range(count):
+        el_type, key, value = pairs[i % len(pairs)]
+        if el_type in ("nw", "nwr"):
+            el_type = "way" if rng.random() < 0.3 else "node"
+        # Uniform over the disc; about one in eight elements is unnamed.
+        dist_km = radius_m / 1000 * math.sqrt(rng.random())
+        bearing = rng.uniform(0, 2 * math.pi)
+        el_lat = lat + dist_km / 111.32 * math.cos(bearing)
+        el_lon = lon + dist_km / (111.32 * max(math.cos(math.radians(lat)), 0.01)) * math.sin(bearing)
+        tags = {key: value}
+        if rng.random() > 0.125:
+            tags["name"] = f"{rng.choice(NAMES)} {value.title()} {i}"
+        if rng.random() < 0.5:
+            tags["phone"] = f"+91 {rng.randrange(10**9, 10**10)}"
+        if rng.random() < 0.4:
+            tags["opening_hours"] = "Mo-Sa 09:00-18:00"
+        if rng.random() < 0.3:
+            tags["healthcare:speciality"] = rng.choice(SPECIALTIES)
+        if rng.random() < 0.5:
+            tags["addr:street"] = f"{rng.choice(NAMES)} Road"
+            tags["addr:city"] = "Stubville"
+        if pad_bytes:
+            tags["description"] = "x" * pad_bytes
+        el = {"type": el_type, "id": zlib.crc32(f"{el_type}{i}{query}".encode()), "tags": tags}
+        if el_type == "node":
+            el["lat"], el["lon"] = round(el_lat, 7), round(el_lon, 7)
+        else:
+            el["center"] = {"lat": round(el_lat, 7), "lon": round(el_lon, 7)}
+        elements.append(el)
+    return elements
+
+
+class OverpassStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: OverpassStubState
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/stats":
+            with self.state.lock:
+                self._send(200, json.dumps(self.state.stats).encode())
+        else:
+            self._send(404, b'{"error": "Not found"}')
+
+    def do_POST(self):
+        state = self.state
+        length = int(self.headers.get("Content-Length") or 0)
+        query = parse_qs(self.rfile.read(length).decode()).get("data", [""])[0]
+
+        if random.random() < state.error_rate:
+            state.count(requests=1, errors=1)
+            time.sleep(state.base_latency)
+            self._send(504, b'{"remark": "runtime error: stub timeout"}')
+            return
+
+        elements = synthetic_elements(query, state.elements, state.pad_bytes)
+        raw = json.dumps({
+            "version": 0.6,
+            "generator": "Overpass stub",
+            "elements": elements,
+        }).encode()
+        state.count(requests=1, elements=len(elements), bytes=len(raw))
+        tail = state.tail_latency if random.random() < state.tail_rate else 0.0
+        time.sleep(state.base_latency + tail + len(elements) / 1000 * state.ms_per_1k_elements / 1000)
+        self._send(200, raw)
+
+    def _send(self, status, raw: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+def start_stub(host="127.0.0.1", port=0, **options):
+    """Start the stub in a daemon thread; returns (server, interpreter_url, state)."""
+    state = OverpassStubState(**options)
+    handler = type("Handler", (OverpassStubHandler,), {"state": state})
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/api/interpreter", state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overpass API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--base-latency", type=float, default=0.2, help="seconds per request")
+    parser.add_argument("--ms-per-1k-elements", type=float, default=50.0, help="extra ms per 1k elements")
+    parser.add_argument("--elements", type=int, default=300, help="elements per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 504 responses")
+    parser.add_argument("--pad-bytes", type=int, default=0, help="extra bytes added to each element")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of slow responses")
+    parser.add_argument("--tail-latency", type=float, default=2.0, help="extra seconds for a slow response")
+    args = parser.parse_args()
+
+    server, url, _ = start_stub(
+        args.host, args.port,
+        base_latency=args.base_latency, ms_per_1k_elements=args.ms_per_1k_elements,
+        elements=args.elements, error_rate=args.error_rate, pad_bytes=args.pad_bytes,
+        tail_rate=args.tail_rate, tail_latency=args.tail_latency,
+    )
+    print(f"Overpass stub listening; set OVERPASS_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app's modules are imported by name from python_app/, as run.sh does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py reads its configuration at import: keep the test run off the
+# network and out of the checked-out users.sqlite.
+_tmp = tempfile.mkdtemp(prefix="healthagg-tests-")
+os.environ.setdefault("USER_DB_PATH", os.path.join(_tmp, "users.sqlite"))
+os.environ["GEMINI_API_KEY"] = ""
+os.environ["NOMINATIM_URL"] = ""
+os.environ["OVERPASS_URLS"] = "http://127.0.0.1:9/api/interpreter"
+
+
+@pytest.fixture
+def shared_store(tmp_path):
+    from shared_store import SharedStore
+
+    store = SharedStore(str(tmp_path / "shared.sqlite"))
+    yield store
+    store.close()
@@ -0,0 +1,48 @@
+from analysis_cache import AnalysisCache, normalize_symptoms
+
+
+def test_normalize_folds_order_case_stopwords_and_synonyms():
+    assert normalize_symptoms("Headache and fever for 2 days") == normalize_symptoms("fever, headaches for two day")
+    assert normalize_symptoms("I have a tummy ache") == "pain stomach"
+    assert normalize_symptoms("I'm feeling very tired") == "fatigue"
+
+
+def test_normalize_keeps_negations_and_time_words():
+    assert normalize_symptoms("no fever") == "not_fever"
+    assert normalize_symptoms("cough without fever") != normalize_symptoms("cough with fever")
+    assert normalize_symptoms("pain after eating") != normalize_symptoms("pain before eating")
+    assert normalize_symptoms("weakness") != normalize_symptoms("tired")
+    assert normalize_symptoms("the and of") == ""
+
+
+def test_cache_hits_for_equivalent_descriptions():
+    cache = AnalysisCache()
+    cache.set("Headache and fever", {"a": 1})
+    assert cache.get("fever + HEADACHE!") == {"a": 1}
+    assert cache.get("headache") is None
+    # Nothing to key on
+    cache.set("and the", {"b": 2})
+    assert cache.get("and the") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_cache_shares_results_through_the_store(shared_store):
+    AnalysisCache(shared=shared_store).set("dry cough", {"a": 1})
+    other = AnalysisCache(shared=shared_store)
+    assert other.get("cough, dry") == {"a": 1}
+    assert other.get("cough, dry") == {"a": 1}
+    assert (other.persistent_hits, other.hits) == (1, 1)
+
+
+def test_stats_estimate_time_saved():
+    cache = AnalysisCache()
+    cache.record_upstream_latency(2.0)
+    cache.record_upstream_latency(4.0)
+    cache.set("rash", {})
+    cache.get("rash")
+    cache.get("rash")
+    stats = cache.stats()
+    assert stats["avgUpstreamSeconds"] == 3.0
+    assert stats["estimatedSecondsSaved"] == 6.0
+    assert stats["hitRate"] == 1.0
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from analysis_stream import AnalysisEvents, TopLevelFieldParser, done_event, replay_events, sse_line_text
+
+ANALYSIS = {
+    "chiefComplaint": "Headache, \"throbbing\" {left}",
+    "confidence": 85,
+    "differentials": [{"name": "Migraine", "likelihood": "high"}],
+    "redFlags": [],
+    "urgent": False,
+}
+
+
+def _fragments(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, 1000])
+def test_parser_reports_each_field_once_complete(size):
+    text = "```json\n" + json.dumps(ANALYSIS, indent=2) + "\n```"
+    parser = TopLevelFieldParser()
+    fields = []
+    for fragment in _fragments(text, size):
+        fields.extend(parser.feed(fragment))
+    assert fields == list(ANALYSIS.items())
+    assert parser.closed
+
+
+def test_parser_waits_for_numbers_to_end():
+    parser = TopLevelFieldParser()
+    assert parser.feed('{"confidence": 8') == []
+    assert parser.feed('5, "a": "b"') == [("confidence", 85)]
+    assert parser.feed("}") == [("a", "b")]
+
+
+def test_parser_before_the_document_starts():
+    parser = TopLevelFieldParser()
+    assert parser.feed("Here you go: ") == []
+    assert parser.feed('{"a": 1,') == [("a", 1)]
+
+
+def test_sse_line_text():
+    chunk = {"candidates": [{"content": {"parts": [{"text": "{\"a\""}, {"text": ": 1"}]}}]}
+    assert sse_line_text("data: " + json.dumps(chunk)) == ['{"a"', ": 1"]
+    assert sse_line_text('data: {"candidates": [{"finishReason": "STOP"}]}') == []
+    assert sse_line_text(": keep-alive") == []
+    assert sse_line_text("") == []
+    assert sse_line_text('data:{"candidates": [{"content": {"parts": [{"text": "é"}]}}]}') == ["é"]
+
+
+def test_replay_events_and_done_event():
+    events = list(replay_events({"a": 1, "b": [2]}, "cache"))
+    assert events[:2] == [
+        'event: field\ndata: {"key":"a","value":1}\n\n',
+        'event: field\ndata: {"key":"b","value":[2]}\n\n',
+    ]
+    assert events[2] == 'event: done\ndata: {"source":"cache","result":{"a":1,"b":[2]}}\n\n'
+    done = done_event({}, "fallback", "token")
+    assert json.loads(done.split("data: ", 1)[1]) == {
+        "source": "fallback", "result": {}, "provisional": True, "resultToken": "token",
+    }
+
+
+def test_analysis_events():
+    events = AnalysisEvents()
+    assert events.feed('{"a": 1') == []
+    assert events.feed(', "b": 2}') == [
+        'event: field\ndata: {"key":"a","value":1}\n\n',
+        'event: field\ndata: {"key":"b","value":2}\n\n',
+    ]
+    assert events.result() == {"a": 1, "b": 2}
+    with pytest.raises(ValueError):
+        AnalysisEvents().result()
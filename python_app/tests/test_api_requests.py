@@ -0,0 +1,106 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from api_requests import (
+    MAX_RESULT_WAIT,
+    FindCareSearch,
+    GeminiKeys,
+    InvalidRequest,
+    analysis_request,
+    batch_request,
+    result_request,
+)
+
+
+def test_analysis_request():
+    assert analysis_request({"symptoms": "  cough  ", "apiKey": " key "}) == ("cough", "key")
+    assert analysis_request({"symptoms": "cough", "apiKey": None}) == ("cough", "")
+
+
+@pytest.mark.parametrize("body, message", [
+    (None, "Invalid request body"),
+    ({}, "Invalid request body"),
+    (["cough"], "Invalid request body"),
+    ("cough", "Invalid request body"),
+    ({"symptoms": "   "}, "Please describe your symptoms"),
+    ({"symptoms": 42}, "symptoms must be a string"),
+    ({"symptoms": ["cough"]}, "symptoms must be a string"),
+    ({"symptoms": "cough", "apiKey": 7}, "apiKey must be a string"),
+])
+def test_analysis_request_rejects(body, message):
+    with pytest.raises(InvalidRequest, match=message):
+        analysis_request(body)
+
+
+def test_batch_request():
+    items, api_key = batch_request({"items": [" rash ", {"id": "b", "symptoms": "cough"}], "apiKey": "k"}, 5)
+    assert items == [(0, 0, "rash"), (1, "b", "cough")]
+    assert api_key == "k"
+
+
+@pytest.mark.parametrize("body, message", [
+    (None, "non-empty list"),
+    ({"items": []}, "non-empty list"),
+    ({"items": "rash"}, "non-empty list"),
+    ({"items": ["a", "b", "c"]}, "At most 2 items"),
+    ({"items": ["a", {"id": 1}]}, "Item 1 has no symptoms"),
+    ({"items": ["a", 3]}, "Item 1 has no symptoms"),
+    ({"items": ["a"], "apiKey": ["k"]}, "apiKey must be a string"),
+])
+def test_batch_request_rejects(body, message):
+    with pytest.raises(InvalidRequest, match=message):
+        batch_request(body, 2)
+
+
+def test_result_request_clamps_the_wait():
+    assert result_request(MultiDict({"token": "t", "wait": "3.5"})) == ("t", 3.5)
+    assert result_request(MultiDict({"wait": "-1"})) == ("", 0.0)
+    assert result_request(MultiDict({"token": "t", "wait": "999"}))[1] == MAX_RESULT_WAIT
+    assert result_request(MultiDict({"token": "t", "wait": "soon"}))[1] == 0.0
+
+
+def test_find_care_search():
+    search = FindCareSearch(MultiDict({"lat": "12.9", "lon": "77.5", "radius": "5000", "q": "dentist"}))
+    assert (search.lat, search.lon, search.radius, search.limit, search.page_size) == (12.9, 77.5, 5000, 20, None)
+    assert (("node", "way"), "amenity", "dentist") in search.filters
+    with pytest.raises(InvalidRequest):
+        FindCareSearch(MultiDict({"lat": "12.9"}))
+
+
+def test_gemini_keys_try_the_users_key_then_the_servers(caplog):
+    keys = GeminiKeys("user", "server")
+    tried = []
+    for key in keys:
+        with keys.attempt(key):
+            tried.append(key)
+            if key == "user":
+                raise RuntimeError("boom")
+            break
+    assert tried == ["user", "server"]
+    assert "AI error (non-auth)" in caplog.text
+
+    assert list(GeminiKeys("", "server")) == ["server"]
+    assert not GeminiKeys("", "")
+
+
+def test_gemini_keys_surface_a_rejected_user_key():
+    keys = GeminiKeys("user", "server")
+    with pytest.raises(ValueError):
+        with keys.attempt("user"):
+            raise ValueError("Invalid API key")
+    # The server key's rejection is only logged
+    with keys.attempt("server"):
+        raise ValueError("Invalid API key")
+
+
+def test_invalid_requests_answer_400():
+    import app as app_module
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["user_email"] = "api@example.com"
+    for body in ([1, 2], {"symptoms": {"text": "cough"}}, {"symptoms": "cough", "apiKey": 1}):
+        resp = client.post("/api/analyze", json=body)
+        assert resp.status_code == 400 and resp.json["error"]
+    assert client.post("/api/analyze/batch", json={"items": [{}]}).status_code == 400
+
@@ -0,0 +1,44 @@
+"""Smoke test of the ASGI entry: native handlers and the bridge to the Flask app."""
+
+import asyncio
+
+import httpx
+
+import asgi
+
+
+def test_asgi_serves_async_handlers_and_bridged_flask_routes():
+    async def scenario():
+        transport = httpx.ASGITransport(app=asgi.application)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            # Native handler, before logging in
+            r = await client.post("/api/analyze", json={"symptoms": "headache"})
+            assert r.status_code == 302 and r.headers["location"].endswith("/login")
+
+            # Flask views through the WSGI bridge
+            r = await client.get("/login")
+            assert r.status_code == 200 and "text/html" in r.headers["content-type"]
+            form = {"name": "Ada", "email": "ada@example.com", "password": "correct horse battery"}
+            r = await client.post("/signup", data=form)
+            assert r.status_code == 302
+            assert "session" in client.cookies
+
+            # Native handlers with the Flask session
+            r = await client.post("/api/analyze", json={"symptoms": "  "})
+            assert r.status_code == 400
+            r = await client.post("/api/analyze", json={"symptoms": "headache and fever"})
+            assert r.status_code == 200 and r.json()["chiefComplaint"]
+
+            r = await client.post("/api/analyze/stream", json={"symptoms": "dry cough"})
+            assert r.headers["content-type"].startswith("text/event-stream")
+            assert r.text.count("event: field") > 1
+            assert '"source":"fallback"' in r.text.rsplit("event: done", 1)[1]
+
+            r = await client.post("/api/analyze/batch", json={"items": ["sore throat", "back pain"]})
+            assert r.headers["content-type"].startswith("application/x-ndjson")
+            assert len(r.text.splitlines()) == 2
+
+            r = await client.get("/api/analyze/result", params={"token": "unknown"})
+            assert r.status_code == 404
+
+    asyncio.run(scenario())
@@ -0,0 +1,107 @@
+import zipfile
+
+import pytest
+
+from gazetteer import Gazetteer, GeocodeUnavailable, ReverseGeocoder, read_geonames
+
+
+def _row(place_id, name, lat, lon, country, population, feature_class="P"):
+    fields = [str(place_id), name, name, "", str(lat), str(lon), feature_class, "PPL", country,
+              "", "", "", "", "", str(population), "", "900", "Asia/Kolkata", "2024-01-01"]
+    return "\t".join(fields)
+
+
+DUMP = "\n".join([
+    _row(1277333, "Bengaluru", 12.97194, 77.59369, "IN", 8443675),
+    _row(1264527, "Chennai", 13.08784, 80.27847, "IN", 4646732),
+    _row(1, "Nandi Hills", 13.37, 77.68, "IN", 0, feature_class="T"),
+    _row(1259229, "Pune", 18.51957, 73.85535, "IN", 3124458),
+]) + "\n"
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    dump = tmp_path / "cities.txt"
+    dump.write_text(DUMP, encoding="utf-8")
+    gazetteer = Gazetteer(str(tmp_path / "gazetteer.sqlite"))
+    gazetteer.upsert(read_geonames(str(dump)))
+    return gazetteer
+
+
+def test_read_geonames_keeps_populated_places(tmp_path):
+    dump = tmp_path / "cities.txt"
+    dump.write_text(DUMP, encoding="utf-8")
+    archive = tmp_path / "cities.zip"
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("readme.txt", "not a dump")
+        z.writestr("cities.txt", DUMP)
+    rows = list(read_geonames(str(dump)))
+    assert rows[0] == (1277333, "Bengaluru", 12.97194, 77.59369, "IN", 8443675)
+    assert [r[1] for r in rows] == ["Bengaluru", "Chennai", "Pune"]
+    assert list(read_geonames(str(archive))) == rows
+
+
+def test_nearest_place(gazetteer):
+    assert gazetteer.count() == 3
+    place = gazetteer.nearest(12.93, 77.62)
+    assert place["name"] == "Bengaluru" and place["country"] == "IN"
+    assert 5 < place["distanceKm"] < 6
+    # Beyond max_km of everything
+    assert gazetteer.nearest(15.5, 76.0) is None
+    assert gazetteer.nearest(15.5, 76.0, max_km=400)["name"] == "Bengaluru"
+
+
+def test_reverse_geocoder_caches_rounded_points(gazetteer):
+    calls = []
+    geocoder = ReverseGeocoder(gazetteer, fallback=lambda lat, lon: calls.append((lat, lon)), precision=2)
+    place = geocoder.resolve(12.97123, 77.59456)
+    assert place["name"] == "Bengaluru" and place["source"] == "gazetteer"
+    gazetteer.upsert([(2, "Closer", 12.97, 77.59, "IN", 1)])
+    assert geocoder.resolve(12.96876, 77.59111)["name"] == "Bengaluru"
+    assert calls == []
+
+
+def test_reverse_geocoder_falls_back_and_caches_misses(gazetteer):
+    calls = []
+
+    def fallback(lat, lon):
+        calls.append((lat, lon))
+        return None
+
+    geocoder = ReverseGeocoder(gazetteer, fallback=fallback, fallback_interval=0)
+    assert geocoder.resolve(40.123456, -3.98765) is None
+    assert geocoder.resolve(40.12, -3.99) is None
+    # The fallback only ever sees rounded coordinates, once per key
+    assert calls == [(40.12, -3.99)]
+
+
+def test_reverse_geocoder_throttles_the_fallback(gazetteer):
+    geocoder = ReverseGeocoder(gazetteer, fallback=lambda lat, lon: {"name": "X"}, fallback_interval=60)
+    assert geocoder.resolve(40.0, -3.0) == {"name": "X"}
+    with pytest.raises(GeocodeUnavailable):
+        geocoder.resolve(41.0, -3.0)
+    # Cached answers need no fallback
+    assert geocoder.resolve(40.0, -3.0) == {"name": "X"}
+
+
+def test_reverse_geocoder_throttle_is_shared_between_workers(shared_store):
+    workers = [
+        ReverseGeocoder(None, shared=shared_store, fallback=lambda lat, lon: {"name": "X"}, fallback_interval=60)
+        for _ in range(3)
+    ]
+    outcomes = []
+    for i, geocoder in enumerate(workers):
+        try:
+            outcomes.append(geocoder.resolve(40.0 + i, -3.0))
+        except GeocodeUnavailable:
+            outcomes.append("throttled")
+    assert outcomes == [{"name": "X"}, "throttled", "throttled"]
+
+
+def test_reverse_geocoder_reports_fallback_errors():
+    def broken(lat, lon):
+        raise OSError("down")
+
+    with pytest.raises(GeocodeUnavailable, match="down"):
+        ReverseGeocoder(None, fallback=broken, fallback_interval=0).resolve(1.0, 2.0)
+    assert ReverseGeocoder(None).resolve(1.0, 2.0) is None
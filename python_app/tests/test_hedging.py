@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from stubs.overpass import start_stub
+from upstream import CircuitBreaker, HedgedClient, UpstreamUnavailable
+
+
+@pytest.fixture
+def mirrors():
+    servers = []
+
+    def start(**options):
+        server, url, state = start_stub(ms_per_1k_elements=0, elements=3, **options)
+        servers.append(server)
+        return url, state
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _client(urls, **options):
+    options.setdefault("default_delay", 0.1)
+    return HedgedClient("overpass", urls, timeout=5, **options)
+
+
+def test_hedges_a_slow_primary_to_the_next_mirror(mirrors):
+    slow, slow_state = mirrors(base_latency=1.0)
+    fast, fast_state = mirrors(base_latency=0.01)
+    client = _client([slow, fast])
+    started = time.perf_counter()
+    resp = client.post(data={"data": "node"})
+    assert resp.status_code == 200
+    assert time.perf_counter() - started < 0.8
+    assert slow_state.stats["requests"] == fast_state.stats["requests"] == 1
+
+
+def test_fails_over_on_errors_without_waiting_for_the_hedge(mirrors):
+    broken, broken_state = mirrors(base_latency=0.01, error_rate=1.0)
+    healthy, _ = mirrors(base_latency=0.01)
+    client = _client([broken, healthy], default_delay=5)
+    started = time.perf_counter()
+    assert client.post(data={"data": "node"}).status_code == 200
+    assert time.perf_counter() - started < 1
+    assert broken_state.stats["errors"] == 1
+
+
+def test_returns_the_last_error_response_when_every_mirror_fails(mirrors):
+    first, _ = mirrors(base_latency=0.01, error_rate=1.0)
+    second, _ = mirrors(base_latency=0.01, error_rate=1.0)
+    assert _client([first, second]).post(data={"data": "node"}).status_code == 504
+
+
+def test_ejects_failing_mirrors(mirrors):
+    broken, broken_state = mirrors(base_latency=0.01, error_rate=1.0)
+    healthy, _ = mirrors(base_latency=0.01)
+    client = _client(
+        [broken, healthy],
+        breaker_factory=lambda: CircuitBreaker(failure_threshold=2, reset_timeout=60),
+    )
+    for _ in range(4):
+        assert client.post(data={"data": "node"}).status_code == 200
+    assert [m.url for m in client.ranked()] == [healthy]
+    assert broken_state.stats["requests"] == 2
+
+    client.mirrors[1].client.breaker.record_failure()
+    client.mirrors[1].client.breaker.record_failure()
+    assert not client.available()
+    with pytest.raises(UpstreamUnavailable):
+        client.post(data={"data": "node"})
+
+
+def test_hedge_delay_follows_the_mirror_p90():
+    client = _client(["http://127.0.0.1:9/"], default_delay=1.0, min_samples=5)
+    mirror = client.mirrors[0]
+    assert client.hedge_delay(mirror) == 1.0
+    for seconds in (0.1, 0.2, 0.2, 0.3, 0.4):
+        mirror.record_latency(seconds)
+    assert client.hedge_delay(mirror) == 0.4
+    mirror.record_latency(0.0)
+    assert client.hedge_delay(mirror) >= client.min_delay
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from medical_fallback import FALLBACK_DATABASE, load_knowledge_base, match_fallback, match_fallback_key
+
+
+@pytest.fixture
+def knowledge_base(tmp_path):
+    def write(key, terms=None, priority=None):
+        entry = {"key": key, "response": {"condition": key}}
+        if terms is not None:
+            entry["terms"] = terms
+        if priority is not None:
+            entry["priority"] = priority
+        (tmp_path / f"{key}.json").write_text(json.dumps(entry))
+
+    write("default")
+    write("cold", {"cold": 2, "runny nose": 3, "sneezing": 1}, priority=2)
+    write("flu", {"flu": 3, "body ache": 2, "chills": 1}, priority=1)
+    write("ear", {"ear": 2, "earache": 3, "ear pain": 3}, priority=3)
+    write("rash", priority=4)
+    return str(tmp_path)
+
+
+def _matcher(directory):
+    entries, automaton, default = load_knowledge_base(directory)
+
+    def match(text):
+        scores = automaton.scores(text.lower())
+        if not scores:
+            return "default"
+        return entries[min(scores, key=lambda i: (-scores[i], i))]["key"]
+
+    return match, automaton, entries
+
+
+def test_highest_weight_wins(knowledge_base):
+    match, _, _ = _matcher(knowledge_base)
+    assert match("Runny nose and a bit of body ache") == "cold"
+    assert match("flu with runny nose and chills and body ache") == "flu"
+    assert match("nothing relevant") == "default"
+
+
+def test_ties_go_to_the_lower_priority_value(knowledge_base):
+    match, _, _ = _matcher(knowledge_base)
+    # cold (runny nose 3) and flu (flu 3) tie
+    assert match("flu, runny nose") == "flu"
+
+
+def test_terms_match_at_word_starts_only(knowledge_base):
+    match, _, _ = _matcher(knowledge_base)
+    assert match("my heart is fine") == "default"
+    assert match("scold") == "default"
+    assert match("colds") == "cold"
+
+
+def test_overlapping_terms_each_count_once(knowledge_base):
+    _, automaton, entries = _matcher(knowledge_base)
+    ear = next(i for i, e in enumerate(entries) if e["key"] == "ear")
+    # "ear", "earache" and "ear pain" overlap; each distinct term counts once
+    assert automaton.scores("earache, ear pain, ear pain, ear") == {ear: 8}
+
+
+def test_entries_without_terms_match_their_key(knowledge_base):
+    match, _, _ = _matcher(knowledge_base)
+    assert match("itchy rash on arm") == "rash"
+
+
+def test_shipped_knowledge_base():
+    assert match_fallback_key("Throbbing head and temple pain since morning") == "headache"
+    assert match_fallback_key("high temperature and chills") == "fever"
+    # Equal scores: headache has the lower priority value
+    assert match_fallback_key("fever and headache") == "headache"
+    assert match_fallback_key("sprained ankle") == "default"
+    assert match_fallback("migraine") is FALLBACK_DATABASE["headache"]
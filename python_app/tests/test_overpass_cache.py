@@ -0,0 +1,147 @@
+import time
+
+from overpass_cache import ALL_TAGS, OverpassCache
+from tiered_cache import MEMORY, SHARED, TieredCache
+from ttl_cache import TTLCache
+
+DOCTORS = frozenset({(("node",), "amenity", "doctors")})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+# ──────────────────────────────────────────────
+# TTLCache
+# ──────────────────────────────────────────────
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=4, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+    clock.now += 11
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.get("a", "gone") == "gone"
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert len(cache) == 2
+
+
+def test_ttl_cache_pop_and_clear():
+    cache = TTLCache()
+    cache.set("a", 1)
+    assert cache.pop("a") == 1
+    assert cache.pop("a", "missing") == "missing"
+    cache.set("b", 2)
+    cache.clear()
+    assert len(cache) == 0
+
+
+# ──────────────────────────────────────────────
+# TieredCache
+# ──────────────────────────────────────────────
+def test_tiered_cache_reads_through_to_the_shared_store(shared_store):
+    writer = TieredCache("ns", shared=shared_store)
+    reader = TieredCache("ns", shared=shared_store)
+    writer.set("k", {"v": 1})
+    assert writer.lookup("k") == ({"v": 1}, MEMORY)
+    assert reader.lookup("k") == ({"v": 1}, SHARED)
+    # Copied into memory on the way
+    assert reader.lookup("k") == ({"v": 1}, MEMORY)
+
+
+def test_tiered_cache_keeps_the_shared_expiry(shared_store):
+    TieredCache("ns", ttl=600, shared=shared_store).set("k", 1, ttl=0.2)
+    reader = TieredCache("ns", ttl=600, shared=shared_store)
+    assert reader.get("k") == 1
+    time.sleep(0.3)
+    assert reader.get("k") is None
+
+
+def test_tiered_cache_rereads_stale_values(shared_store):
+    first = TieredCache("ns", shared=shared_store)
+    second = TieredCache("ns", shared=shared_store)
+    first.set("job", "pending")
+    second.set("job", "ready")
+    assert first.get("job") == "pending"
+    assert first.get("job", stale=lambda v: v == "pending") == "ready"
+
+
+def test_tiered_cache_remember_and_publish_are_one_tier_each(shared_store):
+    cache = TieredCache("ns", shared=shared_store)
+    cache.remember("local", 1)
+    cache.publish("shared", 2)
+    assert shared_store.get("ns", "local") is None
+    assert cache.lookup("shared") == (2, SHARED)
+    cache.clear()
+    assert cache.lookup("local") == (None, None)
+
+
+def test_tiered_cache_without_a_store():
+    cache = TieredCache("ns")
+    assert cache.lookup("k") == (None, None)
+    cache.set("k", 1)
+    assert cache.get("k") == 1 and len(cache) == 1
+
+
+# ──────────────────────────────────────────────
+# OverpassCache
+# ──────────────────────────────────────────────
+def _element(el_id, amenity):
+    return {"type": "node", "id": el_id, "lat": 12.97, "lon": 77.59, "tags": {"amenity": amenity}}
+
+
+def test_overpass_cache_fetches_the_tile_once_and_reuses_smaller_radii():
+    cache = OverpassCache(tile_deg=0.01)
+    calls = []
+
+    def fetch(lat, lon, radius_m):
+        calls.append((lat, lon, radius_m))
+        return [_element(1, "doctors")]
+
+    assert cache.get_or_fetch(12.971, 77.591, 5000, DOCTORS, fetch) == [_element(1, "doctors")]
+    # Same tile, smaller radius: a hit
+    cache.get_or_fetch(12.979, 77.599, 3000, DOCTORS, fetch)
+    # A wider radius needs a new fetch
+    cache.get_or_fetch(12.975, 77.595, 8000, DOCTORS, fetch)
+    assert len(calls) == 2
+    lat, lon, radius = calls[0]
+    assert (lat, lon) == cache.tile_center(cache.tile_for(12.971, 77.591))
+    # Padded by the tile's half diagonal, so any point in the tile is covered
+    assert 5000 < radius < 5000 + 1000
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_overpass_cache_answers_from_the_all_tags_area():
+    cache = OverpassCache()
+    elements = [_element(1, "doctors"), _element(2, "pharmacy")]
+    cache.get_or_fetch(12.97, 77.59, 5000, ALL_TAGS, lambda *a: elements)
+    assert cache.lookup(12.97, 77.59, 5000, DOCTORS) == [elements[0]]
+    assert cache.lookup(12.97, 77.59, 9000, DOCTORS) is None
+
+
+def test_overpass_cache_keeps_the_wider_area(shared_store):
+    cache = OverpassCache(shared=shared_store)
+    tile = cache.tile_for(12.97, 77.59)
+    cache._store(tile, DOCTORS, 8000, [_element(1, "doctors")])
+    cache._store(tile, DOCTORS, 3000, [])
+    assert cache.lookup(12.97, 77.59, 8000, DOCTORS) == [_element(1, "doctors")]
+
+
+def test_overpass_cache_shares_fills_between_processes(shared_store):
+    OverpassCache(shared=shared_store).get_or_fetch(12.97, 77.59, 5000, DOCTORS, lambda *a: [_element(1, "doctors")])
+    other = OverpassCache(shared=shared_store)
+    assert other.get_or_fetch(12.97, 77.59, 5000, DOCTORS, lambda *a: []) == [_element(1, "doctors")]
@@ -0,0 +1,101 @@
+import gzip
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask, jsonify, request
+
+from prepared_response import PreparedPayload, dumps_json, finish_response
+
+BODY = {"condition": "headache", "advice": ["rest"] * 200}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    payload = PreparedPayload.from_json(BODY)
+    page = PreparedPayload(
+        b"<html>" + b"x" * 2000 + b"</html>", mimetype="text/html",
+        last_modified=datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+    )
+
+    @app.route("/prepared", methods=["GET", "POST"])
+    def prepared():
+        return payload.response(cache_control="no-cache")
+
+    @app.route("/page")
+    def static_page():
+        return page.response()
+
+    @app.route("/dynamic", methods=["GET", "POST"])
+    def dynamic():
+        return jsonify(BODY)
+
+    @app.route("/small")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.after_request
+    def finish(response):
+        return finish_response(response, 1024, conditional=request.method in ("GET", "HEAD"))
+
+    return app.test_client()
+
+
+def test_dumps_json_matches_jsonify_ordering():
+    assert dumps_json({"b": 1, "a": "é"}) == '{"a":"é","b":1}\n'.encode()
+
+
+def test_prepared_payload_serves_gzip_when_accepted(client):
+    plain = client.get("/prepared")
+    zipped = client.get("/prepared", headers={"Accept-Encoding": "gzip"})
+    assert plain.headers.get("Content-Encoding") is None
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.data) == plain.data == dumps_json(BODY)
+    # One strong validator per representation
+    assert plain.headers["ETag"] != zipped.headers["ETag"]
+    assert zipped.headers["ETag"].endswith('-gz"')
+    assert "Accept-Encoding" in zipped.headers["Vary"]
+    assert plain.headers["Cache-Control"] == "no-cache"
+
+
+def test_prepared_payload_revalidates_get(client):
+    etag = client.get("/prepared").headers["ETag"]
+    resp = client.get("/prepared", headers={"If-None-Match": etag})
+    assert resp.status_code == 304 and resp.data == b""
+    assert client.get("/prepared", headers={"If-None-Match": '"other"'}).status_code == 200
+    # The gzip ETag does not validate the identity body
+    gz_etag = client.get("/prepared", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+    assert client.get("/prepared", headers={"If-None-Match": gz_etag}).status_code == 200
+
+
+def test_prepared_payload_never_answers_post_with_304(client):
+    etag = client.get("/prepared").headers["ETag"]
+    resp = client.post("/prepared", headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and resp.data == dumps_json(BODY)
+    assert resp.headers["ETag"] == etag
+
+
+def test_prepared_payload_if_modified_since(client):
+    first = client.get("/page")
+    assert first.headers["Last-Modified"] == "Wed, 01 May 2024 12:00:00 GMT"
+    assert client.get("/page", headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+    earlier = "Wed, 01 May 2024 11:59:59 GMT"
+    assert client.get("/page", headers={"If-Modified-Since": earlier}).status_code == 200
+
+
+def test_finish_response_compresses_and_validates_dynamic_bodies(client):
+    resp = client.get("/dynamic", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(resp.data) == client.get("/dynamic").data
+    again = client.get("/dynamic", headers={"Accept-Encoding": "gzip", "If-None-Match": resp.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_finish_response_leaves_small_and_unsafe_requests_alone(client):
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert small.headers.get("Content-Encoding") is None
+    assert "ETag" in small.headers
+
+    etag = client.get("/dynamic").headers["ETag"]
+    post = client.post("/dynamic", headers={"If-None-Match": etag})
+    assert post.status_code == 200 and "ETag" not in post.headers
@@ -0,0 +1,106 @@
+from api_requests import ElementSource
+from overpass_cache import ALL_TAGS, OverpassCache
+from overpass_query import overpass_tag_filters
+from provider_index import ProviderIndex, is_healthcare_element
+
+LAT, LON = 12.9716, 77.5946
+PHARMACY = [(("node", "way"), "amenity", "pharmacy")]
+
+
+def _node(el_id, amenity, lat=LAT, lon=LON, name="Care"):
+    return {"type": "node", "id": el_id, "lat": lat, "lon": lon, "tags": {"amenity": amenity, "name": name}}
+
+
+def _index(tmp_path):
+    return ProviderIndex(str(tmp_path / "providers.sqlite"))
+
+
+def test_only_named_healthcare_elements_are_indexed(tmp_path):
+    index = _index(tmp_path)
+    way = {"type": "way", "id": 7, "center": {"lat": LAT, "lon": LON},
+           "tags": {"amenity": "hospital", "name": "General"}}
+    elements = [_node(1, "pharmacy"), _node(2, "pharmacy", name=""), _node(3, "cafe"), way]
+    assert is_healthcare_element(elements[0]) and not is_healthcare_element(elements[2])
+    assert index.upsert(elements) == 2
+    assert index.upsert([_node(1, "pharmacy", name="Renamed")]) == 1
+    assert index.count() == 2
+
+
+def test_query_filters_by_radius_and_tags(tmp_path):
+    index = _index(tmp_path)
+    index.upsert([
+        _node(1, "pharmacy"),
+        _node(2, "hospital", lat=LAT + 0.01),
+        # About 5.5 km north
+        _node(3, "pharmacy", lat=LAT + 0.05),
+    ])
+    assert sorted(el["id"] for el in index.query(LAT, LON, 2000)) == [1, 2]
+    assert [el["id"] for el in index.query(LAT, LON, 10000, PHARMACY)] == [1, 3]
+
+
+def test_store_area_records_coverage(tmp_path):
+    index = _index(tmp_path)
+    index.store_area("area", 5000, [_node(1, "pharmacy")], (LAT, LON, 5500), PHARMACY)
+    assert index.covers("area", 5000, max_age=60)
+    assert index.covers("area", 3000, max_age=60)
+    assert not index.covers("area", 8000, max_age=60)
+    assert not index.covers("other", 1000, max_age=60)
+    assert not index.covers("area", 5000, max_age=-1)
+
+
+def test_store_area_drops_rows_the_fetch_no_longer_returned(tmp_path):
+    index = _index(tmp_path)
+    index.upsert([
+        _node(1, "pharmacy"),
+        _node(2, "pharmacy", lat=LAT + 0.001),
+        # Not selected by the filters, and outside the fetched circle
+        _node(3, "hospital"),
+        _node(4, "pharmacy", lat=LAT + 0.2),
+    ])
+    index.store_area("area", 1000, [_node(1, "pharmacy")], (LAT, LON, 1500), PHARMACY)
+    assert sorted(el["id"] for el in index.query(LAT, LON, 50000)) == [1, 3, 4]
+
+
+def test_imported_boxes_cover_circles_inside_them(tmp_path):
+    index = _index(tmp_path)
+    assert not index.imported(LAT, LON, 1000)
+    index.record_import(LAT - 0.1, LAT + 0.1, LON - 0.1, LON + 0.1)
+    assert index.imported(LAT, LON, 5000)
+    # Reaches past the box
+    assert not index.imported(LAT, LON, 20000)
+    assert not index.imported(LAT + 0.09, LON, 5000)
+
+
+def test_element_source_asks_overpass_until_the_area_is_covered(tmp_path):
+    index = _index(tmp_path)
+    source = ElementSource(index, OverpassCache(), overpass_refresh=True, coverage_ttl=3600)
+    filters = overpass_tag_filters("pharmacy")
+    assert source.indexed(LAT, LON, 5000, filters) is None
+
+    source.store(LAT, LON, 5000, filters, (LAT, LON, 5500), [_node(1, "pharmacy")])
+    assert [el["id"] for el in source.indexed(LAT, LON, 5000, filters)] == [1]
+    # Wider than what was fetched
+    assert source.indexed(LAT, LON, 9000, filters) is None
+    # Other keywords select other tags
+    assert source.indexed(LAT, LON, 5000, overpass_tag_filters("dentist")) is None
+
+
+def test_element_source_uses_the_all_tags_coverage_and_imports(tmp_path):
+    index = _index(tmp_path)
+    source = ElementSource(index, OverpassCache(), coverage_ttl=3600)
+    filters = overpass_tag_filters("dentist")
+    source.store(LAT, LON, 5000, ALL_TAGS, (LAT, LON, 5500), [])
+    assert source.indexed(LAT, LON, 5000, filters) == []
+
+    far = (LAT + 1, LON + 1)
+    assert source.indexed(*far, 5000, filters) is None
+    index.record_import(far[0] - 0.5, far[0] + 0.5, far[1] - 0.5, far[1] + 0.5)
+    assert source.indexed(*far, 5000, filters) == []
+
+
+def test_element_source_without_refresh_always_answers_from_the_index(tmp_path):
+    index = _index(tmp_path)
+    index.upsert([_node(1, "pharmacy")])
+    source = ElementSource(index, OverpassCache(), overpass_refresh=False)
+    assert [el["id"] for el in source.indexed(LAT, LON, 1000, PHARMACY)] == [1]
+    assert ElementSource(None, OverpassCache()).indexed(LAT, LON, 1000, PHARMACY) is None
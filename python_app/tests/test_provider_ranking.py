@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+
+from geo import haversine
+from provider_ranking import StreamingRanker, haversine_many, rank_providers
+
+LAT, LON = 12.9716, 77.5946
+
+
+def _node(el_id, lat, lon, name="Clinic", **tags):
+    return {"type": "node", "id": el_id, "lat": lat, "lon": lon, "tags": {"name": name, **tags}}
+
+
+def _elements(count, seed=7):
+    rng = random.Random(seed)
+    amenities = ["hospital", "clinic", "doctors", "pharmacy", "dentist"]
+    elements = []
+    for i in range(count):
+        tags = {"amenity": rng.choice(amenities)}
+        if rng.random() < 0.3:
+            tags["phone"] = "+91 80 0000"
+        if rng.random() < 0.2:
+            tags["opening_hours"] = "24/7"
+        name = "" if rng.random() < 0.1 else rng.choice(["City Dental", "Apollo Pharmacy", "General Hospital", "Care"])
+        elements.append(_node(i, LAT + rng.uniform(-0.1, 0.1), LON + rng.uniform(-0.1, 0.1), name, **tags))
+    return elements
+
+
+def test_haversine_many_matches_the_scalar_formula():
+    lats = np.array([LAT, LAT + 0.1, 13.5])
+    lons = np.array([LON, LON - 0.2, 78.0])
+    expected = [haversine(LAT, LON, a, b) for a, b in zip(lats, lons)]
+    assert np.allclose(haversine_many(LAT, LON, lats, lons), expected)
+
+
+def test_rank_providers_orders_by_relevance_then_distance():
+    elements = [
+        _node(1, LAT + 0.02, LON, "Far Dental", amenity="dentist"),
+        _node(2, LAT + 0.01, LON, "Near Dental", amenity="dentist"),
+        _node(3, LAT, LON, "Corner Pharmacy", amenity="pharmacy"),
+        _node(4, LAT, LON, "", amenity="dentist"),
+        _node(5, LAT + 1, LON, "Out of range Dental", amenity="dentist"),
+    ]
+    providers, total = rank_providers(elements, LAT, LON, 10000, "dentist", 10)
+    assert total == 3
+    assert [p["id"] for p in providers] == [2, 1, 3]
+    assert providers[0]["type"] == "Dentist" and providers[0]["distance"] == 1.1
+
+
+def test_rank_providers_limit_keeps_the_best():
+    elements = _elements(500)
+    full, total = rank_providers(elements, LAT, LON, 8000, "dental clinic", 1000)
+    top, top_total = rank_providers(elements, LAT, LON, 8000, "dental clinic", 10)
+    assert total == top_total == len(full)
+    assert top == full[:10]
+    assert rank_providers(elements, LAT, LON, 8000, "", 0) == ([], total)
+    assert rank_providers([], LAT, LON, 8000, "", 10) == ([], 0)
+
+
+def test_streaming_ranker_matches_rank_providers():
+    elements = _elements(700)
+    for query, limit in (("dentist", 10), ("pharmacy open 24", 25), ("", 5)):
+        ranker = StreamingRanker(LAT, LON, 8000, query, limit, batch_size=64)
+        for el in elements:
+            ranker.add(el)
+        assert ranker.result() == rank_providers(elements, LAT, LON, 8000, query, limit)
+
+
+def test_build_provider_fields():
+    el = _node(9, LAT, LON, "Hill Clinic", amenity="clinic", **{
+        "addr:street": "MG Road", "addr:city": "Bengaluru", "contact:phone": "123",
+        "healthcare:speciality": "cardiology", "emergency": "yes",
+    })
+    (provider,), _ = rank_providers([el], LAT, LON, 1000, "", 1)
+    assert provider["address"] == "MG Road, Bengaluru"
+    assert provider["phone"] == "123"
+    assert provider["specialty"] == "cardiology"
+    assert provider["emergency"] is True
+    assert provider["relevance"] == 10
@@ -0,0 +1,75 @@
+from relevance import (
+    BM25_SCALE,
+    CONTACT_BONUS,
+    HOURS_BONUS,
+    INTENT_BONUS,
+    categorize_provider,
+    compile_query,
+    relevance_scores,
+    tokenize,
+)
+
+
+def test_tokenize_drops_plural_s():
+    assert tokenize("Clinics, GPs & Glass!") == ["clinic", "gps", "glass"]
+
+
+def test_compile_query_drops_stopwords_and_finds_intents():
+    compiled = compile_query("Find the best dentist near me for teeth")
+    assert compiled.terms == ("dentist", "teeth")
+    assert compiled.intents == {"Dentist"}
+    assert compile_query("open nearby").terms == ()
+
+
+def test_categorize_provider():
+    assert categorize_provider({"amenity": "doctors"}) == "Doctor"
+    assert categorize_provider({"healthcare": "laboratory"}) == "Laboratory"
+    assert categorize_provider({"healthcare": "optometrist"}) == "Eye Care"
+    assert categorize_provider({"healthcare": "counselling"}) == "Mental Health"
+    assert categorize_provider({"shop": "optician"}) == "Healthcare"
+
+
+def test_static_bonuses_without_query_terms():
+    tags = [
+        {"name": "A"},
+        {"name": "B", "phone": "1"},
+        {"name": "C", "website": "x", "opening_hours": "24/7"},
+    ]
+    assert relevance_scores(tags, "").tolist() == [0, CONTACT_BONUS, CONTACT_BONUS + HOURS_BONUS]
+
+
+def test_intent_bonus_and_name_match():
+    dental = {"name": "Smile Dentist", "amenity": "dentist"}
+    named_only = {"name": "Dentist Supplies", "amenity": "pharmacy"}
+    unrelated = {"name": "General Hospital", "amenity": "hospital"}
+    dental_score, named_score, unrelated_score = relevance_scores([dental, named_only, unrelated], "dentist")
+    assert unrelated_score == 0
+    assert named_score > 0
+    assert dental_score == named_score + INTENT_BONUS
+
+
+def test_term_saturation_and_field_weights():
+    once = {"name": "Heart Centre"}
+    twice = {"name": "Heart Heart Centre"}
+    specialty = {"name": "Centre", "healthcare:speciality": "heart"}
+    operator = {"name": "Centre", "operator": "Heart Trust"}
+    scores = relevance_scores([once, twice, specialty, operator], "heart").tolist()
+    # More occurrences help, with diminishing returns
+    assert scores[0] < scores[1] < 2 * scores[0]
+    assert scores[0] >= BM25_SCALE * 0.9
+    # Operator text counts for less than the name
+    assert scores[3] < scores[0]
+    assert scores[2] > 0
+
+
+def test_prefix_terms_match_longer_words():
+    scores = relevance_scores([{"name": "Cardiology Clinic"}, {"name": "Car Clinic"}], "cardio")
+    assert scores[0] > 0 and scores[1] == 0
+
+
+def test_scores_do_not_depend_on_the_other_candidates():
+    target = {"name": "City Dental Care", "amenity": "dentist", "phone": "1"}
+    others = [{"name": f"Dental {i}", "amenity": "dentist"} for i in range(20)]
+    alone = relevance_scores([target], "dental care")[0]
+    together = relevance_scores(others + [target], "dental care")[-1]
+    assert alone == together
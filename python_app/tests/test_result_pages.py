@@ -0,0 +1,83 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from api_requests import MAX_PAGE_SIZE, FindCareSearch
+from result_pages import CursorError, ResultPages, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("abc_-123", 40)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("abc_-123", 40)
+
+
+@pytest.mark.parametrize("cursor", ["", "!!!", encode_cursor("id", -5), "aWQ6eA", encode_cursor("", 3)])
+def test_invalid_cursors(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor)
+
+
+def test_pages_walk_the_result_set():
+    pages = ResultPages()
+    items = list(range(12))
+    first, cursor = pages.first_page(items, 5)
+    assert first == [0, 1, 2, 3, 4]
+    second, cursor, available = pages.page(cursor, 5)
+    assert (second, available) == ([5, 6, 7, 8, 9], 12)
+    last, cursor, _ = pages.page(cursor, 5)
+    assert (last, cursor) == ([10, 11], None)
+
+
+def test_small_result_sets_are_not_stored():
+    pages = ResultPages()
+    assert pages.first_page([1, 2], 5) == ([1, 2], None)
+    assert len(pages._results) == 0
+
+
+def test_expired_result_sets():
+    pages = ResultPages(ttl=0)
+    _, cursor = pages.first_page(list(range(10)), 3)
+    with pytest.raises(CursorError, match="expired"):
+        pages.page(cursor, 3)
+
+
+def test_pages_are_shared_between_workers(shared_store):
+    _, cursor = ResultPages(shared=shared_store).first_page(list(range(10)), 3)
+    assert ResultPages(shared=shared_store).page(cursor, 3)[0] == [3, 4, 5]
+
+
+def test_find_care_body_with_a_page_size():
+    pages = ResultPages()
+    args = MultiDict({"lat": "12.97", "lon": "77.59", "page_size": "2"})
+    search = FindCareSearch(args)
+    body = search.body([{"id": i} for i in range(5)], 9, pages)
+    assert body["providers"] == [{"id": 0}, {"id": 1}]
+    assert body["available"] == 5 and body["total"] == 9
+    assert pages.page(body["nextCursor"], 10)[0] == [{"id": 2}, {"id": 3}, {"id": 4}]
+
+    unpaged = FindCareSearch(MultiDict({"lat": "12.97", "lon": "77.59"})).body([{"id": 0}], 1, pages)
+    assert "nextCursor" not in unpaged and unpaged["radius"] == 10
+
+
+def test_find_care_page_size_is_clamped():
+    search = FindCareSearch(MultiDict({"lat": "1", "lon": "2", "page_size": "1000"}))
+    assert search.page_size == MAX_PAGE_SIZE
+    assert FindCareSearch(MultiDict({"lat": "1", "lon": "2", "page_size": "0"})).page_size == 1
+
+
+def test_find_care_page_endpoint():
+    import app as app_module
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["user_email"] = "pages@example.com"
+    _, cursor = app_module.result_pages.first_page([{"id": i} for i in range(8)], 3)
+
+    resp = client.get("/api/find-care/page", query_string={"cursor": cursor, "size": 3})
+    assert resp.status_code == 200
+    assert resp.json == {"providers": [{"id": 3}, {"id": 4}, {"id": 5}], "nextCursor": resp.json["nextCursor"],
+                         "available": 8}
+    last = client.get("/api/find-care/page", query_string={"cursor": resp.json["nextCursor"]}).json
+    assert last["providers"] == [{"id": 6}, {"id": 7}] and last["nextCursor"] is None
+
+    assert client.get("/api/find-care/page", query_string={"cursor": "bogus"}).status_code == 410
@@ -0,0 +1,127 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from upstream import CircuitBreaker, UpstreamClient, UpstreamUnavailable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_breaker_lets_one_trial_through_when_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed trial reopens the circuit for another period
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_breaker_abandoned_trial_can_be_retried():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=1, clock=clock)
+    breaker.record_failure()
+    clock.now = 1
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+
+def test_breaker_record_status():
+    breaker = CircuitBreaker(failure_threshold=2)
+    for _ in range(5):
+        breaker.record_status(429)
+    assert breaker.state == "closed"
+    breaker.record_status(503)
+    breaker.record_status(200)
+    breaker.record_status(502)
+    assert breaker.state == "closed"
+    breaker.record_status(504)
+    assert breaker.state == "open"
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    status = 200
+    requests = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        type(self).requests += 1
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = b"{}"
+        self.send_response(self.status)
+        if self.status == 429:
+            self.send_header("Retry-After", "3600")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def status_server():
+    handler = type("Handler", (_StatusHandler,), {})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield handler, f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_rate_limits_do_not_open_the_circuit(status_server):
+    handler, url = status_server
+    handler.status = 429
+    client = UpstreamClient("test", timeout=5, retries=0, breaker=CircuitBreaker(failure_threshold=1))
+    for _ in range(3):
+        assert client.post(url, json={}).status_code == 429
+    assert client.available()
+
+
+def test_client_fails_fast_while_the_circuit_is_open(status_server):
+    handler, url = status_server
+    handler.status = 503
+    client = UpstreamClient("test", timeout=5, retries=0, breaker=CircuitBreaker(failure_threshold=2))
+    client.post(url, json={})
+    client.post(url, json={})
+    assert not client.available()
+    with pytest.raises(UpstreamUnavailable):
+        client.post(url, json={})
+    assert handler.requests == 2
+
+
+def test_client_counts_connection_errors_as_failures():
+    client = UpstreamClient("test", timeout=1, retries=0, breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(requests.ConnectionError):
+        client.post("http://127.0.0.1:9/", json={})
+    assert not client.available()
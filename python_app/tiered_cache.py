@@ -0,0 +1,67 @@
+"""
+An in-process LRU/TTL cache in front of an optional SharedStore namespace.
+
+Reads try this process's memory first, then the shared store; a value found
+there is copied into memory for the rest of its original lifetime rather
+than a fresh TTL. Writes go to both tiers, so a fill in one worker is seen
+by the others on their next miss. Values must be JSON-serializable.
+"""
+
+import time
+
+from shared_store import SharedStore
+from ttl_cache import TTLCache
+
+MEMORY = "memory"
+SHARED = "shared"
+
+
+class TieredCache:
+    def __init__(self, namespace: str, maxsize: int = 1024, ttl: float = 600,
+                 shared: SharedStore | None = None, shared_key=str):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.shared = shared
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._shared_key = shared_key
+
+    def lookup(self, key, stale=None) -> tuple:
+        """(value or None, MEMORY, SHARED or None for where it was found).
+
+        ``stale(value)`` marks a value in memory that should be re-read from
+        the shared store, where another worker may have updated it; if the
+        store has nothing, the memory value is still returned.
+        """
+        value = self._memory.get(key)
+        if value is not None and (stale is None or not stale(value)):
+            return value, MEMORY
+        if self.shared is not None:
+            entry = self.shared.get_entry(self.namespace, self._shared_key(key))
+            if entry is not None:
+                stored, expires_at = entry
+                self._memory.set(key, stored, ttl=expires_at - time.time())
+                return stored, SHARED
+        return value, (MEMORY if value is not None else None)
+
+    def get(self, key, stale=None):
+        return self.lookup(key, stale)[0]
+
+    def set(self, key, value, ttl: float | None = None) -> None:
+        self.remember(key, value, ttl)
+        self.publish(key, value, ttl)
+
+    def remember(self, key, value, ttl: float | None = None) -> None:
+        """Set ``key`` in this process's tier only."""
+        self._memory.set(key, value, self.ttl if ttl is None else ttl)
+
+    def publish(self, key, value, ttl: float | None = None) -> None:
+        """Set ``key`` in the shared tier only (a SQLite write, so it may block)."""
+        if self.shared is not None:
+            self.shared.set(self.namespace, self._shared_key(key), value, self.ttl if ttl is None else ttl)
+
+    def clear(self) -> None:
+        """Empty this process's tier; the shared store is left alone."""
+        self._memory.clear()
+
+    def __len__(self) -> int:
+        return len(self._memory)
@@ -0,0 +1,299 @@
+"""
+Shared HTTP clients for upstream services (Gemini, Overpass).
+
+Each upstream gets its own keep-alive ``requests.Session`` with a sized
+connection pool, retries with jittered exponential backoff on 429/5xx and
+connection errors (a Retry-After is honoured up to ``RETRY_AFTER_MAX``
+seconds), and a circuit breaker that fails fast while the host is unhealthy
+instead of letting every request wait out its timeout.
+
+A HedgedClient spreads one logical upstream over several mirrors: the
+fastest healthy mirror gets the request, and if it has not answered within
+its recent p90 latency a duplicate goes to the next-fastest one.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import HEDGE_WINS, HEDGED_REQUESTS, UPSTREAM_ERRORS, UPSTREAM_TIMEOUTS
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# A 429 is retried but says nothing about the host: Gemini rate-limits per
+# API key, so one user's exhausted key must not open the circuit for all.
+FAILURE_STATUSES = (500, 502, 503, 504)
+RETRY_AFTER_MAX = 10
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """Raised without a network call while an upstream's circuit is open."""
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open, calls are rejected for ``reset_timeout`` seconds; then a
+    single trial call is let through (half-open) and its outcome decides
+    whether the circuit closes again or stays open for another period.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_in_flight or self._clock() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+    def abandon(self) -> None:
+        """Forget an allowed call that ended without an outcome (it was cancelled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_status(self, status_code: int) -> None:
+        """Record an HTTP response: 5xx is a failure, 429 no outcome, anything else a success."""
+        if status_code in FAILURE_STATUSES:
+            self.record_failure()
+        elif status_code == 429:
+            self.abandon()
+        else:
+            self.record_success()
+
+
+class UpstreamClient:
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        pool_size: int = 10,
+        retries: int = 2,
+        backoff: float = 0.5,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,
+            backoff_factor=backoff,
+            backoff_jitter=backoff,
+            backoff_max=RETRY_AFTER_MAX,
+            retry_after_max=RETRY_AFTER_MAX,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def available(self) -> bool:
+        return self.breaker.state != "open"
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send through the pooled session, recording the outcome on the breaker."""
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(f"{self.name} circuit is open")
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            if isinstance(e, requests.Timeout):
+                UPSTREAM_TIMEOUTS.inc(upstream=self.name)
+            UPSTREAM_ERRORS.inc(upstream=self.name)
+            raise
+        if resp.status_code in RETRY_STATUSES:
+            UPSTREAM_ERRORS.inc(upstream=self.name)
+        self.breaker.record_status(resp.status_code)
+        return resp
+
+
+class Mirror:
+    """One endpoint of a HedgedClient with its recent successful latencies."""
+
+    def __init__(self, url: str, client: UpstreamClient, window: int = 100):
+        self.url = url
+        self.client = client
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def quantile(self, q: float, min_samples: int = 1) -> float | None:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class HedgedClient:
+    """Hedged, failover requests across interchangeable mirrors.
+
+    Healthy mirrors are tried fastest first (by recent median latency;
+    mirrors without samples go first so they get measured). After the
+    primary's p90 latency, or ``default_delay`` until enough samples exist,
+    one duplicate request goes to the next mirror and whichever answers first
+    wins; an error or 429/5xx moves on to the next mirror at once. Each
+    mirror has its own circuit breaker, so one that keeps failing is ejected
+    until its reset timeout passes.
+
+    A losing request cannot be interrupted mid-flight with ``requests``; it
+    is abandoned and its response closed unread as soon as it arrives.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        urls: list[str],
+        timeout: float,
+        pool_size: int = 10,
+        retries: int = 0,
+        default_delay: float = 1.0,
+        min_delay: float = 0.05,
+        hedge_quantile: float = 0.9,
+        min_samples: int = 5,
+        breaker_factory=CircuitBreaker,
+    ):
+        self.name = name
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.mirrors = [
+            Mirror(url, UpstreamClient(
+                f"{name}:{urlparse(url).netloc}", timeout=timeout, pool_size=pool_size,
+                retries=retries, breaker=breaker_factory(),
+            ))
+            for url in urls
+        ]
+        self._pool = ThreadPoolExecutor(max_workers=pool_size * 2, thread_name_prefix=f"{name}-hedge")
+
+    def available(self) -> bool:
+        return any(m.client.available() for m in self.mirrors)
+
+    def ranked(self) -> list[Mirror]:
+        """Healthy mirrors, fastest median first."""
+        def speed(mirror):
+            median = mirror.quantile(0.5)
+            return -1.0 if median is None else median
+        return sorted((m for m in self.mirrors if m.client.available()), key=speed)
+
+    def hedge_delay(self, mirror: Mirror) -> float:
+        delay = mirror.quantile(self.hedge_quantile, self.min_samples)
+        return max(self.min_delay, self.default_delay if delay is None else delay)
+
+    def _attempt(self, mirror: Mirror, kwargs) -> requests.Response:
+        started = time.perf_counter()
+        resp = mirror.client.post(mirror.url, **kwargs)
+        if resp.status_code not in RETRY_STATUSES:
+            mirror.record_latency(time.perf_counter() - started)
+        return resp
+
+    def post(self, **kwargs) -> requests.Response:
+        """POST to the mirrors; returns the first good response."""
+        candidates = self.ranked()
+        if not candidates:
+            raise UpstreamUnavailable(f"no healthy {self.name} mirror")
+
+        primary = candidates[0]
+        in_flight = {}
+        hedged = False
+        last_error = None
+        last_response = None
+
+        def launch():
+            mirror = candidates.pop(0)
+            in_flight[self._pool.submit(self._attempt, mirror, kwargs)] = mirror
+            return time.monotonic() + self.hedge_delay(mirror)
+
+        hedge_at = launch()
+        try:
+            while in_flight:
+                timeout = None
+                if candidates and not hedged:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    HEDGED_REQUESTS.inc(upstream=self.name)
+                    launch()
+                    continue
+                for future in done:
+                    mirror = in_flight.pop(future)
+                    try:
+                        resp = future.result()
+                    except requests.RequestException as e:
+                        last_error = e
+                    else:
+                        if resp.status_code not in RETRY_STATUSES:
+                            if hedged and mirror is not primary:
+                                HEDGE_WINS.inc(upstream=self.name)
+                            return resp
+                        if last_response is not None:
+                            last_response.close()
+                        last_response = resp
+                    # Fail over straight away instead of waiting for the hedge.
+                    if candidates and len(in_flight) < 2:
+                        hedge_at = launch()
+        finally:
+            for future in in_flight:
+                future.add_done_callback(_close_response)
+
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+
+def _close_response(future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
@@ -0,0 +1,58 @@
+"""
+SQLite-backed user accounts, safe to share between worker processes.
+
+The database runs in WAL mode so readers in one worker never block on a
+signup in another. Password hashing and verification are deliberately slow;
+a semaphore caps how many of these CPU-heavy hashes a worker runs at once.
+They still run on the request's own thread.
+"""
+
+import sqlite3
+import threading
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from sqlite_local import ThreadLocalConnections
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    password TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+"""
+
+SELECT_USER = "SELECT email, name, password FROM users WHERE email = ?"
+INSERT_USER = "INSERT INTO users (email, name, password) VALUES (?, ?, ?)"
+
+
+class UserStore:
+    def __init__(self, path: str, hash_workers: int = 4):
+        self.path = path
+        self._hash_slots = threading.BoundedSemaphore(hash_workers)
+        self._db = ThreadLocalConnections(path, SCHEMA, wal=True, cached_statements=32)
+
+    def get(self, email: str) -> dict | None:
+        row = self._db.get().execute(SELECT_USER, (email,)).fetchone()
+        if row is None:
+            return None
+        return {"email": row[0], "name": row[1], "password": row[2]}
+
+    def create(self, email: str, name: str, password_hash: str) -> bool:
+        """Insert a user; returns False if the email is already registered."""
+        conn = self._db.get()
+        try:
+            with conn:
+                conn.execute(INSERT_USER, (email, name, password_hash))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def hash_password(self, password: str) -> str:
+        with self._hash_slots:
+            return generate_password_hash(password)
+
+    def verify_password(self, user: dict, password: str) -> bool:
+        with self._hash_slots:
+            return check_password_hash(user["password"], password)